@@ -8,110 +8,137 @@ Created on Thu Feb 29 2024
 
 """
 
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 import streamlit as st
-import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+
+if TYPE_CHECKING:
+    # plotly is imported by the functions building the figure, after the rest of the page is rendered
+    import plotly.graph_objects as go
+
+from perf_metrics import count, stage_timer
+from scenario_cache import history_version
+
 
+CROSSUNDER_COLUMNS = ['crossunder_SMA_350', 'crossunder_1.62SMA_350', 'crossunder_2SMA_350']
+# number of points per line used by the app, enough for a full-width chart while keeping the payload small
+APP_CHART_MAX_POINTS = 2000
 
-def plot_BTC_chart(df: pd.DataFrame, last_index_of_real_data: int):
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
     """
-    Plots a chart containing:
-        price history, price future guess, SMA111, SMA350, 1.62*SMA35, 2*SMA350, markers for undercrosses
-        
+    Selects points of a line by min/max bucket downsampling.
+    
+    Points are split into at most n_out//2 buckets of the same number of consecutive values (the last one
+    may be shorter) and the minimum and the maximum of each bucket are kept (together with the first
+    and the last point), so peaks stay exact. The full buckets are processed at once in linear time
+    as rows of a 2D view of y.
+    
+    Args:
+        y (np.ndarray): numeric y values without NaN
+        n_out (int): maximum number of points to keep (2 more for the first and the last point)
+    
     Returns:
-        plotly chart in streamlit
+        np.ndarray: sorted positions of the selected points
     """
-    # make subsets of data to draw crosses where undercross
-    subset_SMA_350 = df[df['crossunder_SMA_350']==True]
-    subset_162SMA_350 = df[df['crossunder_1.62SMA_350']==True]
-    subset_2SMA_350 = df[df['crossunder_2SMA_350']==True]
+    n = len(y)
+    n_buckets = n_out//2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+    
+    width = -(-n//n_buckets)
+    n_full = n//width
+    buckets = y[:n_full*width].reshape(n_full, width)
+    extremes = np.stack((buckets.argmin(axis=1), buckets.argmax(axis=1)), axis=1)
+    if n_full*width < n:
+        rest = y[n_full*width:]
+        extremes = np.vstack((extremes, [rest.argmin(), rest.argmax()]))
+    # buckets in order and the two extremes sorted within each bucket, the selection is sorted without a full sort
+    extremes = np.sort(extremes, axis=1)+width*np.arange(len(extremes))[:, None]
+    selected = np.concatenate(([0], extremes.ravel(), [n-1]))
+    return selected[np.diff(selected, prepend=-1) != 0]
+
+
+def downsample_line(x: np.ndarray, y: np.ndarray, max_points: int | None, keep: np.ndarray | None = None):
+    """
+    Downsamples line given by x (dates) and y values to roughly max_points (see minmax_indices).
+    
+    Points without value (NaN) are dropped and points marked in keep are always kept,
+    so the line passes exactly through them.
+    
+    Returns:
+        x and y arrays, unchanged if max_points is None or the line is already short enough
+    """
+    if max_points is None or len(y) <= max_points:
+        return x, y
+    
+    finite = np.isfinite(y)
+    valid = np.flatnonzero(finite)
+    picked = np.zeros(len(y), dtype=bool)
+    picked[valid[minmax_indices(y[valid], max_points)]] = True
+    if keep is not None:
+        picked |= keep & finite
+    return x[picked], y[picked]
+
+
+# color, name and width of the SMA lines, historical part is cached and the guessed tail is added on each rerun
+SMA_LINES = [
+    ('SMA_111', 1, '111 Days SMA', '#d3444b'),
+    ('SMA_350', 1, '350 Days SMA', '#d0a300'),
+    ('SMA_350', 1.618, '1.62 × 350 Days SMA', '#edd9b3'),
+    ('SMA_350', 2, '2 × 350 Days SMA', '#a37000'),
+]
+SMA_WIDTH = 1
+
+
+def build_static_figure(df: pd.DataFrame, max_points: int | None = None) -> go.Figure:
+    """
+    Builds the part of the chart which depends only on historical data:
+        layout, price history and historical part of SMA111, SMA350, 1.62*SMA35, 2*SMA350
+    
+    Args:
+        df (pd.DataFrame): historical data with indicator columns (without guessed rows)
+        max_points (int | None): maximum number of points of each line, None to keep all points.
+            Points of undercrosses and the last historical point are always kept.
+    
+    Returns:
+        plotly figure, the estimate dependent traces are added by add_estimate_traces
+    """
+    import plotly.graph_objects as go
+    
+    dates = df['Date'].to_numpy()
+    keep = df[CROSSUNDER_COLUMNS].fillna(False).to_numpy(dtype=bool).any(axis=1)
     
     # Create figure
     fig = go.Figure()
-    SMA_width = 1
     # trace for historical Close price
+    historical_x, historical_y = downsample_line(dates, df['Close'].to_numpy(dtype=float), max_points, keep)
     fig.add_trace(
-        go.Scatter(x=list(df.loc[0:last_index_of_real_data+1,'Date']), 
-                   y=list(df.loc[0:last_index_of_real_data+1,'Close']),
+        go.Scatter(x=historical_x, 
+                   y=historical_y,
                    name = 'Daily Close Price - Historical',
                    marker={'color': '#30a347'},
                    line={'width':1.5},
                    opacity=1, 
-                   ))
-    # trace for guessed future Close price
-    fig.add_trace(
-        go.Scatter(x=list(df.loc[last_index_of_real_data+1:,'Date']), 
-                   y=list(df.loc[last_index_of_real_data+1:,'Close']),
-                   name = 'Daily Close Price - Estimate',
-                   marker={'color': '#00ffff'},
-                   line={'width':1.5},
-                   opacity=1, 
+                   legendrank=1,
                    ))
     
-    # traces for SMA
-    fig.add_trace(
-        go.Scatter(x=list(df.Date), 
-                   y=list(df.SMA_111),
-                   name = '111 Days SMA',
-                   marker={'color': '#d3444b'},
-                   line={'width':SMA_width}
-                   ))
-    fig.add_trace(
-        go.Scatter(x=list(df.Date), 
-                   y=list(df.SMA_350),
-                   name = '350 Days SMA',
-                   marker={'color': '#d0a300'},
-                   line={'width':SMA_width}
-                   ))
-    fig.add_trace(
-        go.Scatter(x=list(df.Date), 
-                   y=list(1.618*df.SMA_350),
-                   name = '1.62 × 350 Days SMA',
-                   marker={'color': '#edd9b3'},
-                   line={'width':SMA_width}
-                   ))
-    fig.add_trace(
-        go.Scatter(x=list(df.Date), 
-                   y=list(2*df.SMA_350),
-                   name = '2 × 350 Days SMA',
-                   marker={'color': '#a37000'},
-                   line={'width':SMA_width}
-                   ))
-    
-    # traces for marker of undercross
-    fig.add_trace(
-        go.Scatter(x=[date for date in subset_SMA_350['Date']],
-                   y=[1.1*i for i in subset_SMA_350['Close']],
-                   mode="markers+text",
-                   name="unedercross of SMA 350",
-                   #text=["Text D" for i in range(len(subset_SMA_350))],
-                   textposition="top center",
-                   marker_symbol = "cross",
-                   marker_size = 8,
-                   marker_color = "#d0a300"
-                   ))
-    fig.add_trace(
-        go.Scatter(x=[date for date in subset_162SMA_350['Date']],
-                   y=[1.1*i for i in subset_162SMA_350['Close']],
-                   mode="markers+text",
-                   name="unedercross of 1.62* SMA 350",
-                   #text=["Text D" for i in range(len(subset_162SMA_350))],
-                   textposition="top center",
-                   marker_symbol = "cross",
-                   marker_size = 12,
-                   marker_color = "#edd9b3"
-                   ))
-    fig.add_trace(
-        go.Scatter(x=[date for date in subset_2SMA_350['Date']],
-                   y=[1.1*i for i in subset_2SMA_350['Close']],
-                   mode="markers+text",
-                   name="unedercross of 2* SMA 350",
-                   #text=["Text D" for i in range(len(subset_2SMA_350))],
-                   textposition="top center",
-                   marker_symbol = "cross",
-                   marker_size = 16,
-                   marker_color = "#d3444c"
-                   ))
+    # traces for historical part of SMA, the guessed tails are in the same legend group
+    for rank, (column, multiplier, name, color) in enumerate(SMA_LINES, start=3):
+        sma_x, sma_y = downsample_line(dates, multiplier*df[column].to_numpy(dtype=float), max_points, keep)
+        fig.add_trace(
+            go.Scatter(x=sma_x, 
+                       y=sma_y,
+                       name = name,
+                       marker={'color': color},
+                       line={'width':SMA_WIDTH},
+                       legendgroup=name,
+                       legendrank=rank,
+                       ))
         
     # Set title
     fig.update_layout(
@@ -170,12 +197,168 @@ def plot_BTC_chart(df: pd.DataFrame, last_index_of_real_data: int):
     
     
     fig.update_layout(updatemenus=updatemenus)
+    return fig
+
+
+def add_estimate_traces(fig: go.Figure, df: pd.DataFrame, last_index_of_real_data: int,
+                        max_points: int | None = None) -> go.Figure:
+    """
+    Adds traces depending on the guess to fig built by build_static_figure:
+        price future guess, guessed tails of the SMAs, markers for undercrosses
     
-    # Show the figure in the app
-    BTC_plot = st.plotly_chart(fig, width='stretch')
-    return BTC_plot
+    The guessed lines start at the last historical point so they are connected with the historical ones.
+        
+    Returns:
+        fig with the added traces
+    """
+    import plotly.graph_objects as go
+    
+    boundary = df.index.get_loc(last_index_of_real_data)
+    # without guessed rows there is no estimate, but the SMA tails keep their (single point) traces
+    tail = df.iloc[boundary:]
+    estimate = tail if len(tail) > 1 else tail.iloc[:0]
+    
+    dates = tail['Date'].to_numpy()
+    keep = tail[CROSSUNDER_COLUMNS].fillna(False).to_numpy(dtype=bool).any(axis=1)
+    
+    # the traces are added at once, adding them one by one to the copied static figure is slower
+    traces = []
+    # trace for guessed future Close price
+    estimate_x, estimate_y = downsample_line(estimate['Date'].to_numpy(), estimate['Close'].to_numpy(dtype=float),
+                                             max_points, keep[:len(estimate)])
+    traces.append(
+        go.Scatter(x=estimate_x, 
+                   y=estimate_y,
+                   name = 'Daily Close Price - Estimate',
+                   marker={'color': '#00ffff'},
+                   line={'width':1.5},
+                   opacity=1, 
+                   legendrank=2,
+                   ))
+    
+    # traces for guessed tails of SMA
+    for column, multiplier, name, color in SMA_LINES:
+        sma_x, sma_y = downsample_line(dates, multiplier*tail[column].to_numpy(dtype=float), max_points, keep)
+        traces.append(
+            go.Scatter(x=sma_x, 
+                       y=sma_y,
+                       mode='lines',
+                       name = name,
+                       marker={'color': color},
+                       line={'width':SMA_WIDTH},
+                       legendgroup=name,
+                       showlegend=False,
+                       ))
+    
+    # make subsets of data to draw crosses where undercross
+    subset_SMA_350 = df[df['crossunder_SMA_350']==True]
+    subset_162SMA_350 = df[df['crossunder_1.62SMA_350']==True]
+    subset_2SMA_350 = df[df['crossunder_2SMA_350']==True]
+    
+    # traces for marker of undercross
+    traces.append(
+        go.Scatter(x=subset_SMA_350['Date'].to_numpy(),
+                   y=1.1*subset_SMA_350['Close'].to_numpy(),
+                   mode="markers+text",
+                   name="unedercross of SMA 350",
+                   #text=["Text D" for i in range(len(subset_SMA_350))],
+                   textposition="top center",
+                   marker_symbol = "cross",
+                   marker_size = 8,
+                   marker_color = "#d0a300",
+                   legendrank=7,
+                   ))
+    traces.append(
+        go.Scatter(x=subset_162SMA_350['Date'].to_numpy(),
+                   y=1.1*subset_162SMA_350['Close'].to_numpy(),
+                   mode="markers+text",
+                   name="unedercross of 1.62* SMA 350",
+                   #text=["Text D" for i in range(len(subset_162SMA_350))],
+                   textposition="top center",
+                   marker_symbol = "cross",
+                   marker_size = 12,
+                   marker_color = "#edd9b3",
+                   legendrank=8,
+                   ))
+    traces.append(
+        go.Scatter(x=subset_2SMA_350['Date'].to_numpy(),
+                   y=1.1*subset_2SMA_350['Close'].to_numpy(),
+                   mode="markers+text",
+                   name="unedercross of 2* SMA 350",
+                   #text=["Text D" for i in range(len(subset_2SMA_350))],
+                   textposition="top center",
+                   marker_symbol = "cross",
+                   marker_size = 16,
+                   marker_color = "#d3444c",
+                   legendrank=9,
+                   ))
+    
+    fig.add_traces(traces)
+    return fig
+
+
+def build_BTC_figure(df: pd.DataFrame, last_index_of_real_data: int, max_points: int | None = None,
+                     static_figure: dict | None = None) -> go.Figure:
+    """
+    Builds a chart containing:
+        price history, price future guess, SMA111, SMA350, 1.62*SMA35, 2*SMA350, markers for undercrosses
+    
+    Args:
+        df (pd.DataFrame): historical and guessed data with indicator columns
+        last_index_of_real_data (int): index of the last historical row in df
+        max_points (int | None): maximum number of points of each line, None to keep all points.
+            Points of undercrosses and of the boundary between history and estimate are always kept.
+        static_figure (dict | None): figure of the historical rows from build_static_figure as a dict (to_dict),
+            it is not modified. Built from df if None.
+        
+    Returns:
+        plotly figure
+    """
+    if static_figure is None:
+        fig = build_static_figure(df.loc[:last_index_of_real_data], max_points=max_points)
+    else:
+        import plotly.graph_objects as go
+        
+        # the static traces and layout were validated when they were built, validating (and deep-copying)
+        # them again on every rerun would cost more than building them
+        fig = go.Figure(static_figure, _validate=False)
+    return add_estimate_traces(fig, df, last_index_of_real_data, max_points=max_points)
 
 
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _get_static_figure(version: tuple, max_points: int | None, _df: pd.DataFrame) -> dict:
+    """
+    Caches the static part of the chart once per data refresh, identified by the version of the history
+    (see history_version, with a hash of all closes, so a revised or restated close gives a new figure).
+    The same figure dict is shared by all sessions and must not be modified.
+    """
+    _ = version
+    count('static_figure_cache_misses')
+    return build_static_figure(_df, max_points=max_points).to_dict()
+
+
+def plot_BTC_chart(df: pd.DataFrame, last_index_of_real_data: int, max_points: int | None = None):
+    """
+    Plots a chart containing:
+        price history, price future guess, SMA111, SMA350, 1.62*SMA35, 2*SMA350, markers for undercrosses
+    
+    max_points limits the number of points of each line (see build_BTC_figure), None keeps all points.
+    The historical part of the chart is cached, only the traces depending on the guess are built on each rerun.
+        
+    Returns:
+        plotly chart in streamlit
+    """
+    df_history = df.loc[:last_index_of_real_data]
+    count('static_figure_cache_lookups')
+    with stage_timer('build_figure'):
+        static_figure = _get_static_figure(history_version(df_history, n_closes=None), max_points, df_history)
+        fig = build_BTC_figure(df, last_index_of_real_data, max_points=max_points, static_figure=static_figure)
+    
+    # Show the figure in the app (the figure is serialized to JSON here)
+    with stage_timer('plotly_chart'):
+        BTC_plot = st.plotly_chart(fig, width='stretch')
+    return BTC_plot
+
 
 if __name__ == '__main__':
     pass
\ No newline at end of file
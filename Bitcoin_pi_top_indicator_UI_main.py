@@ -14,25 +14,33 @@ link: https://positivecrypto.medium.com/the-golden-ratio-multiplier-c2567401e12a
 """
 
 import streamlit as st
+from perf_metrics import finish_rerun, stage_timer, start_memory_tracing, start_metrics_server, start_rerun
 from app_data_loader import load_data_for_app
-from top_indicator_content_prep import df_with_users_guess, prepare_data_for_plot, additional_information
-from BTC_plot_with_future_estimate import plot_BTC_chart
+from top_indicator_content_prep import scenario_view, days_to_cross, monte_carlo_scenarios, asset_screener_view, performance_panel, additional_information
 
 # set layout of the page and title
 st.set_page_config(layout="wide", page_title="Bitcoin (BTC) Pi Cycle Top Indicator")
 
+# timing of the stages, recorded only with PI_CYCLE_METRICS=1 or for the hidden debug panel (?debug=1)
+show_performance_panel = st.query_params.get('debug') == '1'
+rerun_metrics = start_rerun(collect=show_performance_panel)
+start_metrics_server()
+start_memory_tracing()
+
+# the interactive sections are fragments, a change of their widgets reruns only the section,
+# so the static content below is rendered once per session
 # set the position and width of the content
 left_boarder, content_col, right_boarder = st.columns([1,12,1])
 
-# initiate function to update CSV with historical prices and load the data
-df, data_warning = load_data_for_app()
+# load the shared historical prices (refreshed in the background)
+with stage_timer('load_data_for_app'):
+    df, data_as_of = load_data_for_app()
 
 with content_col:
     # header of the page
     st.header('Bitcoin Pi Cycle Top Indicator', divider = "violet")
 
-    if data_warning:
-        st.warning(data_warning)
+    st.caption(data_as_of)
     
     # add introduction and disclaimer to navigate first-time user to important information
     st.write(""" **Disclaimer: Nothing contained in this web should be considered as investment or trading advice.**  
@@ -49,22 +57,42 @@ with content_col:
              Only rows with values in both columns will be used to calculate the future price estimate in the chart below.
              """)
 
-    # show table with guessed values
-    guess_df = df_with_users_guess()
-
-    # prepare data for plot
-    df_with_guess = prepare_data_for_plot(df, guess_df)
+    # table with guessed values and the chart extended by them, an edit reruns only this fragment
+    scenario_view(df)
+    
+    # answers to "when does it cross" without editing the table scenario by scenario
+    st.write("""### Days to Cross""")
+    st.write("""With a constant daily change, when does SMA111 cross each level of SMA350, and what is the smallest  
+             daily change which crosses it within the given number of days? Empty cells mean no cross within 10 years,
+             or that SMA111 is already above the level.
+             """)
+    with stage_timer('days_to_cross'):
+        days_to_cross(df)
     
-    # make a gap under table to make the UI look nicer
-    st.write("")
-    st.write("")
-    # add heading for the plot
-    st.write("""### Bitcoin (BTC) Pi Cycle Top Indicator Chart""")
-    # plot the data
-    plot_BTC_chart(df_with_guess, df.index[-1])
+    # batch of simulated scenarios instead of the single estimate from the table
+    st.write("""### Monte Carlo Scenarios""")
+    st.write("""Simulate many random price paths and see how often SMA111 undercrosses each level of SMA350.  
+             Daily changes are drawn either from the Bitcoin history or from the entered daily change and volatility.
+             """)
+    with stage_timer('monte_carlo_scenarios'):
+        monte_carlo_scenarios(df)
+    
+    # the same indicator for other assets, ranked by the distance to their next cross
+    st.write("""### Cross-Asset Screener""")
+    st.write("""Rank other assets by how much their SMA111 has to rise to cross the next level of SMA350.  
+             Daily prices are downloaded from Yahoo Finance and refreshed once a day.
+             """)
+    with stage_timer('asset_screener'):
+        asset_screener_view()
     
     # divide the additional information content
     st.write("***")    
-    additional_information()
+    with stage_timer('additional_information'):
+        additional_information()
+
+finish_rerun(rerun_metrics)
+if show_performance_panel:
+    with content_col:
+        performance_panel(rerun_metrics)
 
 
@@ -1,45 +1,92 @@
 # -*- coding: utf-8 -*-
 """
 Data provider for Streamlit app.
-Prefers Yahoo Finance and falls back to local CSV if Yahoo is unavailable.
+Serves the last good data immediately and refreshes them from Yahoo Finance in the background.
+Until the first successful refresh, the local price file is served.
 """
 
 from __future__ import annotations
 
-from datetime import datetime, timezone
+from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from load_update_price_df import fetch_yahoo_btc_data, load_BTC_data
+from perf_metrics import count
+from btc_price_data import fetch_yahoo_data_with_indicators, finished_candles, load_local_snapshot
+from multi_asset_ingestion import DEFAULT_TICKERS, MultiAssetIngestor, TickerResult
+from price_data_refresher import PriceDataRefresher, PriceSnapshot, utc_now
+from price_history import CompactHistory
 
 
-@st.cache_data(show_spinner=False)
-def _get_yahoo_data_cached_for_utc_day(cache_day_utc: str) -> pd.DataFrame:
+def compact_candles(df: pd.DataFrame) -> CompactHistory:
     """
-    Cache BTC data for the current UTC day.
-    Cache invalidates at midnight UTC.
+    Returns validated Date and float32 Close of freshly fetched candles of other assets, without the in-progress day.
     """
-    _ = cache_day_utc
-    df = fetch_yahoo_btc_data()
-    # Ignore the latest row as it can be an in-progress day candle.
-    return df.iloc[:-1, :].copy()
+    return CompactHistory.from_frame(finished_candles(df), close_dtype=np.float32)
 
 
-def load_data_for_app() -> tuple[pd.DataFrame, str | None]:
+@st.cache_resource(show_spinner=False)
+def _get_price_refresher() -> PriceDataRefresher:
     """
-    Loads data for app usage.
-    Primary source: Yahoo API (cached till UTC midnight).
-    Fallback: local CSV in repository.
+    Creates the process-wide refresher and starts its background worker.
+    The refresher and the DataFrames of its snapshots are shared by all sessions and must not be modified.
     """
-    cache_day_utc = datetime.now(timezone.utc).date().isoformat()
+    count('price_refresher_cache_misses')
+    refresher = PriceDataRefresher(fetch_yahoo_data_with_indicators, load_local_snapshot())
+    refresher.start()
+    return refresher
 
-    try:
-        return _get_yahoo_data_cached_for_utc_day(cache_day_utc), None
-    except Exception:
-        fallback_df = load_BTC_data()
-        warning = (
-            "⚠️ Live Yahoo Finance data are temporarily unavailable. "
-            "Loaded fallback data from the local CSV in this repository."
-        )
-        return fallback_df, warning
+
+@st.cache_resource(show_spinner=False)
+def _get_multi_asset_ingestor() -> MultiAssetIngestor:
+    """
+    Creates the process-wide ingestor of other assets, its pooled session and cached data are shared by all sessions.
+    Indicators are not calculated per ticker, the screener calculates them for all assets at once (see asset_screener).
+    """
+    return MultiAssetIngestor(transform=compact_candles)
+
+
+def load_multi_asset_data(tickers: tuple[str, ...] = DEFAULT_TICKERS) -> dict[str, TickerResult]:
+    """
+    Returns compact histories (without the in-progress day) of tickers, fetched concurrently from Yahoo Finance
+    and cached until the next daily close. Tickers which could not be fetched have data None and the error.
+    The returned histories are shared across sessions, treat them as read-only.
+    """
+    return _get_multi_asset_ingestor().fetch(tickers)
+
+
+def describe_snapshot(snapshot: PriceSnapshot, last_error: Exception | None, now: datetime) -> str:
+    """
+    Returns short "data as of" description of the served data for the page.
+    """
+    description = (
+        f"Data as of {snapshot.last_candle_date:%Y-%m-%d} daily close "
+        f"(source: {snapshot.source}, loaded {snapshot.refreshed_at:%Y-%m-%d %H:%M} UTC)."
+    )
+    if last_error is not None and snapshot.is_stale(now):
+        description += " Live Yahoo Finance data are temporarily unavailable, update is retried in the background."
+    return description
+
+
+def load_data_for_app() -> tuple[pd.DataFrame, str]:
+    """
+    Loads data for app usage without waiting for the network.
+    Primary source: Yahoo API, refreshed in the background shortly after UTC midnight.
+    Fallback: local price store (Feather, or CSV if missing) in repository, served until the first successful refresh.
+    Returned DataFrame is shared across sessions, treat it as read-only.
+
+    Returns:
+        DataFrame with indicators of historical data and "data as of" description
+    """
+    count('price_refresher_cache_lookups')
+    refresher = _get_price_refresher()
+    if not refresher.is_running:
+        # no worker thread (e.g. stlite/Pyodide), refresh in the session when due
+        refresher.refresh_if_due()
+
+    snapshot = refresher.snapshot
+    if snapshot.is_stale(utc_now()):
+        count('stale_snapshot_served')
+    return snapshot.df, describe_snapshot(snapshot, refresher.last_error, utc_now())
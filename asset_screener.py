@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Cross-asset screener of the Pi Cycle indicator.
+
+Price series of many assets are stacked into one 2-D array, right-aligned so the last rows of all series share
+the last column (every series keeps its own days, e.g. without weekends for stocks), and SMA_111, SMA_350
+and the crossunders of every level in CROSS_LEVELS are calculated for all assets at once from one cumulative sum
+(see rolling_means). Assets are ranked by the distance of SMA_111 to the next level it has not crossed yet.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from perf_metrics import stage_timer
+from price_history import CompactHistory
+from top_indic_calc import CROSS_LEVELS, SMA_LONG_PERIOD, SMA_SHORT_PERIOD, rolling_means
+
+
+def stack_series(series: dict[str, CompactHistory]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Stacks dates and closes of all series into 2-D arrays, right-aligned on their last rows.
+    Rolling over a row gives the same SMAs as rolling over the series itself.
+
+    Args:
+        series (dict[str, CompactHistory]): ticker -> history
+
+    Returns:
+        datetime64[ns] and float64 arrays of shape (len(series), length of the longest series),
+        shorter series are padded by NaT and NaN at the start
+    """
+    n_days = max((len(history) for history in series.values()), default=0)
+    dates = np.full((len(series), n_days), np.datetime64('NaT'), dtype='datetime64[ns]')
+    prices = np.full((len(series), n_days), np.nan)
+    for row, history in enumerate(series.values()):
+        if len(history):
+            dates[row, -len(history):] = history.dates
+            prices[row, -len(history):] = history.close
+    return dates, prices
+
+
+def last_valid_positions(values: np.ndarray) -> np.ndarray:
+    """
+    Returns position of the last finite value of every row, -1 for rows without any.
+    """
+    finite = np.isfinite(values)
+    positions = values.shape[1]-1-np.argmax(finite[:, ::-1], axis=1)
+    return np.where(finite.any(axis=1), positions, -1)
+
+
+def screen_prices(tickers: list[str], dates: np.ndarray, prices: np.ndarray,
+                  levels: dict[str, float] = CROSS_LEVELS) -> pd.DataFrame:
+    """
+    Calculates the indicator of all assets of the stacked prices (see stack_series) at once
+    and summarizes the last day with both SMAs of each asset.
+
+    Returns:
+        pd.DataFrame: one row per asset, ranked by 'Distance to next cross (%)', i.e. by how much SMA_111 has to rise
+        to cross above the nearest level it is still below (assets above all levels or without SMA_350 are last).
+        'SMA_111 / <m>× SMA_350' columns are the ratios to every level, crossed when it rises above 1.
+    """
+    with stage_timer('screener_sma'):
+        sma_short, sma_long = rolling_means(prices, [SMA_SHORT_PERIOD, SMA_LONG_PERIOD])
+    multipliers = np.fromiter(levels.values(), dtype=float)
+
+    last = last_valid_positions(sma_long)
+    rows = np.arange(len(tickers))
+    has_sma = last >= 0
+    at_last = np.where(has_sma, last, 0)
+    short_last = np.where(has_sma, sma_short[rows, at_last], np.nan)
+    long_last = np.where(has_sma, sma_long[rows, at_last], np.nan)
+    # ratios of shape (n_assets, n_levels)
+    ratios = short_last[:, None]/(multipliers[None, :]*long_last[:, None])
+
+    with stage_timer('screener_crosses'):
+        # crossunders of all levels and assets, the same formula as crossunder
+        scaled_long = multipliers[:, None, None]*sma_long
+        crosses = np.zeros(scaled_long.shape, dtype=bool)
+        crosses[..., 1:] = (sma_short[None, :, 1:] > scaled_long[..., 1:]) & (sma_short[None, :, :-1] <= scaled_long[..., :-1])
+        # the last cross of any level
+        any_cross = crosses.any(axis=0)
+        last_cross = last_valid_positions(np.where(any_cross, 1.0, np.nan))
+        last_cross_level = multipliers[np.argmax(crosses[:, rows, np.maximum(last_cross, 0)], axis=0)]
+
+    # the nearest level above SMA_111 (the ratio to it is the highest ratio below or equal to 1)
+    below = ratios <= 1
+    next_level = np.where(below, ratios, -np.inf).argmax(axis=1)
+    has_next = below.any(axis=1)
+    distance = np.where(has_next, 100*(1/ratios[rows, next_level]-1), np.nan)
+
+    summary = pd.DataFrame({
+        'Ticker': tickers,
+        'Date': np.where(has_sma, dates[rows, at_last], np.datetime64('NaT')),
+        'Close': np.where(has_sma, prices[rows, at_last], np.nan),
+        'SMA_111': short_last,
+        'SMA_350': long_last,
+        **{f'SMA_111 / {multiplier:.3g}× SMA_350': ratios[:, i] for i, multiplier in enumerate(multipliers)},
+        'Next level': np.where(has_next, multipliers[next_level], np.nan),
+        'Distance to next cross (%)': distance,
+        'Last cross': np.where(last_cross >= 0, dates[rows, np.maximum(last_cross, 0)], np.datetime64('NaT')),
+        'Last cross level': np.where(last_cross >= 0, last_cross_level, np.nan),
+    })
+    return summary.sort_values('Distance to next cross (%)', na_position='last', kind='stable', ignore_index=True)
+
+
+def screen_assets(series: dict[str, CompactHistory], levels: dict[str, float] = CROSS_LEVELS) -> pd.DataFrame:
+    """
+    Ranks assets by the distance to the next Pi Cycle cross (see screen_prices).
+
+    Args:
+        series (dict[str, CompactHistory]): ticker -> history of the finished days
+
+    Returns:
+        pd.DataFrame: one row per asset, assets with less than SMA_LONG_PERIOD days have NaN values
+    """
+    with stage_timer('screener_stack'):
+        dates, prices = stack_series(series)
+    return screen_prices(list(series), dates, prices, levels=levels)
+
+
+if __name__ == '__main__':
+    pass
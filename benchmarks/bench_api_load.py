@@ -0,0 +1,110 @@
+"""
+Load test of the local HTTP API of the indicator data (see indicator_api).
+
+Starts `python indicator_api.py --offline --port 0` in a separate process and sends requests over keep-alive
+connections of a local asyncio client for a fixed time per case, then reports requests per second and latency:
+    - GET /v1/indicators as JSON (200, the encoded response is reused),
+    - the same with If-None-Match of its ETag (304 without body),
+    - GET /v1/indicators as Arrow IPC (200),
+    - POST /v1/scenario of one guess table (200, the guessed rows are cached).
+
+Run from the repository root:
+    python benchmarks/bench_api_load.py [--connections 16] [--duration 3]
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parents[1]
+GUESS = json.dumps({'guess': [{'Daily Change (%)': 0.3, 'Period (days)': 400},
+                              {'Daily Change (%)': -0.2, 'Period (days)': 300}]}).encode()
+
+
+def request_bytes(method: str, path: str, headers: dict[str, str] | None = None, body: bytes = b'') -> bytes:
+    head = f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(body)}\r\n"
+    head += ''.join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    return (head+"\r\n").encode()+body
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple[int, dict[str, str], bytes]:
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    headers = {name.lower(): value.strip() for name, _, value in (line.partition(':') for line in head[1:] if line)}
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return int(head[0].split()[1]), headers, body
+
+
+async def fetch_etag(port: int, path: str) -> str:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(request_bytes('GET', path))
+    _, headers, _ = await read_response(reader)
+    writer.close()
+    return headers['etag']
+
+
+async def run_case(port: int, request: bytes, expected_status: int, connections: int,
+                   duration_s: float) -> tuple[int, np.ndarray]:
+    """
+    Sends request over connections concurrent keep-alive connections until duration_s elapses.
+
+    Returns:
+        number of responses and their latencies in seconds
+    """
+    deadline = time.perf_counter()+duration_s
+    latencies: list[float] = []
+
+    async def connection():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        while (start := time.perf_counter()) < deadline:
+            writer.write(request)
+            status, _, _ = await read_response(reader)
+            latencies.append(time.perf_counter()-start)
+            assert status == expected_status, f"expected HTTP {expected_status}, got {status}"
+        writer.close()
+
+    await asyncio.gather(*(connection() for _ in range(connections)))
+    return len(latencies), np.array(latencies)
+
+
+async def load_test(port: int, connections: int, duration_s: float) -> None:
+    etag = await fetch_etag(port, '/v1/indicators')
+    cases = {
+        'GET indicators JSON (200)': (request_bytes('GET', '/v1/indicators'), 200),
+        'GET indicators JSON (304)': (request_bytes('GET', '/v1/indicators', {'If-None-Match': etag}), 304),
+        'GET indicators Arrow (200)': (request_bytes('GET', '/v1/indicators?format=arrow'), 200),
+        'POST scenario (cached)': (request_bytes('POST', '/v1/scenario', body=GUESS), 200),
+    }
+    print(f"{connections} connections, {duration_s:g} s per case")
+    print(f"{'':<28}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, (request, status) in cases.items():
+        n_responses, latencies = await run_case(port, request, status, connections, duration_s)
+        p50, p99 = 1000*np.percentile(latencies, [50, 99])
+        print(f"{name:<28}{n_responses/duration_s:>10.0f}{p50:>10.2f}{p99:>10.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Load test of the local indicator API.')
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds per case')
+    args = parser.parse_args()
+
+    server = subprocess.Popen([sys.executable, 'indicator_api.py', '--offline', '--port', '0'], cwd=ROOT,
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(re.search(r':(\d+)/', server.stdout.readline()).group(1))
+        asyncio.run(load_test(port, args.connections, args.duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark of the chart payload produced by plot_BTC_chart.
+
+Compares figure construction time, JSON serialization time and payload size of:
+    - baseline: the chart code of commit 45c1e09 (see legacy_chart), traces built from Python lists,
+    - arrays: full resolution numpy arrays passed straight to Plotly,
+    - downsampled: numpy arrays reduced by min/max buckets to APP_CHART_MAX_POINTS points per line,
+    - rebuilt: the code before the historical part was cached (see legacy_chart), the whole figure on every rerun,
+    - cached static: the historical part built once (as in the app), only the guessed traces on every rerun.
+The last two are measured with full resolution lines too, where the static part is the largest.
+
+Run from the repository root:
+    python benchmarks/bench_chart_payload.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from BTC_plot_with_future_estimate import APP_CHART_MAX_POINTS, build_BTC_figure, build_static_figure  # noqa: E402
+from load_update_price_df import load_BTC_price_store  # noqa: E402
+from top_indic_calc import add_guess_with_indicators, calc_pi_cycle_indicators  # noqa: E402
+from legacy_chart import build_BTC_figure_baseline, build_BTC_figure_uncached  # noqa: E402
+
+
+REPEATS = 5
+
+
+def measure(build) -> tuple[float, float, int]:
+    """
+    Returns best construction time, best serialization time (both in ms) and payload size in bytes.
+    """
+    build_times, json_times = [], []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fig = build()
+        build_times.append(time.perf_counter()-start)
+        start = time.perf_counter()
+        payload = fig.to_json()
+        json_times.append(time.perf_counter()-start)
+    return 1000*min(build_times), 1000*min(json_times), len(payload.encode())
+
+
+def main() -> None:
+    df = calc_pi_cycle_indicators(load_BTC_price_store())
+    guess_df = pd.DataFrame({'Daily Change (%)': [0.1, -0.05], 'Period (days)': [300, 200]})
+    df_with_guess = add_guess_with_indicators(df, guess_df)
+    last_index = df.index[-1]
+    static_figure = build_static_figure(df, max_points=APP_CHART_MAX_POINTS).to_dict()
+    full_static_figure = build_static_figure(df).to_dict()
+
+    variants = {
+        'baseline': lambda: build_BTC_figure_baseline(df_with_guess, last_index),
+        'arrays': lambda: build_BTC_figure(df_with_guess, last_index),
+        'downsampled': lambda: build_BTC_figure(df_with_guess, last_index, max_points=APP_CHART_MAX_POINTS),
+        'rebuilt': lambda: build_BTC_figure_uncached(df_with_guess, last_index, max_points=APP_CHART_MAX_POINTS),
+        'cached static': lambda: build_BTC_figure(df_with_guess, last_index, max_points=APP_CHART_MAX_POINTS,
+                                                  static_figure=static_figure),
+        'rebuilt (full)': lambda: build_BTC_figure_uncached(df_with_guess, last_index),
+        'cached (full)': lambda: build_BTC_figure(df_with_guess, last_index, static_figure=full_static_figure),
+    }
+    print(f"rows: {len(df_with_guess)}, max points per line: {APP_CHART_MAX_POINTS}")
+    print(f"{'variant':<14} {'build (ms)':>11} {'to_json (ms)':>13} {'payload (kB)':>13}")
+    for name, build in variants.items():
+        build_ms, json_ms, size = measure(build)
+        print(f"{name:<14} {build_ms:>11.1f} {json_ms:>13.1f} {size/1024:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark of the guessed rows of a scenario by its length.
+
+Compares add_guess_to_df of commit 45c1e09 (see legacy_guess), which enlarged the frame by .loc day by day,
+with the current add_guess_to_df building the whole future block at once, on the bundled BTC history.
+
+Run from the repository root:
+    python benchmarks/bench_guess_length.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from load_update_price_df import load_BTC_price_store  # noqa: E402
+from top_indic_calc import add_guess_to_df  # noqa: E402
+from legacy_guess import add_guess_to_df_baseline  # noqa: E402
+
+
+SCENARIO_LENGTHS = [30, 365, 1_000, 3_650]
+# the baseline takes seconds for the longest scenarios
+REPEATS = 3
+
+
+def best_time_ms(function, *args) -> float:
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter()-start)
+    return 1000*min(times)
+
+
+def main() -> None:
+    df = load_BTC_price_store()
+    print(f"history rows: {len(df)}")
+    print(f"{'days':>6} {'baseline (ms)':>14} {'current (ms)':>13} {'speedup':>8}")
+    for n_days in SCENARIO_LENGTHS:
+        guess_df = pd.DataFrame({'Daily Change (%)': [0.3, -0.2], 'Period (days)': [n_days//2, n_days-n_days//2]})
+        baseline_ms = best_time_ms(add_guess_to_df_baseline, df, guess_df)
+        current_ms = best_time_ms(add_guess_to_df, df, guess_df)
+        print(f"{n_days:>6} {baseline_ms:>14.1f} {current_ms:>13.2f} {baseline_ms/current_ms:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
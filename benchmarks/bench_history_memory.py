@@ -0,0 +1,79 @@
+"""
+Benchmark of the compact price history (see price_history.CompactHistory).
+
+Compares memory of the price history of 1 asset (the BTC history) and of 500 synthetic assets of the same length as:
+    - full: the seven columns of the price files (datetime64 Date and six float64 columns),
+    - Date + Close: the two columns used by the indicators, as a DataFrame,
+    - compact float64 / float32: int32 day numbers and the Close array,
+and the time to load the BTC history from each price file with all columns and with Date and Close only.
+
+Run from the repository root:
+    python benchmarks/bench_history_memory.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from load_update_price_df import (  # noqa: E402
+    CSV_FILE_PATH, FEATHER_FILE_PATH, NPZ_FILE_PATH, load_BTC_data, load_BTC_price_store, load_price_npz,
+)
+from price_history import CompactHistory  # noqa: E402
+from synthetic_prices import synthetic_price_history  # noqa: E402
+
+
+N_ASSETS = 500
+REPEATS = 5
+
+
+def best_time_ms(load) -> float:
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        load()
+        times.append(time.perf_counter()-start)
+    return 1000*min(times)
+
+
+def representations(df) -> dict[str, int]:
+    """
+    Returns bytes of every representation of the price history df.
+    """
+    return {
+        'full (7 columns)': int(df.memory_usage(deep=True, index=False).sum()),
+        'Date + Close DataFrame': int(df[['Date', 'Close']].memory_usage(deep=True, index=False).sum()),
+        'compact float64': CompactHistory.from_frame(df).nbytes,
+        'compact float32': CompactHistory.from_frame(df, close_dtype=np.float32).nbytes,
+    }
+
+
+def main() -> None:
+    btc = load_BTC_price_store()
+    single = representations(btc)
+    many = {name: 0 for name in single}
+    for seed in range(N_ASSETS):
+        for name, n_bytes in representations(synthetic_price_history(len(btc), seed=seed)).items():
+            many[name] += n_bytes
+
+    print(f"memory of {len(btc)} days of history")
+    print(f"{'':<24}{'1 asset':>12}{f'{N_ASSETS} assets':>14}")
+    for name in single:
+        print(f"{name:<24}{single[name]/1024:>10.0f} KiB{many[name]/1024**2:>10.1f} MiB")
+
+    print("\nload time of the BTC history (ms, best of {})".format(REPEATS))
+    loaders = {
+        'Feather': (lambda: load_BTC_price_store(FEATHER_FILE_PATH), lambda: CompactHistory.load(FEATHER_FILE_PATH)),
+        'npz': (lambda: load_price_npz(NPZ_FILE_PATH), lambda: CompactHistory.load(NPZ_FILE_PATH)),
+        'CSV': (load_BTC_data, lambda: CompactHistory.load(CSV_FILE_PATH)),
+    }
+    print(f"{'':<10}{'all columns':>14}{'Date + Close':>14}")
+    for name, (load_full, load_compact) in loaders.items():
+        print(f"{name:<10}{best_time_ms(load_full):>14.2f}{best_time_ms(load_compact):>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
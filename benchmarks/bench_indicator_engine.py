@@ -0,0 +1,69 @@
+"""
+Benchmark of the one-pass SMA/crossunder engine (calc_sma_crosses) against the per-column pandas approach
+(calc_simple_moving_average for each window and one pandas expression per multiplier, as crossunder used to do).
+
+Timed for the three Pi Cycle levels and for the full Golden Ratio Multiplier chart (8 multipliers),
+on the repository history and on longer synthetic histories.
+
+Run from the repository root:
+    python benchmarks/bench_indicator_engine.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from load_update_price_df import load_BTC_price_store  # noqa: E402
+from synthetic_prices import synthetic_price_history  # noqa: E402
+from top_indic_calc import (  # noqa: E402
+    CROSS_LEVELS, GOLDEN_RATIO_MULTIPLIERS, SMA_LONG_PERIOD, SMA_SHORT_PERIOD,
+    calc_simple_moving_average, calc_sma_crosses, crossunder_column,
+)
+
+
+REPEATS = 5
+SYNTHETIC_ROWS = [50_000, 500_000]
+
+
+def per_column_pandas(df: pd.DataFrame, multipliers) -> pd.DataFrame:
+    """
+    SMA columns one by one and each crossunder with its own shifted Series.
+    """
+    df = calc_simple_moving_average(df, 'Close', 'SMA_111', SMA_SHORT_PERIOD)
+    df = calc_simple_moving_average(df, 'Close', 'SMA_350', SMA_LONG_PERIOD)
+    crosses = {
+        crossunder_column(m): (df['SMA_111'] > m*df['SMA_350']) & (df['SMA_111'].shift(1) <= m*df['SMA_350'].shift(1))
+        for m in multipliers
+    }
+    return df.assign(**crosses)
+
+
+def best_ms(run) -> float:
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter()-start)
+    return 1000*min(times)
+
+
+def main() -> None:
+    histories = {'repository': load_BTC_price_store()[['Date', 'Close']]}
+    histories.update({f'synthetic {n}': synthetic_price_history(n)[['Date', 'Close']] for n in SYNTHETIC_ROWS})
+    levels = {'pi cycle (3)': tuple(CROSS_LEVELS.values()), 'golden ratio (8)': GOLDEN_RATIO_MULTIPLIERS}
+
+    print(f"{'history':<18} {'rows':>7} {'levels':<17} {'pandas (ms)':>12} {'engine (ms)':>12} {'speedup':>8}")
+    for history_name, df in histories.items():
+        for levels_name, multipliers in levels.items():
+            pandas_ms = best_ms(lambda: per_column_pandas(df, multipliers))
+            engine_ms = best_ms(lambda: calc_sma_crosses(df, multipliers=multipliers))
+            print(f"{history_name:<18} {len(df):>7} {levels_name:<17} {pandas_ms:>12.2f} {engine_ms:>12.2f} "
+                  f"{pandas_ms/engine_ms:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
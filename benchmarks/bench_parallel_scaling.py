@@ -0,0 +1,60 @@
+"""
+Scaling benchmark of the parallel scenario executor (parallel_scenarios).
+
+Times a grid of daily change × period scenarios and a Monte Carlo batch with 1, 2, 4 and 8 workers.
+1 worker runs in the current process without a pool, so the speedups include the pool start-up.
+
+Run from the repository root:
+    python benchmarks/bench_parallel_scaling.py
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from load_update_price_df import load_BTC_price_store  # noqa: E402
+from parallel_scenarios import run_change_period_grid, run_monte_carlo  # noqa: E402
+
+
+WORKER_COUNTS = [1, 2, 4, 8]
+DAILY_CHANGES = list(np.round(np.arange(-0.5, 1.51, 0.1), 2))
+PERIODS = list(range(50, 1001, 50))
+MONTE_CARLO_PATHS = 40_000
+MONTE_CARLO_DAYS = 1000
+
+
+def timed(run) -> float:
+    """
+    Returns wall time of run() in seconds.
+    """
+    start = time.perf_counter()
+    run()
+    return time.perf_counter()-start
+
+
+def main() -> None:
+    df = load_BTC_price_store()
+    stages = {
+        f'grid {len(DAILY_CHANGES)}×{len(PERIODS)}':
+            lambda workers: run_change_period_grid(df, DAILY_CHANGES, PERIODS, max_workers=workers),
+        f'monte carlo {MONTE_CARLO_PATHS}×{MONTE_CARLO_DAYS}':
+            lambda workers: run_monte_carlo(df, MONTE_CARLO_PATHS, MONTE_CARLO_DAYS, max_workers=workers,
+                                            chunk_size=1000, seed=0),
+    }
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'stage':<28} {'workers':>7} {'time (s)':>9} {'speedup':>8}")
+    for name, run in stages.items():
+        baseline = None
+        for workers in WORKER_COUNTS:
+            seconds = timed(lambda: run(workers))
+            baseline = baseline or seconds
+            print(f"{name:<28} {workers:>7} {seconds:>9.2f} {baseline/seconds:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
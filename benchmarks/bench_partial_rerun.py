@@ -0,0 +1,162 @@
+"""
+Reruns of the page per edit of the guess table, measured in Streamlit's AppTest (bare mode, no browser).
+
+Every edit changes ROWS_PER_EDIT rows of the table (one cell change after another, as typed in the browser):
+    - page rerun: every cell change reruns the whole page, as before the table and chart became a fragment,
+    - fragment rerun: every cell change reruns only the scenario_view fragment (the default),
+    - 'Apply' button: the changed rows are sent together by the button of the form, one fragment rerun.
+Reruns, their scope and stages are read from the hidden debug panel (?debug=1, see perf_metrics), the wall time
+of AppTest includes its own overhead (new script thread and parsing of the rendered elements per rerun).
+
+AppTest can neither edit st.data_editor nor rerun a single fragment, its runner is created for every rerun with
+an empty fragment storage. The harness therefore sends the state of the table as the browser does and keeps one
+fragment storage for the session, which relies on the internals of streamlit.testing (Streamlit 1.54).
+
+Run from the repository root:
+    python benchmarks/bench_partial_rerun.py [--edits 10]
+"""
+
+import argparse
+import functools
+import inspect
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+from streamlit.proto.WidgetStates_pb2 import WidgetState, WidgetStates
+from streamlit.runtime.fragment import MemoryFragmentStorage
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+from streamlit.testing.v1 import AppTest, local_script_runner
+
+
+ROOT = Path(__file__).resolve().parents[1]
+ROWS_PER_EDIT = 3
+CHANGE_COLUMN = 'Daily Change (%)'
+
+# the page imports the app modules, as if run from the repository root
+sys.path.insert(0, str(ROOT))
+
+
+class PageSession:
+    """
+    One browser session of the page in AppTest, the fragments registered by a page rerun survive until the next one.
+    """
+
+    def __init__(self):
+        self.app = AppTest.from_file(str(ROOT/'Bitcoin_pi_top_indicator_UI_main.py'), default_timeout=120)
+        self.app.query_params['debug'] = '1'
+        self.fragments = MemoryFragmentStorage()
+        self.widget_states = WidgetStates()
+
+    def rerun(self, widgets: list[WidgetState] = (), fragment: str | None = None) -> float:
+        """
+        Reruns the page, or only the fragment, with widgets changed on top of the last full page rerun.
+
+        Returns:
+            wall time of the rerun in seconds
+        """
+        states = WidgetStates()
+        states.CopyFrom(self.widget_states)
+        changed = {widget.id for widget in widgets}
+        kept = [widget for widget in states.widgets if widget.id not in changed]
+        del states.widgets[:]
+        states.widgets.extend([*kept, *widgets])
+
+        rerun_data = RerunData
+        if fragment is not None:
+            rerun_data = functools.partial(RerunData, fragment_id_queue=[self.fragment_id(fragment)],
+                                           is_fragment_scoped_rerun=True)
+        start = time.perf_counter()
+        with mock.patch.object(local_script_runner, 'MemoryFragmentStorage', lambda: self.fragments), \
+                mock.patch.object(local_script_runner, 'RerunData', rerun_data):
+            self.app._run(states)
+        seconds = time.perf_counter()-start
+        assert not self.app.exception, self.app.exception
+        if fragment is None:
+            self.widget_states = self.app._tree.get_widget_states()
+        return seconds
+
+    def fragment_id(self, name: str) -> str:
+        for fragment_id, wrapped_fragment in self.fragments._fragments.items():
+            if inspect.getclosurevars(wrapped_fragment).nonlocals['non_optional_func'].__name__ == name:
+                return fragment_id
+        raise KeyError(name)
+
+    def reruns_since(self, rerun: int) -> list[dict]:
+        """
+        Returns the reruns recorded by the debug panel after the rerun number rerun.
+        """
+        return [entry for entry in self.app.session_state['performance_history'] if entry['Rerun'] > rerun]
+
+    def last_rerun(self) -> int:
+        return self.app.session_state['performance_reruns']
+
+    def table_id(self) -> str:
+        return next(table.proto.id for table in self.app.dataframe if table.proto.id)
+
+    def button_id(self, label: str) -> str:
+        return next(button.id for button in self.app.button if button.label == label)
+
+
+def table_state(table_id: str, changes: list[float]) -> WidgetState:
+    """
+    Returns the state of the guess table sent by the browser, the default row changed and one row added per change.
+    """
+    state = {'edited_rows': {'0': {CHANGE_COLUMN: changes[0]}},
+             'added_rows': [{CHANGE_COLUMN: change, 'Period (days)': 50} for change in changes[1:]],
+             'deleted_rows': []}
+    return WidgetState(id=table_id, string_value=json.dumps(state))
+
+
+def measure(mode: str, n_edits: int) -> dict:
+    session = PageSession()
+    session.rerun()
+    if mode == 'apply':
+        session.rerun([WidgetState(id=session.app.toggle(key='guess_apply_button').id, bool_value=True)])
+    table_id = session.table_id()
+    fragment = None if mode == 'page' else 'scenario_view'
+
+    wall_seconds, reruns = [], []
+    for edit in range(n_edits):
+        # different values in every edit and mode, so the guessed rows are calculated (not found in the cache)
+        changes = [round(0.1+0.01*edit+0.001*row+{'page': 0, 'fragment': 0.2, 'apply': 0.4}[mode], 6)
+                   for row in range(ROWS_PER_EDIT)]
+        last_rerun = session.last_rerun()
+        seconds = 0.0
+        if mode == 'apply':
+            seconds += session.rerun([table_state(table_id, changes),
+                                      WidgetState(id=session.button_id('Apply'), trigger_value=True)], fragment)
+        else:
+            for n_rows in range(1, ROWS_PER_EDIT+1):
+                seconds += session.rerun([table_state(table_id, changes[:n_rows])], fragment)
+        wall_seconds.append(seconds)
+        reruns.append(session.reruns_since(last_rerun))
+
+    return {
+        'page reruns': statistics.mean(sum(r['Scope'] == 'page' for r in edit) for edit in reruns),
+        'fragment reruns': statistics.mean(sum(r['Scope'] != 'page' for r in edit) for edit in reruns),
+        'static content': statistics.mean(sum('additional_information (ms)' in r for r in edit) for edit in reruns),
+        'app ms': 1000*statistics.median(sum(r['Total (ms)']/1000 for r in edit) for edit in reruns),
+        'AppTest ms': 1000*statistics.median(wall_seconds),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Reruns of the page per edit of the guess table.')
+    parser.add_argument('--edits', type=int, default=10, help='measured edits per mode')
+    args = parser.parse_args()
+
+    modes = {'page rerun (before)': 'page', 'fragment rerun': 'fragment', "'Apply' button": 'apply'}
+    print(f"{args.edits} edits of {ROWS_PER_EDIT} rows per mode, per edit:")
+    print(f"{'':<22}{'page reruns':>13}{'fragment reruns':>17}{'static content':>16}{'app ms':>10}{'AppTest ms':>12}")
+    for name, mode in modes.items():
+        result = measure(mode, args.edits)
+        print(f"{name:<22}{result['page reruns']:>13.1f}{result['fragment reruns']:>17.1f}"
+              f"{result['static content']:>16.1f}{result['app ms']:>10.1f}{result['AppTest ms']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of the startup of the app on the server and of the size of the stlite (Pyodide) build.
+
+Server: every measurement runs in a fresh Python process, so the imports are cold (apart from the OS file cache):
+    - import: import of the app modules (Streamlit included), with the heavy modules which were loaded,
+    - first render: import and the first complete run of the page in Streamlit's AppTest (bare mode, no browser).
+
+stlite: Pyodide cannot run here, so the files and packages downloaded by dist/index.html before the first paint
+are counted. The startup in the browser is measured by the page itself, open it with ?bench=1 to see
+the milliseconds since navigation until the files are loaded, stlite is mounted and the first content is rendered
+(also logged to the browser console).
+
+Run from the repository root:
+    python benchmarks/bench_startup.py
+"""
+
+import json
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+REPEATS = 5
+HEAVY_MODULES = ['plotly.graph_objects', 'requests', 'pyarrow', 'http.server']
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import app_data_loader, top_indicator_content_prep, BTC_plot_with_future_estimate
+seconds = time.perf_counter()-start
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+FIRST_RENDER_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file('Bitcoin_pi_top_indicator_UI_main.py', default_timeout=120)
+app.run()
+assert not app.exception, app.exception
+print(json.dumps({'seconds': time.perf_counter()-start}))
+"""
+
+
+def run_fresh(script: str) -> dict:
+    """
+    Runs script in a new Python process in the repository root and returns the JSON printed on its last line.
+    """
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_server() -> None:
+    imports = [run_fresh(IMPORT_SCRIPT) for _ in range(REPEATS)]
+    renders = [run_fresh(FIRST_RENDER_SCRIPT) for _ in range(REPEATS)]
+    print(f"server import of the app modules: {1000*statistics.median(r['seconds'] for r in imports):8.1f} ms"
+          f"  (heavy modules loaded: {', '.join(imports[0]['loaded']) or 'none'})")
+    print(f"server first render (AppTest):    {1000*statistics.median(r['seconds'] for r in renders):8.1f} ms")
+
+
+def read_requirements(path: Path) -> list[str]:
+    raw = path.read_bytes()
+    text = raw.decode('utf-16') if b'\x00' in raw else raw.decode('utf-8')
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.strip().startswith('#')]
+
+
+def measure_stlite() -> None:
+    html = (ROOT/'dist'/'index.html').read_text()
+    files = re.findall(r'"\.\./([^"]+)"', html)
+    requirements_file = re.search(r'REQUIREMENTS_FILE = "([^"]+)"', html).group(1)
+    # the delta file of the price archive exists only between compactions
+    files_bytes = sum((ROOT/path).stat().st_size for path in files if (ROOT/path).exists())
+    print(f"stlite files: {len(files)} files, {files_bytes/1024:.0f} KiB")
+    for path in ('BTC-USD_price.csv', 'BTC-USD_price.npz'):
+        print(f"    {path}: {(ROOT/path).stat().st_size/1024:.0f} KiB" + (' (shipped)' if path in files else ''))
+    print(f"stlite packages: {len(read_requirements(ROOT/'dist'/requirements_file))} in dist/{requirements_file}, "
+          f"{len(read_requirements(ROOT/'requirements.txt'))} in requirements.txt (server)")
+
+
+if __name__ == '__main__':
+    measure_server()
+    measure_stlite()
@@ -0,0 +1,109 @@
+"""
+Shared fixtures of the benchmark suite and the check against the stored baseline.
+
+Every stage is timed by pytest-benchmark and its peak memory (tracemalloc) is recorded in extra_info.
+The median time and the peak memory are compared with benchmarks/baseline.json and the test fails
+when a stage regresses beyond the tolerance. Record a new baseline (e.g. on a different machine) with:
+    python -m pytest benchmarks --update-baseline
+"""
+
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from synthetic_prices import synthetic_price_history  # noqa: E402
+
+
+BASELINE_PATH = Path(__file__).resolve().parent/'baseline.json'
+HISTORY_SIZES = [5_000, 50_000, 500_000]
+# differences below these limits are never reported as regressions (timer and allocator noise)
+MIN_TIME_REGRESSION_S = 0.002
+MIN_MEMORY_REGRESSION_MIB = 1.0
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('baseline')
+    group.addoption('--update-baseline', action='store_true',
+                    help='store the measured stages as the new benchmarks/baseline.json')
+    group.addoption('--time-tolerance', type=float, default=1.0,
+                    help='allowed relative increase of the median time over the baseline (default 1.0, i.e. 2x)')
+    group.addoption('--memory-tolerance', type=float, default=0.25,
+                    help='allowed relative increase of the peak memory over the baseline (default 0.25)')
+
+
+def pytest_configure(config):
+    config._stage_measurements = {}
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    if config.getoption('--update-baseline') and config._stage_measurements:
+        baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        baseline.update(config._stage_measurements)
+        BASELINE_PATH.write_text(json.dumps(dict(sorted(baseline.items())), indent=2)+'\n')
+
+
+@pytest.fixture(scope='session')
+def baseline() -> dict:
+    return json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+
+
+@pytest.fixture(scope='session', params=HISTORY_SIZES, ids=lambda n: f'{n//1000}k')
+def price_history(request):
+    """
+    Synthetic price history with the schema of BTC-USD_price.csv.
+    """
+    return synthetic_price_history(request.param)
+
+
+def peak_memory_mib(function, *args, **kwargs) -> float:
+    """
+    Returns peak memory (MiB) allocated by Python during one call of function.
+    """
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]/1024**2
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture
+def stage(benchmark, baseline, request):
+    """
+    Times function(*args, **kwargs) with pytest-benchmark, records its peak memory
+    and fails if the stage regressed against the baseline. Returns the result of function.
+    """
+    def run(function, *args, **kwargs):
+        result = benchmark(function, *args, **kwargs)
+        if benchmark.stats is None:
+            # --benchmark-disable, the function was called only once
+            return result
+
+        name = request.node.name
+        measured = {
+            'median_s': benchmark.stats.stats.median,
+            'peak_mib': peak_memory_mib(function, *args, **kwargs),
+        }
+        benchmark.extra_info.update(measured)
+        request.config._stage_measurements[name] = measured
+
+        stored = baseline.get(name)
+        if stored is None or request.config.getoption('--update-baseline'):
+            return result
+        time_limit = max(stored['median_s']*(1+request.config.getoption('--time-tolerance')),
+                         stored['median_s']+MIN_TIME_REGRESSION_S)
+        memory_limit = max(stored['peak_mib']*(1+request.config.getoption('--memory-tolerance')),
+                           stored['peak_mib']+MIN_MEMORY_REGRESSION_MIB)
+        assert measured['median_s'] <= time_limit, (
+            f"{name} regressed: median {measured['median_s']*1000:.2f} ms, baseline {stored['median_s']*1000:.2f} ms")
+        assert measured['peak_mib'] <= memory_limit, (
+            f"{name} regressed: peak memory {measured['peak_mib']:.1f} MiB, baseline {stored['peak_mib']:.1f} MiB")
+        return result
+
+    return run
@@ -0,0 +1,341 @@
+"""
+Previous implementations of the chart, copied unchanged from the git history (only the Streamlit call is left out)
+so the benchmarks compare the current code with the code it replaced:
+    - build_BTC_figure_baseline: plot_BTC_chart of commit 45c1e09, traces built from Python lists and full
+      resolution lines, before numpy arrays and downsampling were used,
+    - build_BTC_figure_uncached: commit 940a648, the whole figure (downsampled numpy arrays) built on every rerun,
+      before the historical part was cached.
+"""
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from BTC_plot_with_future_estimate import CROSSUNDER_COLUMNS, downsample_line
+
+
+def build_BTC_figure_uncached(df: pd.DataFrame, last_index_of_real_data: int, max_points: int | None = None) -> go.Figure:
+    """
+    Builds a chart containing:
+        price history, price future guess, SMA111, SMA350, 1.62*SMA35, 2*SMA350, markers for undercrosses
+    
+    Args:
+        df (pd.DataFrame): historical and guessed data with indicator columns
+        last_index_of_real_data (int): index of the last historical row in df
+        max_points (int | None): maximum number of points of each line, None to keep all points.
+            Points of undercrosses and of the boundary between history and estimate are always kept.
+        
+    Returns:
+        plotly figure
+    """
+    dates = df['Date'].to_numpy()
+    close = df['Close'].to_numpy(dtype=float)
+    sma_111 = df['SMA_111'].to_numpy(dtype=float)
+    sma_350 = df['SMA_350'].to_numpy(dtype=float)
+    
+    # positions which must stay exact when the lines are downsampled
+    crosses = df[CROSSUNDER_COLUMNS].fillna(False).to_numpy(dtype=bool)
+    boundary = df.index.get_loc(last_index_of_real_data)
+    keep = crosses.any(axis=1)
+    keep[boundary:boundary+2] = True
+    
+    # make subsets of data to draw crosses where undercross
+    subset_SMA_350 = crosses[:, 0]
+    subset_162SMA_350 = crosses[:, 1]
+    subset_2SMA_350 = crosses[:, 2]
+    
+    # historical trace ends on the first guessed row so that the two Close traces are connected
+    historical_x, historical_y = downsample_line(dates[:boundary+2], close[:boundary+2], max_points, keep[:boundary+2])
+    estimate_x, estimate_y = downsample_line(dates[boundary+1:], close[boundary+1:], max_points, keep[boundary+1:])
+    
+    # Create figure
+    fig = go.Figure()
+    SMA_width = 1
+    # trace for historical Close price
+    fig.add_trace(
+        go.Scatter(x=historical_x, 
+                   y=historical_y,
+                   name = 'Daily Close Price - Historical',
+                   marker={'color': '#30a347'},
+                   line={'width':1.5},
+                   opacity=1, 
+                   ))
+    # trace for guessed future Close price
+    fig.add_trace(
+        go.Scatter(x=estimate_x, 
+                   y=estimate_y,
+                   name = 'Daily Close Price - Estimate',
+                   marker={'color': '#00ffff'},
+                   line={'width':1.5},
+                   opacity=1, 
+                   ))
+    
+    # traces for SMA
+    SMA_traces = [
+        (sma_111, '111 Days SMA', '#d3444b'),
+        (sma_350, '350 Days SMA', '#d0a300'),
+        (1.618*sma_350, '1.62 × 350 Days SMA', '#edd9b3'),
+        (2*sma_350, '2 × 350 Days SMA', '#a37000'),
+    ]
+    for sma, name, color in SMA_traces:
+        sma_x, sma_y = downsample_line(dates, sma, max_points, keep)
+        fig.add_trace(
+            go.Scatter(x=sma_x, 
+                       y=sma_y,
+                       name = name,
+                       marker={'color': color},
+                       line={'width':SMA_width}
+                       ))
+    
+    # traces for marker of undercross
+    fig.add_trace(
+        go.Scatter(x=dates[subset_SMA_350],
+                   y=1.1*close[subset_SMA_350],
+                   mode="markers+text",
+                   name="unedercross of SMA 350",
+                   #text=["Text D" for i in range(len(subset_SMA_350))],
+                   textposition="top center",
+                   marker_symbol = "cross",
+                   marker_size = 8,
+                   marker_color = "#d0a300"
+                   ))
+    fig.add_trace(
+        go.Scatter(x=dates[subset_162SMA_350],
+                   y=1.1*close[subset_162SMA_350],
+                   mode="markers+text",
+                   name="unedercross of 1.62* SMA 350",
+                   #text=["Text D" for i in range(len(subset_162SMA_350))],
+                   textposition="top center",
+                   marker_symbol = "cross",
+                   marker_size = 12,
+                   marker_color = "#edd9b3"
+                   ))
+    fig.add_trace(
+        go.Scatter(x=dates[subset_2SMA_350],
+                   y=1.1*close[subset_2SMA_350],
+                   mode="markers+text",
+                   name="unedercross of 2* SMA 350",
+                   #text=["Text D" for i in range(len(subset_2SMA_350))],
+                   textposition="top center",
+                   marker_symbol = "cross",
+                   marker_size = 16,
+                   marker_color = "#d3444c"
+                   ))
+        
+    # Set title
+    fig.update_layout(
+        #title_text="Bitcoin (BTC) Pi Cycle Top Indicator",
+        xaxis_title="Date",
+        yaxis_title="Price (USD)"
+    )
+    
+    # Add range slider and allow zooming along y axis
+    fig.update_layout(
+        xaxis=dict(
+    
+            rangeslider=dict(
+                visible=True
+            ),
+            type="date"
+        ),
+        yaxis=dict(fixedrange=False,
+        )
+    )
+    
+    # Add log/linear scale switch buttons
+    updatemenus = [
+        dict(
+            type="buttons",
+            direction="left",
+            buttons=list([
+                dict(
+                    args=[{"yaxis.type": "linear"}],
+                    label="Linear Scale",
+                    method="relayout"
+                ),
+                dict(
+                    args=[{"yaxis.type": "log"}],
+                    label="Log Scale",
+                    method="relayout"
+                )
+            ]),
+            font=dict(color="green"),
+            #showactive=True,
+            x=-0.03,
+            xanchor="right",
+            y=1.1,
+            yanchor="bottom"
+            ),
+    ]  
+    
+    # move the legend above the chart
+    fig.update_layout(legend=dict(
+    orientation="h",
+    yanchor="bottom",
+    y=1,
+    xanchor="center",
+    x=0.5
+    ))
+    
+    
+    fig.update_layout(updatemenus=updatemenus)
+    return fig
+
+
+def build_BTC_figure_baseline(df: pd.DataFrame, last_index_of_real_data: int) -> go.Figure:
+    """
+    Builds a chart containing:
+        price history, price future guess, SMA111, SMA350, 1.62*SMA35, 2*SMA350, markers for undercrosses
+        
+    Returns:
+        plotly figure
+    """
+    # make subsets of data to draw crosses where undercross
+    subset_SMA_350 = df[df['crossunder_SMA_350']==True]
+    subset_162SMA_350 = df[df['crossunder_1.62SMA_350']==True]
+    subset_2SMA_350 = df[df['crossunder_2SMA_350']==True]
+    
+    # Create figure
+    fig = go.Figure()
+    SMA_width = 1
+    # trace for historical Close price
+    fig.add_trace(
+        go.Scatter(x=list(df.loc[0:last_index_of_real_data+1,'Date']), 
+                   y=list(df.loc[0:last_index_of_real_data+1,'Close']),
+                   name = 'Daily Close Price - Historical',
+                   marker={'color': '#30a347'},
+                   line={'width':1.5},
+                   opacity=1, 
+                   ))
+    # trace for guessed future Close price
+    fig.add_trace(
+        go.Scatter(x=list(df.loc[last_index_of_real_data+1:,'Date']), 
+                   y=list(df.loc[last_index_of_real_data+1:,'Close']),
+                   name = 'Daily Close Price - Estimate',
+                   marker={'color': '#00ffff'},
+                   line={'width':1.5},
+                   opacity=1, 
+                   ))
+    
+    # traces for SMA
+    fig.add_trace(
+        go.Scatter(x=list(df.Date), 
+                   y=list(df.SMA_111),
+                   name = '111 Days SMA',
+                   marker={'color': '#d3444b'},
+                   line={'width':SMA_width}
+                   ))
+    fig.add_trace(
+        go.Scatter(x=list(df.Date), 
+                   y=list(df.SMA_350),
+                   name = '350 Days SMA',
+                   marker={'color': '#d0a300'},
+                   line={'width':SMA_width}
+                   ))
+    fig.add_trace(
+        go.Scatter(x=list(df.Date), 
+                   y=list(1.618*df.SMA_350),
+                   name = '1.62 × 350 Days SMA',
+                   marker={'color': '#edd9b3'},
+                   line={'width':SMA_width}
+                   ))
+    fig.add_trace(
+        go.Scatter(x=list(df.Date), 
+                   y=list(2*df.SMA_350),
+                   name = '2 × 350 Days SMA',
+                   marker={'color': '#a37000'},
+                   line={'width':SMA_width}
+                   ))
+    
+    # traces for marker of undercross
+    fig.add_trace(
+        go.Scatter(x=[date for date in subset_SMA_350['Date']],
+                   y=[1.1*i for i in subset_SMA_350['Close']],
+                   mode="markers+text",
+                   name="unedercross of SMA 350",
+                   #text=["Text D" for i in range(len(subset_SMA_350))],
+                   textposition="top center",
+                   marker_symbol = "cross",
+                   marker_size = 8,
+                   marker_color = "#d0a300"
+                   ))
+    fig.add_trace(
+        go.Scatter(x=[date for date in subset_162SMA_350['Date']],
+                   y=[1.1*i for i in subset_162SMA_350['Close']],
+                   mode="markers+text",
+                   name="unedercross of 1.62* SMA 350",
+                   #text=["Text D" for i in range(len(subset_162SMA_350))],
+                   textposition="top center",
+                   marker_symbol = "cross",
+                   marker_size = 12,
+                   marker_color = "#edd9b3"
+                   ))
+    fig.add_trace(
+        go.Scatter(x=[date for date in subset_2SMA_350['Date']],
+                   y=[1.1*i for i in subset_2SMA_350['Close']],
+                   mode="markers+text",
+                   name="unedercross of 2* SMA 350",
+                   #text=["Text D" for i in range(len(subset_2SMA_350))],
+                   textposition="top center",
+                   marker_symbol = "cross",
+                   marker_size = 16,
+                   marker_color = "#d3444c"
+                   ))
+        
+    # Set title
+    fig.update_layout(
+        #title_text="Bitcoin (BTC) Pi Cycle Top Indicator",
+        xaxis_title="Date",
+        yaxis_title="Price (USD)"
+    )
+    
+    # Add range slider and allow zooming along y axis
+    fig.update_layout(
+        xaxis=dict(
+    
+            rangeslider=dict(
+                visible=True
+            ),
+            type="date"
+        ),
+        yaxis=dict(fixedrange=False,
+        )
+    )
+    
+    # Add log/linear scale switch buttons
+    updatemenus = [
+        dict(
+            type="buttons",
+            direction="left",
+            buttons=list([
+                dict(
+                    args=[{"yaxis.type": "linear"}],
+                    label="Linear Scale",
+                    method="relayout"
+                ),
+                dict(
+                    args=[{"yaxis.type": "log"}],
+                    label="Log Scale",
+                    method="relayout"
+                )
+            ]),
+            font=dict(color="green"),
+            #showactive=True,
+            x=-0.03,
+            xanchor="right",
+            y=1.1,
+            yanchor="bottom"
+            ),
+    ]  
+    
+    # move the legend above the chart
+    fig.update_layout(legend=dict(
+    orientation="h",
+    yanchor="bottom",
+    y=1,
+    xanchor="center",
+    x=0.5
+    ))
+    
+    
+    fig.update_layout(updatemenus=updatemenus)
+    return fig
@@ -0,0 +1,34 @@
+"""
+Previous implementation of the guessed rows, copied unchanged from the git history
+so the tests and benchmarks compare the current code with the code it replaced:
+    - add_guess_to_df_baseline: add_guess_to_df of commit 45c1e09, the frame enlarged by .loc day by day.
+"""
+
+import numpy as np
+import pandas as pd
+
+from top_indic_calc import new_row_index
+
+
+def add_guess_to_df_baseline(df: pd.DataFrame, guess_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculates new rows in df based on user guess from guess_df
+    
+    Returns:
+        dataframe with additional rows for Date and Close column
+    """
+    # add rows and calculate Close price based on guess_df
+    first_index_of_guessed_data = new_row_index(df)
+    df_with_guess = df.copy()
+    for index, row in guess_df.iterrows():
+        if np.isnan(row['Period (days)']) or np.isnan(row['Daily Change (%)']):
+            pass
+        else:
+            period_len = row['Period (days)']
+            period_len = int(period_len)
+            multiplier = 1+(row['Daily Change (%)']/100)
+            for i in range(period_len):
+                df_with_guess.loc[first_index_of_guessed_data+i,'Date'] = df_with_guess.loc[first_index_of_guessed_data+i-1,'Date']+pd.Timedelta(days = 1)
+                df_with_guess.loc[first_index_of_guessed_data+i,'Close'] = df_with_guess.loc[first_index_of_guessed_data+i-1,'Close']*multiplier
+            first_index_of_guessed_data += period_len
+    return df_with_guess
@@ -0,0 +1,90 @@
+"""
+Local mock of the Yahoo Finance chart API for the tests and benchmarks of the fetchers.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from synthetic_prices import yahoo_chart_payload
+
+
+class MockYahooServer(ThreadingHTTPServer):
+    """
+    Serves /v8/finance/chart/<ticker> from the given histories, the first visible_rows rows are published
+    (all of them if None). Requests with period1 get the candles since that day, from period_histories
+    if the ticker has one there (e.g. a delta not matching the full history). Tickers starting with FAIL
+    respond with HTTP 500, unknown tickers with 404. Every response is delayed by response_delay_s.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, histories: dict[str, pd.DataFrame], visible_rows: int | None = None,
+                 response_delay_s: float = 0.0):
+        super().__init__(('127.0.0.1', 0), MockYahooHandler)
+        self.histories = histories
+        self.period_histories: dict[str, pd.DataFrame] = {}
+        self.visible_rows = visible_rows
+        self.response_delay_s = response_delay_s
+        self.requests: list[tuple[str, dict]] = []
+        self.connections: set[tuple] = set()
+        self.lock = threading.Lock()
+
+    @property
+    def api_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/v8/finance/chart'
+
+
+class MockYahooHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        ticker = url.path.rsplit('/', 1)[-1]
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        with self.server.lock:
+            self.server.requests.append((ticker, query))
+            self.server.connections.add(self.client_address)
+        time.sleep(self.server.response_delay_s)
+
+        if ticker.startswith('FAIL') or ticker not in self.server.histories:
+            self.send_response(500 if ticker.startswith('FAIL') else 404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        df = self.server.histories[ticker].iloc[:self.server.visible_rows]
+        if 'period1' in query:
+            df = self.server.period_histories.get(ticker, df)
+            df = df[df['Date'] >= pd.Timestamp(int(query['period1']), unit='s')]
+        body = json.dumps(yahoo_chart_payload(df)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def serve_mock_yahoo(*args, **kwargs) -> Iterator[MockYahooServer]:
+    """
+    Runs MockYahooServer(*args, **kwargs) in a background thread for the duration of the block.
+    """
+    server = MockYahooServer(*args, **kwargs)
+    # a short poll interval, so shutting the server down after every test is quick
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
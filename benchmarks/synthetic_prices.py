@@ -0,0 +1,81 @@
+"""
+Synthetic BTC-like price histories and Yahoo Finance chart payloads for the benchmarks.
+
+Run from the repository root to re-record benchmarks/data/yahoo_btc_chart_payload.json
+from the repository price file:
+    python benchmarks/synthetic_prices.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from load_update_price_df import CSV_COLUMNS, load_BTC_data  # noqa: E402
+
+
+YAHOO_PAYLOAD_PATH = Path(__file__).resolve().parent/'data'/'yahoo_btc_chart_payload.json'
+# datetime64[ns] ends in 2262, longer histories get hourly dates (only the order of the dates matters for the calculations)
+MAX_DAILY_ROWS = 90_000
+
+
+def synthetic_price_history(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Returns random walk OHLCV history with the schema of BTC-USD_price.csv.
+
+    Daily log returns have BTC-like drift and volatility, so the SMA lines cross each other repeatedly.
+    """
+    rng = np.random.default_rng(seed)
+    freq = 'D' if n_rows <= MAX_DAILY_ROWS else 'h'
+    dates = pd.date_range('2012-01-01', periods=n_rows, freq=freq)
+
+    # a slow sine in the drift gives bull and bear cycles of ~4 years of daily rows
+    cycle = np.sin(2*np.pi*np.arange(n_rows)/1460)
+    log_returns = rng.normal(0.0015*cycle, 0.035)
+    close = 5*np.exp(np.cumsum(log_returns))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.02, n_rows))
+    df = pd.DataFrame({
+        'Date': dates,
+        'Open': open_,
+        'High': np.maximum(open_, close)*(1+spread),
+        'Low': np.minimum(open_, close)*(1-spread),
+        'Close': close,
+        'Adj Close': close,
+        'Volume': rng.lognormal(20, 1, n_rows).round(),
+    })
+    return df[CSV_COLUMNS]
+
+
+def yahoo_chart_payload(df: pd.DataFrame) -> dict:
+    """
+    Converts price DataFrame to decoded JSON in the format of Yahoo Finance chart API response.
+    """
+    timestamps = (df['Date'].to_numpy(dtype='datetime64[s]').astype(np.int64)).tolist()
+    quote = {column.lower(): df[column].tolist() for column in ['Open', 'High', 'Low', 'Close', 'Volume']}
+    return {
+        'chart': {
+            'result': [{
+                'meta': {'currency': 'USD', 'symbol': 'BTC-USD', 'dataGranularity': '1d', 'range': '50y'},
+                'timestamp': timestamps,
+                'indicators': {'quote': [quote], 'adjclose': [{'adjclose': df['Adj Close'].tolist()}]},
+            }],
+            'error': None,
+        }
+    }
+
+
+def record_yahoo_payload(path: Path = YAHOO_PAYLOAD_PATH) -> None:
+    """
+    Writes the repository price history as Yahoo chart payload (the API is not reachable from CI).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(yahoo_chart_payload(load_BTC_data()), separators=(',', ':')))
+
+
+if __name__ == '__main__':
+    record_yahoo_payload()
@@ -0,0 +1,255 @@
+"""
+Benchmarks of the stages of the app: loading, Yahoo payload parsing, guess calculation, data preparation and chart,
+the API encoding, the price store update and the multi-asset ingestion. The correctness tests are in tests/.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import BTC_plot_with_future_estimate
+import load_update_price_df
+from asset_screener import screen_assets
+from cross_solver import days_to_cross_table
+from BTC_plot_with_future_estimate import APP_CHART_MAX_POINTS, build_BTC_figure, plot_BTC_chart
+from indicator_api import encode_table, indicator_table
+from load_update_price_df import (
+    append_price_delta, fetch_yahoo_btc_data, load_BTC_data, load_BTC_price_store, parse_yahoo_chart_payload,
+    load_price_npz, write_price_csv, write_price_feather, write_price_npz,
+)
+from mock_yahoo import serve_mock_yahoo
+from multi_asset_ingestion import MultiAssetIngestor, create_session
+from synthetic_prices import YAHOO_PAYLOAD_PATH, synthetic_price_history
+from parameter_sweep import MULTIPLIERS, sweep_history
+from price_history import BTC_MAX_GAP_DAYS, CompactHistory
+from scenario_cache import ScenarioCache
+from top_indic_calc import (
+    CROSS_LEVELS, add_guess_to_df, add_guess_with_indicators, calc_guess_rows, calc_pi_cycle_indicators,
+    extend_with_guess,
+)
+from top_indicator_content_prep import prepare_data_for_plot
+
+
+# browser sessions served from one shared history frame
+SESSION_COUNTS = [1, 10, 50]
+# assets of the screener, of different lengths (the shortest ones without SMA_350)
+SCREENER_ASSETS = 300
+SCREENER_DAYS = 5000
+# days of the scenario, from a month to a century (MAX_GUESS_DAYS of the API)
+SCENARIO_LENGTHS = [30, 365, 3_650, 36_500]
+API_HISTORY_ROWS = 5000
+TICKERS = ['BTC-USD', 'ETH-USD', 'SOL-USD', 'ADA-USD', 'XRP-USD', 'DOGE-USD', 'DOT-USD', 'LTC-USD']
+# latency of every response of the mock Yahoo server, the tickers are fetched concurrently
+MOCK_RESPONSE_DELAY_S = 0.05
+
+GUESSES = {
+    'short': pd.DataFrame({'Daily Change (%)': [0.1], 'Period (days)': [100]}),
+    'multi_year': pd.DataFrame({'Daily Change (%)': [0.3, -0.2, 0.15, 0.05], 'Period (days)': [400, 300, 500, 260]}),
+}
+
+
+@pytest.fixture(scope='session')
+def history_with_indicators(price_history):
+    return calc_pi_cycle_indicators(price_history)
+
+
+@pytest.fixture(scope='session')
+def screener_series():
+    return {f'ASSET-{seed}': CompactHistory.from_frame(synthetic_price_history(SCREENER_DAYS-(seed % 15)*330, seed=seed),
+                                                       close_dtype=np.float32)
+            for seed in range(SCREENER_ASSETS)}
+
+
+@pytest.fixture(scope='session')
+def yahoo_payload_text():
+    return YAHOO_PAYLOAD_PATH.read_text()
+
+
+@pytest.fixture(scope='session')
+def btc_history(yahoo_payload_text):
+    # the recorded daily BTC history, the hourly synthetic histories are not valid daily price histories
+    return parse_yahoo_chart_payload(json.loads(yahoo_payload_text))
+
+
+class FakeResponse:
+    """
+    Response of requests.get returning the recorded payload, JSON is decoded on each call as by requests.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def test_load_BTC_data(stage, price_history, tmp_path, monkeypatch):
+    csv_path = tmp_path/'prices.csv'
+    write_price_csv(price_history, output_path=csv_path)
+    monkeypatch.setattr(load_update_price_df, 'CSV_FILE_PATH', csv_path)
+    df = stage(load_BTC_data)
+    assert len(df) == len(price_history)
+
+
+def test_load_BTC_price_store(stage, price_history, tmp_path):
+    feather_path = tmp_path/'prices.feather'
+    write_price_feather(price_history, output_path=feather_path)
+    df = stage(load_BTC_price_store, feather_path)
+    assert len(df) == len(price_history)
+
+
+def test_load_price_npz(stage, price_history, tmp_path):
+    npz_path = tmp_path/'prices.npz'
+    write_price_npz(price_history, output_path=npz_path)
+    df = stage(load_price_npz, npz_path)
+    assert len(df) == len(price_history)
+
+
+@pytest.mark.parametrize('writer', [write_price_feather, write_price_npz], ids=['feather', 'npz'])
+def test_load_compact_history(stage, btc_history, tmp_path, writer):
+    df = btc_history
+    path = tmp_path/f"prices.{writer.__name__.rsplit('_', 1)[-1]}"
+    writer(df, output_path=path)
+    history = stage(CompactHistory.load, path, max_gap_days=BTC_MAX_GAP_DAYS)
+    assert history.days.dtype == np.int32 and len(history) == len(df)
+    # other columns are read only on demand
+    np.testing.assert_array_equal(history.column('Volume'), df['Volume'].to_numpy())
+    pd.testing.assert_frame_equal(history.to_frame(), df[['Date', 'Close']].assign(Date=df['Date'].dt.normalize()))
+
+
+def test_parse_yahoo_chart_payload(stage, yahoo_payload_text):
+    payload = json.loads(yahoo_payload_text)
+    df = stage(parse_yahoo_chart_payload, payload)
+    assert not df.empty
+
+
+def test_fetch_yahoo_btc_data(stage, yahoo_payload_text, monkeypatch):
+    monkeypatch.setattr('requests.get', lambda *args, **kwargs: FakeResponse(yahoo_payload_text))
+    df = stage(fetch_yahoo_btc_data)
+    assert not df.empty
+
+
+@pytest.mark.parametrize('guess', GUESSES)
+def test_add_guess_to_df(stage, price_history, guess):
+    df = stage(add_guess_to_df, price_history, GUESSES[guess])
+    assert len(df) == len(price_history)+GUESSES[guess]['Period (days)'].sum()
+
+
+@pytest.mark.parametrize('cached', [False, True], ids=['computed', 'cache_hit'])
+@pytest.mark.parametrize('guess', GUESSES)
+def test_add_guess_with_indicators(stage, history_with_indicators, guess, cached):
+    cache = ScenarioCache() if cached else None
+    df_with_guess = stage(add_guess_with_indicators, history_with_indicators, GUESSES[guess], cache)
+    assert len(df_with_guess) == len(history_with_indicators)+GUESSES[guess]['Period (days)'].sum()
+    if cached:
+        assert cache.stats()['misses'] == 1
+
+
+@pytest.mark.parametrize('precomputed', [True, False], ids=['cached_indicators', 'raw_history'])
+@pytest.mark.parametrize('guess', GUESSES)
+def test_prepare_data_for_plot(stage, price_history, history_with_indicators, guess, precomputed):
+    df = history_with_indicators if precomputed else price_history
+    df_with_guess = stage(prepare_data_for_plot, df, GUESSES[guess])
+    assert len(df_with_guess) == len(price_history)+GUESSES[guess]['Period (days)'].sum()
+
+
+def hold_sessions(df: pd.DataFrame, guess_df: pd.DataFrame, n_sessions: int) -> list[pd.DataFrame]:
+    """
+    Returns the frames held by n_sessions sessions with the same guess, all of them extending the shared df
+    with a scenario cache shared by the sessions (as in the app).
+    """
+    cache = ScenarioCache()
+    return [extend_with_guess(df, guess_df, cache=cache) for _ in range(n_sessions)]
+
+
+@pytest.mark.parametrize('n_sessions', SESSION_COUNTS)
+def test_session_memory(stage, btc_history, n_sessions):
+    shared = calc_pi_cycle_indicators(btc_history)
+    before = shared.copy()
+    frames = stage(hold_sessions, shared, GUESSES['short'], n_sessions)
+    assert len(frames) == n_sessions
+    # the shared frame is neither modified nor returned to the sessions
+    pd.testing.assert_frame_equal(shared, before)
+    assert all(frame is not shared for frame in frames)
+
+
+@pytest.mark.parametrize('max_points', [None, APP_CHART_MAX_POINTS], ids=['full', 'downsampled'])
+def test_build_BTC_figure(stage, history_with_indicators, max_points):
+    df_with_guess = prepare_data_for_plot(history_with_indicators, GUESSES['short'])
+    fig = stage(build_BTC_figure, df_with_guess, history_with_indicators.index[-1], max_points)
+    assert len(fig.data) > 0
+
+
+def test_plot_BTC_chart(stage, history_with_indicators, monkeypatch):
+    # Streamlit is stubbed, only the figure construction (with the cached static part) is timed
+    monkeypatch.setattr(BTC_plot_with_future_estimate.st, 'plotly_chart', lambda fig, **kwargs: fig)
+    df_with_guess = prepare_data_for_plot(history_with_indicators, GUESSES['short'])
+    fig = stage(plot_BTC_chart, df_with_guess, history_with_indicators.index[-1], APP_CHART_MAX_POINTS)
+    assert len(fig.data) > 0
+
+
+def test_screen_assets(stage, screener_series):
+    ranking = stage(screen_assets, screener_series)
+    assert len(ranking) == SCREENER_ASSETS
+    # the same SMAs as the indicators of every asset on its own
+    for ticker in ranking['Ticker'].iloc[[0, SCREENER_ASSETS//2]]:
+        expected = calc_pi_cycle_indicators(screener_series[ticker].to_frame()).iloc[-1]
+        row = ranking.set_index('Ticker').loc[ticker]
+        np.testing.assert_allclose(row[['SMA_111', 'SMA_350']].to_numpy(dtype=float),
+                                   expected[['SMA_111', 'SMA_350']].to_numpy(dtype=float), rtol=1e-9)
+
+
+def test_days_to_cross_table(stage, history_with_indicators):
+    table = stage(days_to_cross_table, history_with_indicators, 0.2, 365)
+    assert list(table['Level']) == list(CROSS_LEVELS)
+
+
+def test_parameter_sweep(stage, btc_history):
+    result = stage(sweep_history, btc_history)
+    assert len(result) > 100_000
+    assert set(result['multiplier']) == set(MULTIPLIERS)
+
+
+@pytest.mark.parametrize('n_days', SCENARIO_LENGTHS)
+def test_calc_guess_rows_by_length(stage, n_days):
+    history = synthetic_price_history(5_000)
+    guess_df = pd.DataFrame({'Daily Change (%)': [0.3, -0.2], 'Period (days)': [n_days//2, n_days-n_days//2]})
+    rows = stage(calc_guess_rows, history, guess_df)
+    assert len(rows) == n_days
+
+
+@pytest.mark.parametrize('fmt', ['json', 'arrow'])
+def test_encode_indicator_table(stage, fmt):
+    table = indicator_table(calc_pi_cycle_indicators(synthetic_price_history(API_HISTORY_ROWS)))
+    body = stage(encode_table, table, fmt, 'test')
+    assert len(body) > API_HISTORY_ROWS
+
+
+def test_append_price_delta(stage, tmp_path):
+    path = tmp_path/'prices.delta'
+    new_rows = synthetic_price_history(1000).iloc[-2:]
+
+    def daily_update():
+        path.unlink(missing_ok=True)
+        return append_price_delta(new_rows, path)
+
+    assert stage(daily_update) == 2
+
+
+def test_fetch_tickers_concurrently(stage):
+    histories = {ticker: synthetic_price_history(2000, seed=seed) for seed, ticker in enumerate(TICKERS)}
+    with serve_mock_yahoo(histories, response_delay_s=MOCK_RESPONSE_DELAY_S) as server:
+        session = create_session(retries=0)
+
+        def fetch_all():
+            return MultiAssetIngestor(session=session, api_url=server.api_url).fetch(TICKERS)
+
+        results = stage(fetch_all)
+        assert all(result.is_ok and len(result.data) == 2000 for result in results.values())
+        # requests of all rounds reuse the pooled keep-alive connections
+        assert len(server.connections) <= len(TICKERS) < len(server.requests)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Shared BTC dataset with indicators of the historical data, loaded from the local price store or from Yahoo Finance.
+
+The module does not depend on Streamlit, so the same snapshots are served by the app (see app_data_loader)
+and by the HTTP API (see indicator_api).
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from zipfile import BadZipFile
+
+import pandas as pd
+
+from perf_metrics import stage_timer
+from load_update_price_df import (
+    CSV_FILE_PATH, FEATHER_FILE_PATH, NPZ_FILE_PATH, load_BTC_price_store, normalize_price_history,
+    update_btc_data_incremental,
+)
+from price_data_refresher import PriceSnapshot, utc_now
+from price_history import BTC_MAX_FILLED_DAYS, BTC_MAX_GAP_DAYS, CompactHistory, read_price_columns
+from top_indic_calc import calc_pi_cycle_indicators
+
+
+LOGGER = logging.getLogger('pi_cycle.data')
+# price files of the startup snapshot in order of preference: the local price store, then the bundled files
+LOCAL_PRICE_FILES = (FEATHER_FILE_PATH, NPZ_FILE_PATH, CSV_FILE_PATH)
+
+
+def fetch_yahoo_data_with_indicators() -> pd.DataFrame:
+    """
+    Extends the local price store with candles from Yahoo and calculates indicators of the historical data.
+    Only candles newer than the local price store are downloaded.
+    """
+    with stage_timer('fetch_yahoo_data'):
+        df = update_btc_data_incremental(load_BTC_price_store())
+    return historical_indicators(df)
+
+
+def historical_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculates indicators of freshly fetched candles, only their Date and Close are kept (see CompactHistory).
+    Short runs of missing days are filled with the previous close (see normalize_price_history).
+
+    Raises:
+        PriceSchemaError: if the candles are corrupt, e.g. with a longer gap
+    """
+    df = normalize_price_history(finished_candles(df), fill_missing_days=BTC_MAX_FILLED_DAYS)
+    history = CompactHistory.from_frame(df, max_gap_days=BTC_MAX_GAP_DAYS)
+    with stage_timer('history_indicators'):
+        return calc_pi_cycle_indicators(history.to_frame())
+
+
+def finished_candles(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns freshly fetched candles without the latest row, as it can be an in-progress day candle.
+    """
+    return df.iloc[:-1, :]
+
+
+def load_local_history(paths: tuple[Path, ...] = LOCAL_PRICE_FILES) -> CompactHistory:
+    """
+    Loads Date and Close of the first of paths which exists and is valid (short runs of missing days are filled,
+    see normalize_price_history), so the app still starts from the bundled file if the local price store is corrupt.
+
+    Raises:
+        FileNotFoundError: if none of paths exists
+        PriceSchemaError: the error of the first file if none of them is valid (or the error reading it)
+    """
+    errors = []
+    for path in paths:
+        if not path.exists():
+            continue
+        try:
+            df = read_price_columns(path, ['Date', 'Close'])
+            df = normalize_price_history(df, fill_missing_days=BTC_MAX_FILLED_DAYS)
+            return CompactHistory.from_frame(df, max_gap_days=BTC_MAX_GAP_DAYS)
+        except (ValueError, OSError, ImportError, KeyError, BadZipFile) as error:
+            # PriceSchemaError, but also unreadable files (e.g. a truncated CSV, Feather file or NumPy archive)
+            LOGGER.warning("price file %s is not valid, trying the next one: %s", path, error)
+            errors.append(error)
+    if errors:
+        raise errors[0]
+    raise FileNotFoundError(f"none of the price files {[str(path) for path in paths]} exists")
+
+
+def load_local_snapshot() -> PriceSnapshot:
+    """
+    Returns snapshot of the local price store (Feather, the NumPy archive or CSV, the first valid one,
+    see load_local_history) with indicators of the historical data. Only Date and Close are read from the file.
+    """
+    history = load_local_history()
+    return PriceSnapshot(
+        df=calc_pi_cycle_indicators(history.to_frame()),
+        source="local price file",
+        refreshed_at=utc_now(),
+    )
+
+
+if __name__ == '__main__':
+    pass
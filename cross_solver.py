@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Analytic "days-to-cross" solver of the Pi Cycle indicator for a constant daily change.
+
+With a constant daily change the future closes are a geometric sequence, so the window sums of SMA_111 and SMA_350
+on every future day are a suffix sum of the history plus a closed-form geometric sum. All days of a horizon are
+evaluated at once without building the scenario rows (see calc_guess_tail). CrossSolver answers:
+
+- the first day SMA_111 crosses above multiplier × SMA_350 for a given daily change (first_cross_day),
+- the minimum daily change which crosses a level within a number of days (min_daily_change_to_cross), by bisection.
+  The ratio SMA_111 / SMA_350 of every day does not decrease with a higher daily change (the short window holds
+  the newer, faster growing closes), so whether a level is crossed within the days is monotone in the daily change.
+
+The closes are powers of the daily multiplier instead of the cumulative product of calc_guess_rows, so a cross
+decided by the last few bits of floating point rounding may come one day apart from the chart.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from top_indic_calc import CROSS_LEVELS, SMA_LONG_PERIOD, SMA_SHORT_PERIOD
+
+
+# horizon of the search of the first cross
+SOLVER_HORIZON_DAYS = 10*365
+# bracket of the bisection of the daily change (%) and its precision
+DAILY_CHANGE_BOUNDS = (-10.0, 10.0)
+DAILY_CHANGE_TOLERANCE = 1e-6
+
+
+class CrossSolver:
+    """
+    Solver of the crosses after one history. The window sums of the history are precomputed once,
+    every query then evaluates the closed-form sums of all days of the horizon at once.
+
+    Args:
+        history_tail (np.ndarray): at least SMA_LONG_PERIOD last historical closes
+        horizon_days (int): the last future day which can be queried
+    """
+
+    def __init__(self, history_tail: np.ndarray, horizon_days: int = SOLVER_HORIZON_DAYS):
+        if len(history_tail) < SMA_LONG_PERIOD:
+            raise ValueError(f"at least {SMA_LONG_PERIOD} historical closes are needed, got {len(history_tail)}")
+        history_tail = np.asarray(history_tail, dtype=np.float64)[-SMA_LONG_PERIOD:]
+        # sums of the last m historical closes for m = 0, 1, ..., SMA_LONG_PERIOD
+        suffix_sums = np.concatenate(([0.0], np.cumsum(history_tail[::-1])))
+        windows = np.array([[SMA_SHORT_PERIOD], [SMA_LONG_PERIOD]])
+
+        self.horizon_days = horizon_days
+        self.last_close = float(history_tail[-1])
+        self._days = np.arange(horizon_days+1)
+        # number of future closes in the short and long window of every day, shape (2, horizon_days+1)
+        self._n_future = np.minimum(self._days, windows)
+        self._history_sums = suffix_sums[windows-self._n_future]
+        # exponent of the oldest future close in the window relative to the oldest close of the long window
+        # (or to the last close while the long window still holds some history)
+        self._oldest_exponents = self._days-self._n_future+1-np.maximum(self._days-SMA_LONG_PERIOD+1, 0)
+
+    def sma_ratios(self, daily_change_pct: float, n_days: int | None = None) -> np.ndarray:
+        """
+        Returns SMA_111 / SMA_350 of days 0, 1, ..., n_days (horizon_days if None) with a constant daily change (%).
+        Day 0 is the last historical day.
+        """
+        if daily_change_pct <= -100:
+            raise ValueError("daily change must be above -100 %")
+        n_days = self.horizon_days if n_days is None else n_days
+        if n_days > self.horizon_days:
+            raise ValueError(f"{n_days} days are beyond the horizon of {self.horizon_days} days")
+        days = self._days[:n_days+1]
+        n_future = self._n_future[:, :n_days+1]
+        history_sums = self._history_sums[:, :n_days+1]
+
+        # closes of the future days in the window are last_close × multiplier^j for j = day-n_future+1, ..., day,
+        # their sum is geometric. Both sums of one day are divided by the same power of the multiplier so they stay
+        # finite, by the close of the day when the price grows and by the oldest close of the long window
+        # when it falls, which does not change the ratio.
+        log_multiplier = np.log1p(daily_change_pct/100)
+        if log_multiplier > 0:
+            history_sums = history_sums*np.exp(-days*log_multiplier)
+            future_sums = np.expm1(-n_future*log_multiplier)/np.expm1(-log_multiplier)
+        elif log_multiplier < 0:
+            oldest_exponents = self._oldest_exponents[:, :n_days+1]
+            future_sums = np.exp(oldest_exponents*log_multiplier)*np.expm1(n_future*log_multiplier)/np.expm1(log_multiplier)
+        else:
+            future_sums = n_future
+        short_sums, long_sums = history_sums+self.last_close*future_sums
+        return (short_sums/SMA_SHORT_PERIOD)/(long_sums/SMA_LONG_PERIOD)
+
+    def first_cross_day(self, daily_change_pct: float, multiplier: float, within_days: int | None = None) -> int | None:
+        """
+        Returns the first future day when SMA_111 crosses above multiplier × SMA_350 with a constant daily change,
+        the same condition as crossunder: above on the day and not above on the previous day.
+
+        Returns:
+            int | None: number of days after the last historical day,
+            None if there is no cross within within_days (horizon_days if None)
+        """
+        above = self.sma_ratios(daily_change_pct, within_days) > multiplier
+        crosses = np.flatnonzero(above[1:] & ~above[:-1])
+        return int(crosses[0])+1 if len(crosses) else None
+
+    def min_daily_change_to_cross(self, multiplier: float, within_days: int,
+                                  bounds: tuple[float, float] = DAILY_CHANGE_BOUNDS,
+                                  tolerance: float = DAILY_CHANGE_TOLERANCE) -> float | None:
+        """
+        Finds the minimum constant daily change (%) with which SMA_111 crosses above multiplier × SMA_350
+        within within_days days, by bisection of the daily change.
+
+        Returns:
+            float | None: the daily change, at most tolerance above the minimum, None if SMA_111 is already above the level
+            or the level is not crossed even with the upper bound
+        """
+        if self.sma_ratios(0.0, 0)[0] > multiplier:
+            return None
+        low, high = bounds
+        if self.first_cross_day(high, multiplier, within_days) is None:
+            return None
+        if self.first_cross_day(low, multiplier, within_days) is not None:
+            return low
+        # invariant: low does not cross, high crosses
+        while high-low > tolerance:
+            middle = (low+high)/2
+            if self.first_cross_day(middle, multiplier, within_days) is None:
+                low = middle
+            else:
+                high = middle
+        return high
+
+
+def days_to_cross_table(df: pd.DataFrame, daily_change_pct: float, within_days: int,
+                        levels: dict[str, float] = CROSS_LEVELS,
+                        horizon_days: int = SOLVER_HORIZON_DAYS) -> pd.DataFrame:
+    """
+    Solves both questions for every level of the indicator after the history in df.
+
+    Returns:
+        pd.DataFrame: one row per level with the first cross (date and days) with daily_change_pct
+        and the minimum daily change which crosses the level within within_days
+    """
+    solver = CrossSolver(df['Close'].iloc[-SMA_LONG_PERIOD:].to_numpy(dtype=float),
+                         horizon_days=max(horizon_days, within_days))
+    last_date = df['Date'].iloc[-1]
+    rows = []
+    for column, multiplier in levels.items():
+        day = solver.first_cross_day(daily_change_pct, multiplier, horizon_days)
+        rows.append({
+            'Level': column,
+            'First cross': last_date+pd.Timedelta(days=day) if day is not None else pd.NaT,
+            'Days to cross': day,
+            'Min. daily change (%)': solver.min_daily_change_to_cross(multiplier, within_days),
+        })
+    return pd.DataFrame(rows).astype({'Days to cross': 'Int64', 'Min. daily change (%)': float})
+
+
+if __name__ == '__main__':
+    pass
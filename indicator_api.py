@@ -0,0 +1,500 @@
+# -*- coding: utf-8 -*-
+"""
+Local HTTP API of the indicator data, without Streamlit, for dashboards and bots polling the indicator:
+
+    python indicator_api.py --port 8050
+    python indicator_api.py --port 8050 --offline    # serve the local price file only, no Yahoo refresh
+
+Endpoints:
+    GET  /v1/status      version and source of the served data (JSON only)
+    GET  /v1/history     Date and Close of the finished days
+    GET  /v1/indicators  Date, Close, SMA_111 and SMA_350
+    GET  /v1/crosses     Date, Level, Multiplier and Close of every cross of SMA_111 above a level of SMA_350
+    POST /v1/scenario    guessed rows with their indicators, the body is the guess table in the JSON of the picycle
+                         scenario files: {"guess": [{"Daily Change (%)": 0.3, "Period (days)": 200}]}
+
+Tables are JSON ({"version": ..., "columns": [...], "data": [[...], ...]}, NaN as null) by default, or Arrow IPC
+streams with ?format=arrow or the Accept header application/vnd.apache.arrow.stream.
+
+The data are the snapshots of PriceDataRefresher, refreshed after the daily close. Every GET response is encoded
+once per data version (a hash of the served dates and closes) and reused until the snapshot is replaced.
+Its ETag is derived from the version, so pollers
+sending If-None-Match get an empty 304 response, and max-age lasts until the next refresh attempt.
+Scenario responses are cached the same way by the normalized guess table, their rows by ScenarioCache.
+
+The server is a minimal HTTP/1.1 server on asyncio streams (keep-alive, Content-Length request bodies,
+Expect: 100-continue).
+GET requests are answered on the event loop, scenarios are computed in the default thread pool.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.utils import formatdate
+from http import HTTPStatus
+from typing import Callable
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from btc_price_data import fetch_yahoo_data_with_indicators, load_local_snapshot
+from perf_metrics import count, stage_timer
+from picycle import guess_table
+from price_data_refresher import PriceDataRefresher, PriceSnapshot, utc_now
+from scenario_cache import ScenarioCache, guess_hash, normalize_guess
+from top_indic_calc import CROSS_LEVELS, INDICATOR_COLUMNS, calc_guess_tail
+
+
+LOGGER = logging.getLogger('pi_cycle.api')
+DEFAULT_PORT = 8050
+JSON_TYPE = 'application/json'
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+FORMATS = {'json': JSON_TYPE, 'arrow': ARROW_TYPE}
+# limits of the request head and body, a guess table of a few hundred rows is a few KiB
+MAX_HEADERS = 100
+MAX_BODY_BYTES = 1024**2
+# encoded responses kept for the served data version (the few tables and the most recently requested scenarios)
+MAX_CACHED_RESPONSES = 256
+SCENARIO_COLUMNS = ['Date', 'Close', *INDICATOR_COLUMNS]
+
+
+def history_table(df: pd.DataFrame) -> pd.DataFrame:
+    return df[['Date', 'Close']]
+
+
+def indicator_table(df: pd.DataFrame) -> pd.DataFrame:
+    return df[['Date', 'Close', 'SMA_111', 'SMA_350']]
+
+
+def cross_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns one row per cross of SMA_111 above a level of SMA_350 (see CROSS_LEVELS), ordered by Date.
+    """
+    crosses = [df.loc[df[column], ['Date', 'Close']].assign(Level=column, Multiplier=multiplier)
+               for column, multiplier in CROSS_LEVELS.items()]
+    crosses = pd.concat(crosses).sort_values(['Date', 'Multiplier'], kind='stable', ignore_index=True)
+    return crosses[['Date', 'Level', 'Multiplier', 'Close']]
+
+
+# GET endpoints of the tables of the served history
+TABLES: dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    '/v1/history': history_table,
+    '/v1/indicators': indicator_table,
+    '/v1/crosses': cross_table,
+}
+
+
+class APIError(Exception):
+    """
+    Error answered with an HTTP status and a JSON body {"error": message}.
+    """
+
+    def __init__(self, status: HTTPStatus, message: str, headers: dict[str, str] | None = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+@dataclass(frozen=True)
+class Response:
+    status: int
+    body: bytes = b''
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+def json_response(status: int, payload: dict, headers: dict[str, str] | None = None) -> Response:
+    return Response(status, json.dumps(payload).encode(), {'Content-Type': JSON_TYPE, **(headers or {})})
+
+
+def data_version(snapshot: PriceSnapshot) -> str:
+    """
+    Returns version of the snapshot data: the last Date, the number of rows and a hash of all dates and closes,
+    so restated or revised closes of the same days give a new version.
+    """
+    df = snapshot.df
+    digest = hashlib.sha256(df['Date'].to_numpy(dtype='datetime64[ns]').tobytes())
+    digest.update(np.ascontiguousarray(df['Close'].to_numpy(dtype=np.float64)).tobytes())
+    return f"{df['Date'].iloc[-1]:%Y-%m-%d}.{len(df)}.{digest.hexdigest()[:16]}"
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Returns True if the If-None-Match header lists etag or is '*' (weak comparison, as required for GET).
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags
+
+
+def response_format(query: dict[str, list[str]], accept: str) -> str:
+    """
+    Returns 'json' or 'arrow', the format query parameter wins over the Accept header.
+    """
+    if 'format' in query:
+        fmt = query['format'][-1]
+        if fmt not in FORMATS:
+            raise APIError(HTTPStatus.BAD_REQUEST, f"unknown format {fmt!r}, expected one of {sorted(FORMATS)}")
+        return fmt
+    return 'arrow' if ARROW_TYPE in accept else 'json'
+
+
+def encode_table(table: pd.DataFrame, fmt: str, version: str) -> bytes:
+    """
+    Encodes table as JSON (dates as YYYY-MM-DD) or as Arrow IPC stream with the version in the schema metadata.
+    """
+    if fmt == 'arrow':
+        # imported only for Arrow responses
+        import pyarrow as pa
+
+        arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+        metadata = {**(arrow_table.schema.metadata or {}), b'version': version.encode()}
+        arrow_table = arrow_table.replace_schema_metadata(metadata)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+        return sink.getvalue().to_pybytes()
+
+    if 'Date' in table and len(table):
+        table = table.assign(Date=np.datetime_as_string(table['Date'].to_numpy(dtype='datetime64[D]')))
+    # the rows as arrays ("values") are encoded about twice as fast as orient="split"
+    columns = json.dumps(list(table.columns))
+    return f'{{"version": "{version}", "columns": {columns}, "data": {table.to_json(orient="values")}}}'.encode()
+
+
+class IndicatorAPI:
+    """
+    Request handler of the API, independent of the server: handle maps one request to a Response.
+    Encoded responses of the tables and scenarios are shared by all connections until the snapshot of the refresher
+    changes, the least recently used ones are evicted above MAX_CACHED_RESPONSES.
+
+    Args:
+        refresher (PriceDataRefresher): source of the served snapshots, started by the caller if it should refresh
+        cache (ScenarioCache | None): cache of the guessed rows, a new one if None
+        clock (Callable[[], datetime]): returns current timezone-aware time, replaceable in tests
+    """
+
+    def __init__(self, refresher: PriceDataRefresher, cache: ScenarioCache | None = None,
+                 clock: Callable[[], datetime] = utc_now):
+        self.refresher = refresher
+        self.cache = ScenarioCache() if cache is None else cache
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._version: str | None = None
+        # the version of the last served snapshot, the data are hashed once per snapshot
+        self._versioned_snapshot: tuple[PriceSnapshot, str] | None = None
+        self._responses: OrderedDict[tuple[str, ...], Response] = OrderedDict()
+
+    def handle(self, method: str, target: str, headers: dict[str, str], body: bytes = b'') -> Response:
+        """
+        Answers one request, header names are lowercase.
+        """
+        try:
+            return self._route(method, target, headers, body)
+        except APIError as error:
+            count('api_errors')
+            return json_response(error.status, {'error': error.message}, error.headers)
+        except Exception:
+            count('api_errors')
+            LOGGER.exception("%s %s failed", method, target)
+            return json_response(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'internal server error'})
+
+    def _route(self, method: str, target: str, headers: dict[str, str], body: bytes) -> Response:
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path == '/v1/scenario':
+            if method != 'POST':
+                raise APIError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not allowed", {'Allow': 'POST'})
+            return self.scenario(body, response_format(query, headers.get('accept', '')))
+        if url.path != '/v1/status' and url.path not in TABLES:
+            raise APIError(HTTPStatus.NOT_FOUND, f"{url.path} not found")
+        if method not in ('GET', 'HEAD'):
+            raise APIError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not allowed", {'Allow': 'GET, HEAD'})
+
+        snapshot = self.refresher.snapshot
+        if url.path == '/v1/status':
+            return self.status(snapshot)
+        response = self._table_response(snapshot, url.path, response_format(query, headers.get('accept', '')))
+        cache_headers = {'ETag': response.headers['ETag'], 'Cache-Control': self.cache_control()}
+        if etag_matches(headers.get('if-none-match'), response.headers['ETag']):
+            count('api_not_modified')
+            return Response(HTTPStatus.NOT_MODIFIED, headers=cache_headers)
+        return Response(response.status, response.body, {**response.headers, **cache_headers})
+
+    def data_version(self, snapshot: PriceSnapshot) -> str:
+        """
+        Returns data_version of snapshot, computed only once for the current snapshot of the refresher.
+        """
+        versioned = self._versioned_snapshot
+        if versioned is None or versioned[0] is not snapshot:
+            versioned = (snapshot, data_version(snapshot))
+            self._versioned_snapshot = versioned
+        return versioned[1]
+
+    def _table_response(self, snapshot: PriceSnapshot, path: str, fmt: str) -> Response:
+        version = self.data_version(snapshot)
+
+        def build() -> Response:
+            with stage_timer('api_encode'):
+                body = encode_table(TABLES[path](snapshot.df), fmt, version)
+            return Response(HTTPStatus.OK, body,
+                            {'Content-Type': FORMATS[fmt], 'ETag': f'"{version}.{path.rsplit("/", 1)[-1]}.{fmt}"'})
+
+        return self._cached_response(version, (path, fmt), build)
+
+    def _cached_response(self, version: str, key: tuple[str, ...], build: Callable[[], Response]) -> Response:
+        """
+        Returns the response of key for the data version, build() is called only if it is not cached.
+        Concurrent misses of the same key may build it twice, the response is the same.
+        """
+        with self._lock:
+            if version != self._version:
+                # the responses of the previous snapshot are not served anymore
+                self._responses.clear()
+                self._version = version
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+        if response is not None:
+            count('api_response_hits')
+            return response
+
+        count('api_response_misses')
+        response = build()
+        with self._lock:
+            if version == self._version:
+                self._responses[key] = response
+                if len(self._responses) > MAX_CACHED_RESPONSES:
+                    self._responses.popitem(last=False)
+        return response
+
+    def cache_control(self) -> str:
+        """
+        Returns Cache-Control of the GET responses, they do not change until the next refresh attempt.
+        """
+        seconds = int((self.refresher.next_attempt_at-self._clock()).total_seconds())
+        return f'max-age={max(seconds, 0)}'
+
+    def status(self, snapshot: PriceSnapshot) -> Response:
+        now = self._clock()
+        return json_response(HTTPStatus.OK, {
+            'version': self.data_version(snapshot),
+            'last_candle_date': f"{snapshot.last_candle_date:%Y-%m-%d}",
+            'rows': len(snapshot.df),
+            'source': snapshot.source,
+            'refreshed_at': snapshot.refreshed_at.isoformat(),
+            'next_refresh_at': self.refresher.next_attempt_at.isoformat(),
+            'stale': snapshot.is_stale(now),
+            'scenario_cache': self.cache.stats(),
+        }, {'Cache-Control': 'no-store'})
+
+    def scenario(self, body: bytes, fmt: str) -> Response:
+        """
+        Returns the guessed rows of the guess table in body with their indicators (see calc_guess_tail).
+        """
+        try:
+            guess_df = guess_table(json.loads(body), name='request body')
+        except ValueError as error:
+            # including invalid JSON and UTF-8
+            raise APIError(HTTPStatus.BAD_REQUEST, str(error)) from None
+        try:
+            segments = normalize_guess(guess_df)
+        except ValueError as error:
+            raise APIError(HTTPStatus.BAD_REQUEST, f"invalid guess table: {error}") from None
+        snapshot = self.refresher.snapshot
+        version = self.data_version(snapshot)
+
+        def build() -> Response:
+            with stage_timer('api_scenario'):
+                tail = self.cache.get_or_compute(snapshot.df, guess_df, calc_guess_tail)
+            body = encode_table(tail.reindex(columns=SCENARIO_COLUMNS), fmt, version)
+            return Response(HTTPStatus.OK, body, {'Content-Type': FORMATS[fmt], 'Cache-Control': 'no-store'})
+
+        # equivalent guess tables share the response (see normalize_guess)
+        return self._cached_response(version, ('/v1/scenario', fmt, guess_hash(segments)), build)
+
+
+async def read_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter | None = None
+                       ) -> tuple[str, str, str, dict[str, str], bytes] | None:
+    """
+    Reads one request from the connection.
+    A client sending "Expect: 100-continue" waits for the interim 100 Continue response before sending the body,
+    it is written to writer once the head is accepted (a body over MAX_BODY_BYTES is rejected without it).
+
+    Returns:
+        method, target, HTTP version, headers with lowercase names and body, None if the client closed the connection
+    """
+    try:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise APIError(HTTPStatus.BAD_REQUEST, "malformed request line") from None
+
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+            if len(headers) >= MAX_HEADERS:
+                raise APIError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "too many headers")
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+    except ValueError:
+        # a line longer than the limit of the stream reader
+        raise APIError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "request line or header too long") from None
+
+    if 'transfer-encoding' in headers:
+        raise APIError(HTTPStatus.LENGTH_REQUIRED, "request body needs Content-Length")
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise APIError(HTTPStatus.BAD_REQUEST, "invalid Content-Length") from None
+    if length > MAX_BODY_BYTES:
+        raise APIError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"request body is over {MAX_BODY_BYTES} bytes")
+    # HTTP/1.0 clients do not know the expectation, it is ignored for them
+    expect = headers.get('expect', '').lower() if version != 'HTTP/1.0' else ''
+    if expect and expect != '100-continue':
+        raise APIError(HTTPStatus.EXPECTATION_FAILED, f"unsupported expectation {headers['expect']!r}")
+    if expect and length > 0 and writer is not None:
+        writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        await writer.drain()
+    body = await reader.readexactly(length) if length > 0 else b''
+    return method, target, version, headers, body
+
+
+def keep_alive(version: str, headers: dict[str, str]) -> bool:
+    connection = headers.get('connection', '').lower()
+    return 'keep-alive' in connection if version == 'HTTP/1.0' else 'close' not in connection
+
+
+def encode_response(response: Response, keep_open: bool, send_body: bool = True) -> bytes:
+    """
+    Returns status line, headers and body of response (only the headers for HEAD requests).
+    """
+    status = HTTPStatus(response.status)
+    headers = {'Date': formatdate(usegmt=True), 'Connection': 'keep-alive' if keep_open else 'close'}
+    if status != HTTPStatus.NOT_MODIFIED:
+        headers['Content-Length'] = str(len(response.body))
+    headers.update(response.headers)
+    head = f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+    head += ''.join(f"{name}: {value}\r\n" for name, value in headers.items())+"\r\n"
+    return head.encode('latin-1')+(response.body if send_body else b'')
+
+
+async def handle_connection(api: IndicatorAPI, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Answers the requests of one keep-alive connection in order.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                request = await read_request(reader, writer)
+            except APIError as error:
+                count('api_errors')
+                writer.write(encode_response(json_response(error.status, {'error': error.message}), keep_open=False))
+                await writer.drain()
+                break
+            if request is None:
+                break
+            method, target, version, headers, body = request
+            count('api_requests')
+            if method == 'POST':
+                # scenarios are computed in the thread pool, the loop keeps serving the other connections
+                response = await loop.run_in_executor(None, api.handle, method, target, headers, body)
+            else:
+                response = api.handle(method, target, headers, body)
+            keep_open = keep_alive(version, headers)
+            writer.write(encode_response(response, keep_open, send_body=method != 'HEAD'))
+            await writer.drain()
+            if not keep_open:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(api: IndicatorAPI, host: str = '127.0.0.1', port: int = DEFAULT_PORT) -> asyncio.Server:
+    return await asyncio.start_server(lambda reader, writer: handle_connection(api, reader, writer), host, port)
+
+
+class ServerThread:
+    """
+    Runs the server on its own event loop in a daemon thread, e.g. in tests or next to another application.
+    Port 0 binds a free port, see port.
+    """
+
+    def __init__(self, api: IndicatorAPI, host: str = '127.0.0.1', port: int = 0):
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(start_server(api, host, port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._thread = threading.Thread(target=self._loop.run_forever, name='indicator-api', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the server and closes the open connections.
+        """
+        asyncio.run_coroutine_threadsafe(self._close_connections(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _close_connections(self) -> None:
+        self._server.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def build_api(offline: bool = False) -> IndicatorAPI:
+    """
+    Creates the API over the local price file, refreshed from Yahoo Finance in the background unless offline.
+    """
+    refresher = PriceDataRefresher(fetch_yahoo_data_with_indicators, load_local_snapshot())
+    if not offline:
+        refresher.start()
+    return IndicatorAPI(refresher)
+
+
+async def serve(api: IndicatorAPI, host: str, port: int) -> None:
+    server = await start_server(api, host, port)
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"serving the indicator API on http://{host}:{port}/v1", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='indicator_api', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--host', default='127.0.0.1', help='address to bind (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='port to bind, 0 for a free one (default: %(default)s)')
+    parser.add_argument('--offline', action='store_true', help='serve the local price file, do not refresh from Yahoo')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(build_api(args.offline), args.host, args.port))
+    except (OSError, ValueError) as error:
+        # ValueError includes PriceSchemaError of an invalid price file
+        print(f"indicator_api: error: {error}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
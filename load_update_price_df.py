@@ -8,41 +8,265 @@ Created on Thu Feb 29 2024
 
 Description:
     Set of functions for loading and refreshing Bitcoin price data.
+
+    The price store is a snapshot file (Feather, CSV or .npz) with an append-only delta file next to it
+    (e.g. BTC-USD_price.delta). A daily update appends only the new candles to the delta as one checksummed segment,
+    the loaders merge the delta rows into the snapshot. Snapshots are rewritten only by compaction,
+    always into a temporary file renamed over the old one, so a crash never leaves a partially written price file.
 """
 
 from __future__ import annotations
 
+import errno
+import os
+import re
+import struct
+import zlib
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Callable
+from urllib.parse import quote
 
+import numpy as np
 import pandas as pd
-import requests
 
 
-YAHOO_BTC_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/BTC-USD?range=50y&interval=1d"
+YAHOO_CHART_API_URL = "https://query1.finance.yahoo.com/v8/finance/chart"
+YAHOO_BTC_CHART_BASE_URL = f"{YAHOO_CHART_API_URL}/BTC-USD"
+YAHOO_BTC_CHART_URL = f"{YAHOO_BTC_CHART_BASE_URL}?range=50y&interval=1d"
+# Yahoo Finance tickers, e.g. BTC-USD, AAPL, BRK-B, ^GSPC, EURUSD=X, GC=F, 0700.HK
+YAHOO_TICKER_PATTERN = re.compile(r"[A-Za-z0-9^][A-Za-z0-9.=^-]{0,19}")
+# relative tolerance for the Open price of the stored candle repeated in the incremental update
+OVERLAP_CANDLE_RTOL = 1e-6
 CSV_FILE_PATH = Path("BTC-USD_price.csv")
+FEATHER_FILE_PATH = Path("BTC-USD_price.feather")
+# compressed NumPy archive shipped with the stlite build, it needs neither pyarrow nor CSV parsing
+NPZ_FILE_PATH = Path("BTC-USD_price.npz")
 CSV_COLUMNS = ["Date", "Open", "High", "Low", "Close", "Adj Close", "Volume"]
+PRICE_COLUMN_DTYPES = {
+    "Date": "datetime64[ns]",
+    "Open": "float64",
+    "High": "float64",
+    "Low": "float64",
+    "Close": "float64",
+    "Adj Close": "float64",
+    "Volume": "float64",
+}
+# delta file of the snapshot files with the same name, see append_price_delta
+DELTA_SUFFIX = ".delta"
+# the delta segments are merged into the snapshot files once they hold more rows
+COMPACT_AFTER_ROWS = 64
+# header of every delta segment: magic, number of rows and CRC-32 of the rows
+DELTA_SEGMENT_HEADER = struct.Struct("<4sII")
+DELTA_SEGMENT_MAGIC = b"PCD1"
+DELTA_ROW_DTYPE = np.dtype([("Date", "<i4"), *((column, "<f8") for column in CSV_COLUMNS[1:])])
+
+
+class PriceSchemaError(ValueError):
+    """
+    Raised when price history does not satisfy the schema checked by validate_price_history.
+    """
+
+
+def validate_price_history(df: pd.DataFrame, max_gap_days: int | None = None) -> np.ndarray:
+    """
+    Validates Date and Close of price history once at ingestion, so the indicator and chart code can rely on them:
+    one row per day with strictly increasing dates (at most max_gap_days apart unless it is None)
+    and a positive finite Close.
+
+    Returns:
+        np.ndarray: int32 days since 1970-01-01 of the rows (the time of the day, e.g. of the in-progress candle, is dropped)
+
+    Raises:
+        PriceSchemaError: describing the first violation
+    """
+    missing = [column for column in ("Date", "Close") if column not in df.columns]
+    if missing:
+        raise PriceSchemaError(f"price history is missing columns {missing}")
+    if not pd.api.types.is_datetime64_dtype(df["Date"]):
+        raise PriceSchemaError(f"Date must be datetime64 without time zone, got {df['Date'].dtype}")
+
+    dates = df["Date"].to_numpy(dtype="datetime64[ns]")
+    if np.isnat(dates).any():
+        raise PriceSchemaError("Date contains missing values")
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    steps = np.diff(days)
+    if (steps <= 0).any():
+        position = int(np.argmax(steps <= 0))+1
+        problem = "duplicate date" if steps[position-1] == 0 else "date out of order"
+        raise PriceSchemaError(f"{problem} {dates[position].astype('datetime64[D]')} (row {position})")
+    if max_gap_days is not None and (steps > max_gap_days).any():
+        position = int(np.argmax(steps > max_gap_days))+1
+        raise PriceSchemaError(f"gap of {steps[position-1]} days before {dates[position].astype('datetime64[D]')}")
+
+    close = df["Close"].to_numpy(dtype=np.float64)
+    invalid_close = ~(np.isfinite(close) & (close > 0))
+    if invalid_close.any():
+        position = int(np.argmax(invalid_close))
+        raise PriceSchemaError(f"invalid Close {close[position]} on {dates[position].astype('datetime64[D]')}")
+    return days.astype(np.int32)
+
+
+def normalize_price_history(df: pd.DataFrame, fill_missing_days: int = 0) -> pd.DataFrame:
+    """
+    Repairs the recoverable problems of fetched price history before validate_price_history, which still rejects
+    corrupt data (missing dates, invalid closes and longer gaps): the rows are sorted by Date, of the rows
+    of the same day only the last one is kept (e.g. a candle repeated by Yahoo) and gaps of at most
+    fill_missing_days missing days are filled with the previous Close (as Open, High, Low and Adj Close,
+    with zero Volume). Returns df itself if there is nothing to repair.
+    """
+    days = df["Date"].to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    steps = np.diff(days).astype(np.int64)
+    if (steps <= 0).any():
+        df = df.sort_values("Date", kind="stable")
+        df = df[~df["Date"].dt.normalize().duplicated(keep="last")].reset_index(drop=True)
+        days = df["Date"].to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+        steps = np.diff(days).astype(np.int64)
+
+    gaps = np.flatnonzero((steps > 1) & (steps <= fill_missing_days+1))
+    if len(gaps) == 0:
+        return df
+    n_missing = steps[gaps]-1
+    previous = np.repeat(gaps, n_missing)
+    offsets = np.arange(len(previous))-np.repeat(np.cumsum(n_missing)-n_missing, n_missing)+1
+    close = df["Close"].to_numpy()[previous]
+    filled = pd.DataFrame({column: close for column in df.columns if column not in ("Date", "Volume")})
+    filled["Date"] = (days[previous]+offsets).astype("datetime64[ns]")
+    if "Volume" in df.columns:
+        filled["Volume"] = 0.0
+    filled = pd.concat([df, filled[df.columns].astype(df.dtypes.to_dict())], ignore_index=True)
+    return filled.sort_values("Date", kind="stable", ignore_index=True)
 
 
 def load_BTC_data() -> pd.DataFrame:
     """
-    Loads the repository CSV file containing historical BTC prices.
+    Loads the repository CSV file containing historical BTC prices, with the rows of its delta file.
     """
     df = pd.read_csv(CSV_FILE_PATH)
     df["Date"] = pd.to_datetime(df["Date"])
-    return df
+    return with_price_delta(df, CSV_FILE_PATH)
+
+
+def load_BTC_price_store(path: Path | None = None) -> pd.DataFrame:
+    """
+    Loads historical BTC prices from the typed Feather (Arrow IPC) file, with the rows of its delta file.
+
+    The file is uncompressed, so it is memory-mapped and the columns do not need any parsing.
+    Without path, the repository Feather file is loaded, falling back to the NumPy archive and then
+    to the repository CSV file if it does not exist. An explicitly given path is never replaced by them.
+
+    Raises:
+        FileNotFoundError: if path does not exist
+    """
+    if path is None:
+        path = FEATHER_FILE_PATH
+        if not path.exists():
+            if NPZ_FILE_PATH.exists():
+                return load_price_npz(NPZ_FILE_PATH)
+            return load_BTC_data()
+    elif not Path(path).exists():
+        raise FileNotFoundError(errno.ENOENT, "price file not found", str(path))
+
+    from pyarrow import feather
+
+    table = feather.read_table(path, memory_map=True)
+    return with_price_delta(table.to_pandas(), path)
+
+
+def load_price_npz(path: Path = NPZ_FILE_PATH) -> pd.DataFrame:
+    """
+    Loads historical BTC prices from the compressed NumPy archive written by write_price_npz,
+    with the rows of its delta file.
+    """
+    with np.load(path) as archive:
+        columns = {column: archive[column] for column in CSV_COLUMNS}
+    columns["Date"] = columns["Date"].astype("datetime64[D]").astype("datetime64[ns]")
+    return with_price_delta(pd.DataFrame(columns), path)
 
 
-def fetch_yahoo_btc_data(url: str = YAHOO_BTC_CHART_URL) -> pd.DataFrame:
+def delta_path(path: Path) -> Path:
+    """
+    Returns the delta file of snapshot file path, shared by the Feather, CSV and .npz files of the same name.
+    """
+    return Path(path).with_suffix(DELTA_SUFFIX)
+
+
+def read_price_delta(path: Path) -> tuple[pd.DataFrame, int]:
+    """
+    Reads the complete segments of delta file (see append_price_delta). A segment cut off by an interrupted write
+    or with a wrong checksum ends the delta, it and anything after it are ignored.
+
+    Returns:
+        rows of the segments in the order they were appended (CSV_COLUMNS) and the number of bytes of the segments
+    """
+    try:
+        data = Path(path).read_bytes()
+    except FileNotFoundError:
+        data = b""
+    segments = []
+    offset = 0
+    while offset+DELTA_SEGMENT_HEADER.size <= len(data):
+        magic, n_rows, checksum = DELTA_SEGMENT_HEADER.unpack_from(data, offset)
+        start = offset+DELTA_SEGMENT_HEADER.size
+        end = start+n_rows*DELTA_ROW_DTYPE.itemsize
+        if magic != DELTA_SEGMENT_MAGIC or end > len(data) or zlib.crc32(data[start:end]) != checksum:
+            break
+        segments.append(np.frombuffer(data, DELTA_ROW_DTYPE, n_rows, start))
+        offset = end
+
+    rows = np.concatenate(segments) if segments else np.empty(0, DELTA_ROW_DTYPE)
+    columns = {column: rows[column] for column in CSV_COLUMNS}
+    columns["Date"] = rows["Date"].astype("datetime64[D]").astype("datetime64[ns]")
+    return pd.DataFrame(columns), offset
+
+
+def apply_price_delta(df: pd.DataFrame, delta_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns df with the rows of delta_df (only the columns of df, which must include Date). A delta row replaces
+    the row of the same day, e.g. the in-progress candle of the previous update, later delta rows replace earlier ones.
+    """
+    if delta_df.empty:
+        return df
+    merged = pd.concat([df, delta_df[list(df.columns)]], ignore_index=True)
+    merged = merged[~merged["Date"].dt.normalize().duplicated(keep="last")]
+    return merged.sort_values("Date", kind="stable", ignore_index=True)
+
+
+def with_price_delta(df: pd.DataFrame, path: Path) -> pd.DataFrame:
+    """
+    Returns df loaded from snapshot file path with the rows of its delta file, if there is one.
+    """
+    return apply_price_delta(df, read_price_delta(delta_path(path))[0])
+
+
+def fetch_yahoo_btc_data(url: str = YAHOO_BTC_CHART_URL, session=None) -> pd.DataFrame:
     """
     Fetches full historical BTC daily OHLCV data from Yahoo Finance chart API.
+    Any ticker can be fetched with its URL (see yahoo_chart_base_url).
+
+    Args:
+        session (requests.Session | None): session with pooled keep-alive connections, a new connection if None
 
     Returns:
         DataFrame with the same schema as BTC-USD_price.csv.
     """
-    response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+    # imported on first use, the app starts (and the stlite build runs) without it
+    import requests
+
+    response = (session or requests).get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
     response.raise_for_status()
-    payload = response.json()
+    return parse_yahoo_chart_payload(response.json())
+
+
+def parse_yahoo_chart_payload(payload: dict) -> pd.DataFrame:
+    """
+    Converts decoded JSON of Yahoo Finance chart API response to price DataFrame.
+    The candles are validated by validate_price_history, gaps are allowed (e.g. weekends of stocks).
+    Unordered and repeated candles of the same day are normalized first (see normalize_price_history).
 
+    Returns:
+        DataFrame with the same schema as BTC-USD_price.csv.
+    """
     result = payload.get("chart", {}).get("result")
     if not result:
         raise ValueError("Yahoo response did not contain chart result data.")
@@ -69,17 +293,150 @@ def fetch_yahoo_btc_data(url: str = YAHOO_BTC_CHART_URL) -> pd.DataFrame:
 
     df = df.dropna(subset=["Close"]).copy()
     df = df[CSV_COLUMNS]
-    df.sort_values(by="Date", inplace=True, ignore_index=True)
+    # stable, so of the candles with the same timestamp the last one is kept
+    df.sort_values(by="Date", inplace=True, ignore_index=True, kind="stable")
+    df = normalize_price_history(df)
+    validate_price_history(df)
     return df
 
 
+def is_valid_ticker(ticker: str) -> bool:
+    """
+    Returns True if ticker looks like a Yahoo Finance ticker (see YAHOO_TICKER_PATTERN).
+    """
+    return YAHOO_TICKER_PATTERN.fullmatch(ticker) is not None
+
+
+def yahoo_chart_base_url(ticker: str, api_url: str = YAHOO_CHART_API_URL) -> str:
+    """
+    Returns Yahoo Finance chart API URL of ticker (e.g. ETH-USD), without query parameters.
+    The ticker is user input, it is validated and percent-encoded as one path segment.
+
+    Raises:
+        ValueError: ticker is not a valid Yahoo Finance ticker
+    """
+    if not is_valid_ticker(ticker):
+        raise ValueError(f"Invalid Yahoo Finance ticker: {ticker!r}.")
+    return f"{api_url}/{quote(ticker, safe='')}"
+
+
+def build_yahoo_period_url(period1: int, period2: int, base_url: str = YAHOO_BTC_CHART_BASE_URL) -> str:
+    """
+    Returns Yahoo Finance chart API URL for daily candles between two unix timestamps.
+    """
+    return f"{base_url}?period1={period1}&period2={period2}&interval=1d"
+
+
+def update_btc_data_incremental(
+    df: pd.DataFrame,
+    base_url: str = YAHOO_BTC_CHART_BASE_URL,
+    now: datetime | None = None,
+    session=None,
+) -> pd.DataFrame:
+    """
+    Extends stored BTC price history with candles published since its last Date.
+
+    Only candles from the last stored Date up to now are requested. The first returned
+    candle must repeat the last stored one (same day, same Open price); it replaces the
+    stored row, because that row may have been an in-progress candle, and newer candles are appended.
+    Falls back to full history download when the stored history is empty, when the overlap
+    candle is missing (gap in data) or when its Open differs (restated data).
+    Other tickers are updated with their base_url, session is passed to fetch_yahoo_btc_data.
+
+    Returns:
+        DataFrame with the same schema as BTC-USD_price.csv.
+    """
+    if df.empty:
+        return fetch_yahoo_btc_data(f"{base_url}?range=50y&interval=1d", session=session)
+
+    now = now or datetime.now(timezone.utc)
+    last_date = pd.Timestamp(df["Date"].iloc[-1]).normalize()
+    period1 = int(last_date.tz_localize("UTC").timestamp())
+    new_df = fetch_yahoo_btc_data(build_yahoo_period_url(period1, int(now.timestamp()), base_url=base_url),
+                                  session=session)
+    new_df = new_df[new_df["Date"].dt.normalize() >= last_date].reset_index(drop=True)
+
+    overlap_matches = (
+        not new_df.empty
+        and new_df["Date"].iloc[0].normalize() == last_date
+        and np.isclose(new_df["Open"].iloc[0], df["Open"].iloc[-1], rtol=OVERLAP_CANDLE_RTOL)
+    )
+    if not overlap_matches:
+        return fetch_yahoo_btc_data(f"{base_url}?range=50y&interval=1d", session=session)
+
+    updated_df = pd.concat([df[CSV_COLUMNS].iloc[:-1], new_df], ignore_index=True)
+    return updated_df
+
+
+def append_price_delta(df: pd.DataFrame, path: Path) -> int:
+    """
+    Appends rows of df (e.g. the new daily candles) to delta file as one segment: a header with the number of rows
+    and the CRC-32 of the rows, then the rows packed as int32 days and float64 columns. Only the segment is written,
+    a segment cut off by an earlier interrupted write is truncated first. The file is flushed to the disk.
+
+    Returns:
+        int: number of rows in the delta file
+    """
+    clean_df = df[CSV_COLUMNS].astype(PRICE_COLUMN_DTYPES)
+    rows = np.empty(len(clean_df), DELTA_ROW_DTYPE)
+    rows["Date"] = clean_df["Date"].to_numpy().astype("datetime64[D]").astype(np.int32)
+    for column in CSV_COLUMNS[1:]:
+        rows[column] = clean_df[column].to_numpy()
+    payload = rows.tobytes()
+
+    stored_df, valid_bytes = read_price_delta(path)
+    with open(path, "ab") as file:
+        file.truncate(valid_bytes)
+        file.write(DELTA_SEGMENT_HEADER.pack(DELTA_SEGMENT_MAGIC, len(rows), zlib.crc32(payload))+payload)
+        file.flush()
+        os.fsync(file.fileno())
+    return len(stored_df)+len(rows)
+
+
+def replace_file_atomically(output_path: Path, write: Callable[[Path], None]) -> None:
+    """
+    Writes file by write(temporary path) next to output_path and renames it over output_path, so readers
+    (including the ones which memory-mapped the old file) and crashes see either the old or the complete new file.
+    """
+    output_path = Path(output_path)
+    # the temporary file keeps the suffix, some writers (np.savez_compressed) add it otherwise
+    temp_path = output_path.with_name(f"{output_path.stem}.tmp{output_path.suffix}")
+    try:
+        write(temp_path)
+        with open(temp_path, "rb+") as file:
+            os.fsync(file.fileno())
+        os.replace(temp_path, output_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
 def write_price_csv(df: pd.DataFrame, output_path: Path = CSV_FILE_PATH) -> None:
     """
-    Writes BTC price DataFrame to CSV using canonical column order.
+    Writes BTC price DataFrame to CSV using canonical column order, the file is replaced atomically.
+    """
+    replace_file_atomically(
+        output_path, lambda path: df[CSV_COLUMNS].to_csv(path, index=False, date_format="%Y-%m-%d"))
+
+
+def write_price_feather(df: pd.DataFrame, output_path: Path = FEATHER_FILE_PATH) -> None:
+    """
+    Writes BTC price DataFrame to uncompressed Feather file using canonical column order and dtypes,
+    the file is replaced atomically.
+    """
+    clean_df = df[CSV_COLUMNS].astype(PRICE_COLUMN_DTYPES).reset_index(drop=True)
+    clean_df["Date"] = clean_df["Date"].dt.normalize()
+    replace_file_atomically(output_path, lambda path: clean_df.to_feather(path, compression="uncompressed"))
+
+
+def write_price_npz(df: pd.DataFrame, output_path: Path = NPZ_FILE_PATH) -> None:
+    """
+    Writes BTC price DataFrame to compressed NumPy archive, Date is stored as int32 days since 1970-01-01.
+    The file is replaced atomically.
     """
-    clean_df = df.copy()
-    clean_df["Date"] = pd.to_datetime(clean_df["Date"]).dt.strftime("%Y-%m-%d")
-    clean_df.to_csv(output_path, index=False)
+    clean_df = df[CSV_COLUMNS].astype(PRICE_COLUMN_DTYPES).reset_index(drop=True)
+    columns = {column: clean_df[column].to_numpy() for column in CSV_COLUMNS}
+    columns["Date"] = columns["Date"].astype("datetime64[D]").astype(np.int32)
+    replace_file_atomically(output_path, lambda path: np.savez_compressed(path, **columns))
 
 
 def generate_csv_from_yahoo(output_path: Path = CSV_FILE_PATH) -> pd.DataFrame:
@@ -91,5 +448,92 @@ def generate_csv_from_yahoo(output_path: Path = CSV_FILE_PATH) -> pd.DataFrame:
     return df
 
 
+def appended_rows(stored_df: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame | None:
+    """
+    Returns rows of updated history df from the last day of stored_df on (its possibly in-progress candle
+    is replaced by the update), None if an earlier row differs, e.g. after a full download of restated history.
+    """
+    n_kept = len(stored_df)-1
+    if stored_df.empty or len(df) < n_kept:
+        return None
+    kept = df[CSV_COLUMNS].iloc[:n_kept].reset_index(drop=True)
+    if not kept.equals(stored_df[CSV_COLUMNS].iloc[:n_kept].reset_index(drop=True)):
+        return None
+    return df.iloc[n_kept:]
+
+
+def compact_price_store(
+    df: pd.DataFrame,
+    feather_path: Path = FEATHER_FILE_PATH,
+    csv_path: Path | None = CSV_FILE_PATH,
+    npz_path: Path | None = NPZ_FILE_PATH,
+    restated: bool = False,
+) -> None:
+    """
+    Writes the whole history df as the new snapshot files (each replaced atomically) and removes their delta files.
+
+    The deltas are removed after the snapshots, a crash in between leaves a delta whose rows are already
+    in the snapshots, so applying it again does not change them. If df restates rows of the delta
+    (restated, e.g. a full download), the deltas are removed first, a crash then serves the previous snapshots
+    until the next update downloads the missing candles again.
+    """
+    snapshot_paths = [path for path in (feather_path, csv_path, npz_path) if path is not None]
+    delta_paths = {delta_path(path) for path in snapshot_paths}
+    if restated:
+        for path in delta_paths:
+            path.unlink(missing_ok=True)
+    write_price_feather(df, output_path=feather_path)
+    if csv_path is not None:
+        write_price_csv(df, output_path=csv_path)
+    if npz_path is not None:
+        write_price_npz(df, output_path=npz_path)
+    for path in delta_paths:
+        path.unlink(missing_ok=True)
+
+
+def update_price_store_from_yahoo(
+    feather_path: Path = FEATHER_FILE_PATH,
+    csv_path: Path | None = CSV_FILE_PATH,
+    npz_path: Path | None = NPZ_FILE_PATH,
+    compact_after_rows: int = COMPACT_AFTER_ROWS,
+) -> pd.DataFrame:
+    """
+    Pipeline step that appends new Yahoo BTC candles to the Feather price store.
+    CSV and the NumPy archive of the stlite build are exported next to it unless their path is None.
+
+    The new candles are appended to the delta files of the snapshots (see append_price_delta), so the daily update
+    writes only them. The snapshots are compacted once the delta holds more than compact_after_rows rows
+    or when earlier rows changed. The stlite build ships the delta file next to the NumPy archive and
+    load_price_npz merges it in, so the archive is rewritten only by compaction too.
+    """
+    # only the repository price store falls back to the other repository files
+    stored_df = load_BTC_price_store(None if feather_path == FEATHER_FILE_PATH else feather_path)
+    df = update_btc_data_incremental(stored_df)
+    new_rows = appended_rows(stored_df, df)
+    delta_paths = {delta_path(path) for path in (feather_path, csv_path, npz_path) if path is not None}
+    n_delta_rows = max(len(read_price_delta(path)[0]) for path in delta_paths)
+    if new_rows is None or n_delta_rows+len(new_rows) > compact_after_rows:
+        compact_price_store(df, feather_path, csv_path, npz_path, restated=new_rows is None)
+        return df
+
+    for path in delta_paths:
+        append_price_delta(new_rows, path)
+    return df
+
+
+def generate_price_store_from_yahoo(
+    feather_path: Path = FEATHER_FILE_PATH,
+    csv_path: Path | None = CSV_FILE_PATH,
+    npz_path: Path | None = NPZ_FILE_PATH,
+) -> pd.DataFrame:
+    """
+    Pipeline step that fetches Yahoo BTC data and writes the Feather price store.
+    CSV and the NumPy archive of the stlite build are exported next to it unless their path is None.
+    """
+    df = fetch_yahoo_btc_data()
+    compact_price_store(df, feather_path, csv_path, npz_path, restated=True)
+    return df
+
+
 if __name__ == "__main__":
-    generate_csv_from_yahoo()
+    update_price_store_from_yahoo()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent ingestion of daily candles of a basket of assets (BTC-USD, ETH-USD, SOL-USD, ...) from Yahoo Finance.
+
+Tickers are fetched in a thread pool over one requests session, so the connections to Yahoo are pooled and kept alive.
+Every ticker is cached until shortly after the next daily close (UTC midnight), the same schedule as the refresh
+of the BTC data of the app (see price_data_refresher), and later refreshes download only the new candles.
+A failed ticker does not fail the others: its last good data are served with the error until a retry succeeds.
+The tickers are user input, so at most max_tickers of them are cached, the least recently requested are evicted.
+The module does not depend on Streamlit and the API URL is a parameter, so it can run against a local mock server.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+
+from load_update_price_df import CSV_COLUMNS, YAHOO_CHART_API_URL, update_btc_data_incremental, yahoo_chart_base_url
+from perf_metrics import count, stage_timer
+from price_data_refresher import INITIAL_RETRY_BACKOFF, REFRESH_DELAY_AFTER_CLOSE, next_daily_close, utc_now
+
+
+DEFAULT_TICKERS = ('BTC-USD', 'ETH-USD', 'SOL-USD')
+# concurrent requests, also the size of the connection pool of the session
+MAX_CONCURRENT_REQUESTS = 8
+# retries of failed connections and of 429/5xx responses, with exponential backoff
+REQUEST_RETRIES = 2
+# cached tickers, the raw candles and the data of a history of a few thousand days take about 0.3 MiB per ticker
+MAX_CACHED_TICKERS = 64
+
+
+def create_session(pool_size: int = MAX_CONCURRENT_REQUESTS, retries: int = REQUEST_RETRIES):
+    """
+    Returns requests session with keep-alive connection pool of pool_size connections per host
+    and retries of transient failures.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    session.headers['User-Agent'] = 'Mozilla/5.0'
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+@dataclass(frozen=True)
+class TickerResult:
+    """
+    Data of one ticker. The data are shared by all callers and must not be modified.
+
+    Attributes:
+        ticker (str): Yahoo Finance ticker
+        data (Any): last good data, the candles DataFrame or the result of the transform of the ingestor
+            (e.g. CompactHistory), None if never fetched
+        fetched_at (datetime | None): UTC time when data were fetched
+        error (Exception | None): error of the last attempt, data are then older than the last attempt
+    """
+    ticker: str
+    data: Any
+    fetched_at: datetime | None
+    error: Exception | None = None
+
+    @property
+    def is_ok(self) -> bool:
+        return self.data is not None
+
+
+class MultiAssetIngestor:
+    """
+    Fetches and caches daily candles of many tickers concurrently.
+
+    Args:
+        transform (Callable[[pd.DataFrame], Any] | None): applied to fetched candles (e.g. CompactHistory.from_frame),
+            the cached result is returned to all callers
+        session (requests.Session | None): pooled session, created by create_session on first use if None
+        api_url (str): Yahoo Finance chart API URL, the ticker is appended to it
+        max_workers (int): maximum number of concurrent requests
+        clock (Callable[[], datetime]): returns current timezone-aware time, replaceable in tests
+        max_tickers (int): maximum number of cached tickers, the least recently requested ones are evicted above it
+    """
+
+    def __init__(
+        self,
+        transform: Callable[[pd.DataFrame], Any] | None = None,
+        session=None,
+        api_url: str = YAHOO_CHART_API_URL,
+        max_workers: int = MAX_CONCURRENT_REQUESTS,
+        clock: Callable[[], datetime] = utc_now,
+        refresh_delay: timedelta = REFRESH_DELAY_AFTER_CLOSE,
+        retry_backoff: timedelta = INITIAL_RETRY_BACKOFF,
+        max_tickers: int = MAX_CACHED_TICKERS,
+    ):
+        self._transform = transform
+        self._session = session
+        self._api_url = api_url
+        self._max_workers = max_workers
+        self._clock = clock
+        self._refresh_delay = refresh_delay
+        self._retry_backoff = retry_backoff
+        self._max_tickers = max_tickers
+
+        # raw candles (with the in-progress day) kept for incremental updates
+        self._candles: dict[str, pd.DataFrame] = {}
+        # in least recently requested order, the other dicts are evicted together with it
+        self._results: OrderedDict[str, TickerResult] = OrderedDict()
+        self._next_attempt_at: dict[str, datetime] = {}
+        self.evictions = 0
+        # one batch of requests at a time, concurrent callers then get the results of the running batch
+        self._fetch_lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = create_session(self._max_workers)
+        return self._session
+
+    def _fetch_ticker(self, ticker: str, session) -> tuple[TickerResult, pd.DataFrame | None]:
+        """
+        Fetches new candles of ticker, returns its result and the raw candles (None on failure).
+        """
+        candles = self._candles.get(ticker, pd.DataFrame(columns=CSV_COLUMNS))
+        try:
+            with stage_timer('fetch_ticker'):
+                candles = update_btc_data_incremental(candles, base_url=yahoo_chart_base_url(ticker, self._api_url),
+                                                      now=self._clock(), session=session)
+                data = self._transform(candles) if self._transform is not None else candles
+        except Exception as error:
+            return self._failure(ticker, error), None
+        count('ticker_fetch_successes')
+        return TickerResult(ticker, data, self._clock()), candles
+
+    def _failure(self, ticker: str, error: Exception) -> TickerResult:
+        """
+        Returns result of a failed attempt to fetch ticker, with its last good data if there are any.
+        """
+        count('ticker_fetch_failures')
+        previous = self._results.get(ticker)
+        if previous is None:
+            return TickerResult(ticker, None, None, error)
+        return TickerResult(ticker, previous.data, previous.fetched_at, error)
+
+    def _fetch_all(self, tickers: list[str]) -> list[tuple[TickerResult, pd.DataFrame | None]]:
+        # the session is created before the worker threads share it
+        try:
+            session = self.session
+        except Exception as error:
+            # e.g. requests is not installed (stlite), every ticker fails and is retried after the backoff
+            return [(self._failure(ticker, error), None) for ticker in tickers]
+        if self._max_workers == 1 or len(tickers) == 1:
+            return [self._fetch_ticker(ticker, session) for ticker in tickers]
+        try:
+            with ThreadPoolExecutor(max_workers=min(self._max_workers, len(tickers))) as executor:
+                return list(executor.map(self._fetch_ticker, tickers, [session]*len(tickers)))
+        except RuntimeError:
+            # threads are not supported (e.g. stlite/Pyodide)
+            return [self._fetch_ticker(ticker, session) for ticker in tickers]
+
+    def fetch(self, tickers: Iterable[str]) -> dict[str, TickerResult]:
+        """
+        Returns results of tickers, fetching concurrently those which are not cached or whose cache expired.
+        Failed tickers are retried after the retry backoff.
+
+        Returns:
+            dict: ticker -> TickerResult, in the order of tickers
+        """
+        tickers = list(dict.fromkeys(tickers))
+        with self._fetch_lock:
+            now = self._clock()
+            due = [ticker for ticker in tickers if now >= self._next_attempt_at.get(ticker, now)]
+            count('ticker_cache_hits', len(tickers)-len(due))
+            count('ticker_cache_misses', len(due))
+            if due:
+                outcomes = self._fetch_all(due)
+                now = self._clock()
+                for ticker, (result, candles) in zip(due, outcomes):
+                    self._results[ticker] = result
+                    if candles is None:
+                        self._next_attempt_at[ticker] = now+self._retry_backoff
+                    else:
+                        self._candles[ticker] = candles
+                        self._next_attempt_at[ticker] = next_daily_close(now)+self._refresh_delay
+            results = {ticker: self._results[ticker] for ticker in tickers}
+            for ticker in tickers:
+                self._results.move_to_end(ticker)
+            self._evict()
+            return results
+
+    def _evict(self) -> None:
+        """
+        Drops the least recently requested tickers above max_tickers.
+        """
+        while len(self._results) > self._max_tickers:
+            ticker, _ = self._results.popitem(last=False)
+            self._candles.pop(ticker, None)
+            self._next_attempt_at.pop(ticker, None)
+            self.evictions += 1
+            count('ticker_cache_evictions')
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel execution of large scenario batches on all cores.
+
+The read-only price history is placed once into multiprocessing.shared_memory and every worker process
+attaches to it in its initializer, so the DataFrame is not pickled to the workers with each task.
+Tasks are either guess tables (e.g. a grid of daily change × period) evaluated with the functions
+of top_indic_calc, or chunks of Monte Carlo paths from scenario_simulation. Results are reduced into summary tables.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from scenario_simulation import paths_per_chunk, simulate_first_crosses
+from top_indic_calc import CROSS_LEVELS, add_guess_with_indicators, calc_pi_cycle_indicators
+
+
+# history attached by the worker initializer, the handle is kept so the shared buffer stays mapped
+_worker_shared_memory: shared_memory.SharedMemory | None = None
+_worker_history: pd.DataFrame | None = None
+
+
+class SharedHistory:
+    """
+    Context manager copying Date and Close columns of the history into a shared memory block.
+
+    The block holds Date as int64 nanoseconds followed by Close as float64, it is unlinked on exit.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, 16*self.n_rows))
+        dates, close = _history_arrays(self._shm, self.n_rows)
+        dates[:] = df['Date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        close[:] = df['Close'].to_numpy(dtype=float)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def __enter__(self) -> SharedHistory:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _history_arrays(shm: shared_memory.SharedMemory, n_rows: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns Date (int64) and Close (float64) arrays backed by the shared memory block, nothing is copied.
+    """
+    dates = np.ndarray((n_rows,), dtype=np.int64, buffer=shm.buf, offset=0)
+    close = np.ndarray((n_rows,), dtype=np.float64, buffer=shm.buf, offset=8*n_rows)
+    return dates, close
+
+
+def _init_worker(shm_name: str, n_rows: int) -> None:
+    """
+    Process pool initializer, attaches the shared history and calculates its indicators once per worker.
+    """
+    global _worker_shared_memory, _worker_history
+    # pool workers share the resource tracker of the parent process, which stays responsible for unlinking the block
+    _worker_shared_memory = shared_memory.SharedMemory(name=shm_name)
+    dates, close = _history_arrays(_worker_shared_memory, n_rows)
+    history = pd.DataFrame({'Date': dates.view('datetime64[ns]'), 'Close': close})
+    _worker_history = calc_pi_cycle_indicators(history)
+
+
+def summarize_guess(df_with_guess: pd.DataFrame, n_history_rows: int) -> dict:
+    """
+    Summarizes guessed rows of df_with_guess (see add_guess_with_indicators).
+
+    Returns:
+        dict with the final and the maximal guessed Close and the Date of the first guessed crossunder of each level
+    """
+    guessed = df_with_guess.iloc[n_history_rows:]
+    summary = {
+        'Days': len(guessed),
+        'Final Close': guessed['Close'].iloc[-1] if len(guessed) else np.nan,
+        'Max Close': guessed['Close'].max(),
+    }
+    for column in CROSS_LEVELS:
+        cross_dates = guessed.loc[guessed[column], 'Date']
+        summary[column] = cross_dates.iloc[0] if len(cross_dates) else pd.NaT
+    return summary
+
+
+def _evaluate_guesses(guess_tables: list[pd.DataFrame], history: pd.DataFrame | None = None) -> list[dict]:
+    """
+    Task evaluating guess tables against the history (the shared one in worker processes).
+    """
+    history = _worker_history if history is None else history
+    return [summarize_guess(add_guess_with_indicators(history, guess_df), len(history)) for guess_df in guess_tables]
+
+
+def _simulate_chunk(n_paths: int, n_days: int, seed: np.random.SeedSequence, simulation_kwargs: dict,
+                    history: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Task simulating one chunk of Monte Carlo paths from the history (the shared one in worker processes).
+    """
+    history = _worker_history if history is None else history
+    return simulate_first_crosses(history, n_paths, n_days, seed=seed, **simulation_kwargs)
+
+
+def _run(df: pd.DataFrame, tasks: list[tuple], task_function, max_workers: int | None) -> list:
+    """
+    Runs task_function(*task) for all tasks, in the current process if max_workers is 1,
+    otherwise in a process pool sharing the history of df.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        history = calc_pi_cycle_indicators(df[['Date', 'Close']])
+        return [task_function(*task, history=history) for task in tasks]
+
+    with SharedHistory(df) as shared_history:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(shared_history.name, shared_history.n_rows)) as executor:
+            futures = [executor.submit(task_function, *task) for task in tasks]
+            return [future.result() for future in futures]
+
+
+def build_change_period_grid(daily_changes: list[float], periods: list[int]) -> pd.DataFrame:
+    """
+    Returns all combinations of daily change and period as a table with the columns of the guess table.
+    """
+    grid = pd.MultiIndex.from_product([daily_changes, periods], names=['Daily Change (%)', 'Period (days)'])
+    return grid.to_frame(index=False)
+
+
+def run_guess_scenarios(df: pd.DataFrame, guess_tables: list[pd.DataFrame], max_workers: int | None = None,
+                        tasks_per_worker: int = 4) -> pd.DataFrame:
+    """
+    Evaluates many guess tables (in the format of df_with_users_guess) in parallel.
+
+    Args:
+        df (pd.DataFrame): historical data with Date and Close columns
+        guess_tables (list[pd.DataFrame]): scenarios to evaluate
+        max_workers (int | None): number of worker processes, all cores if None, no processes if 1
+        tasks_per_worker (int): scenarios are sent in this many batches per worker, to balance the load
+
+    Returns:
+        pd.DataFrame: one row per scenario (see summarize_guess), in the order of guess_tables
+    """
+    n_batches = (max_workers or os.cpu_count() or 1)*tasks_per_worker
+    batches = np.array_split(np.arange(len(guess_tables)), max(1, min(n_batches, len(guess_tables))))
+    tasks = [([guess_tables[i] for i in batch],) for batch in batches if len(batch)]
+    results = _run(df, tasks, _evaluate_guesses, max_workers)
+    return pd.DataFrame([summary for batch in results for summary in batch])
+
+
+def run_change_period_grid(df: pd.DataFrame, daily_changes: list[float], periods: list[int],
+                           max_workers: int | None = None) -> pd.DataFrame:
+    """
+    Evaluates single period scenarios for every combination of daily change and period in parallel.
+
+    Returns:
+        pd.DataFrame: the grid (see build_change_period_grid) with the summary columns of summarize_guess
+    """
+    grid = build_change_period_grid(daily_changes, periods)
+    guess_tables = [grid.iloc[[i]] for i in range(len(grid))]
+    summaries = run_guess_scenarios(df, guess_tables, max_workers=max_workers)
+    return pd.concat([grid, summaries], axis=1)
+
+
+def run_monte_carlo(df: pd.DataFrame, n_paths: int, n_days: int, max_workers: int | None = None,
+                    chunk_size: int | None = None, seed: int | None = None, **simulation_kwargs) -> pd.DataFrame:
+    """
+    Runs simulate_first_crosses split into chunks of paths in parallel and sums the results.
+    Chunks get independent random streams spawned from seed, so the result does not depend on max_workers.
+
+    Args:
+        simulation_kwargs: method, daily_change_pct, volatility_pct and lookback_days of simulate_first_crosses
+
+    Returns:
+        pd.DataFrame: the same format as simulate_first_crosses, summarize with summarize_first_crosses
+
+    Raises:
+        ValueError: if n_paths or n_days is not positive
+    """
+    if n_paths < 1 or n_days < 1:
+        raise ValueError(f"At least one path and one day are needed for the simulation, got {n_paths} paths "
+                         f"and {n_days} days.")
+    chunk_size = chunk_size or paths_per_chunk(n_days)
+    chunk_sizes = [min(chunk_size, n_paths-start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    tasks = [(size, n_days, chunk_seed, simulation_kwargs) for size, chunk_seed in zip(chunk_sizes, seeds)]
+    results = _run(df, tasks, _simulate_chunk, max_workers)
+
+    first_crosses_df = results[0].copy()
+    for result in results[1:]:
+        first_crosses_df[list(CROSS_LEVELS)] += result[list(CROSS_LEVELS)]
+    return first_crosses_df
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Parameter sweep of the Pi Cycle indicator: how well would other SMA windows and multipliers have called
+the historical cycle tops?
+
+SMAs of all short and all long windows are calculated from one cumulative sum of Close (see rolling_means).
+Crosses of every (short window, long window, multiplier) combination are then evaluated for chunks of window pairs
+and all multipliers at once, so the memory stays bounded by the chunk size. The cross condition is the one
+of crossunder, written on the ratio of the SMAs: short / long > multiplier on the day and <= on the previous day
+(it can differ from short > multiplier × long only when both sides are equal up to floating point rounding).
+
+Every combination is scored by its cross nearest to each cycle top (within TOP_WINDOW_DAYS): the distance
+in days and in price from the top, and by the crosses far from any top (false signals). The result has one row
+per combination, see sweep_heatmap for a 2-D table of one score.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from perf_metrics import stage_timer
+from top_indic_calc import rolling_means
+
+
+SHORT_WINDOWS = tuple(range(50, 201, 2))
+LONG_WINDOWS = tuple(range(200, 501, 5))
+MULTIPLIERS = (*np.round(np.arange(1.0, 3.01, 0.1), 1), 1.618)
+# a cycle top is the highest close within this number of days on both sides (two years separate the BTC cycle tops
+# from the lower local highs between them)
+CYCLE_TOP_HALF_WINDOW_DAYS = 730
+# the window is cut by the start and the end of the history, but at least this number of days must be on both sides
+# (e.g. the last days of the history are not a top yet, the price may still rise)
+CYCLE_TOP_MIN_EDGE_DAYS = 90
+# a cross is counted for a top if it is at most this number of days before or after it
+TOP_WINDOW_DAYS = 365
+# rough budget for the arrays of one chunk of window pairs
+CHUNK_MEMORY_BYTES = 64*1024**2
+
+
+def find_cycle_tops(close: np.ndarray, half_window_days: int = CYCLE_TOP_HALF_WINDOW_DAYS,
+                    min_edge_days: int = CYCLE_TOP_MIN_EDGE_DAYS) -> np.ndarray:
+    """
+    Returns positions of cycle tops: closes which are the highest within half_window_days before and after them
+    and at least min_edge_days from the start and the end of the history.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    padded = np.concatenate((np.full(half_window_days, -np.inf), close, np.full(half_window_days, -np.inf)))
+    window_max = np.lib.stride_tricks.sliding_window_view(padded, 2*half_window_days+1).max(axis=1)
+    positions = np.arange(len(close))
+    is_top = (close == window_max) & (positions >= min_edge_days) & (positions < len(close)-min_edge_days)
+    return np.flatnonzero(is_top)
+
+
+def pairs_per_chunk(n_days: int, n_multipliers: int, memory_bytes: int = CHUNK_MEMORY_BYTES) -> int:
+    """
+    Returns number of window pairs evaluated at once, the bool arrays of one chunk have n_multipliers × n_days
+    values per pair.
+    """
+    # the ratio (8 bytes per day) and ~3 bool arrays of the (pairs, multipliers, days) shape
+    return max(1, memory_bytes//(n_days*(8+3*n_multipliers)))
+
+
+def score_crosses(flags: np.ndarray, close: np.ndarray, tops: np.ndarray,
+                  window_days: int = TOP_WINDOW_DAYS) -> dict[str, np.ndarray]:
+    """
+    Scores cross flags of many combinations against the cycle tops.
+
+    Args:
+        flags (np.ndarray): bool array of shape (..., len(close)), True on the days of crosses
+        close (np.ndarray): closes of the days
+        tops (np.ndarray): positions of the cycle tops
+
+    Returns:
+        dict: arrays of the shape flags.shape[:-1]: 'crosses', 'false_crosses' (not within window_days of any top),
+        'tops_called' and for every top k 'days_to_top_k' (cross minus top, the earlier cross wins a tie)
+        and 'price_to_top_pct_k' (close of the cross relative to the top), NaN if no cross is within the window
+    """
+    n_days = flags.shape[-1]
+    near_top = np.zeros(n_days, dtype=bool)
+    scores = {'crosses': np.count_nonzero(flags, axis=-1)}
+    tops_called = np.zeros(flags.shape[:-1], dtype=np.int64)
+    for k, top in enumerate(tops):
+        start, stop = max(top-window_days, 0), min(top+window_days+1, n_days)
+        near_top[start:stop] = True
+        # days from the top to the last cross before it (or on it) and to the first cross after it,
+        # the days before the top are reversed so argmax finds the nearest one
+        before = flags[..., top:start-1 if start else None:-1]
+        days_before = before.argmax(axis=-1)
+        has_before = np.take_along_axis(before, days_before[..., None], axis=-1)[..., 0]
+        if stop > top+1:
+            after = flags[..., top+1:stop]
+            days_after = after.argmax(axis=-1)+1
+            has_after = np.take_along_axis(after, days_after[..., None]-1, axis=-1)[..., 0]
+        else:
+            days_after = np.zeros_like(days_before)
+            has_after = np.zeros_like(has_before)
+        # nearest cross, before the top if two are equally far
+        use_before = has_before & (~has_after | (days_before <= days_after))
+        called = has_before | has_after
+        offsets = np.where(use_before, -days_before, days_after)
+        tops_called += called
+        scores[f'days_to_top_{k}'] = np.where(called, offsets, np.nan)
+        scores[f'price_to_top_pct_{k}'] = np.where(called, 100*(close[np.where(called, top+offsets, top)]/close[top]-1),
+                                                   np.nan)
+    scores['false_crosses'] = scores['crosses']-np.count_nonzero(flags & near_top, axis=-1)
+    scores['tops_called'] = tops_called
+    return scores
+
+
+def sweep(close: np.ndarray, tops: np.ndarray, short_windows: tuple[int, ...] = SHORT_WINDOWS,
+          long_windows: tuple[int, ...] = LONG_WINDOWS, multipliers: tuple[float, ...] = MULTIPLIERS,
+          window_days: int = TOP_WINDOW_DAYS, memory_bytes: int = CHUNK_MEMORY_BYTES) -> dict[str, np.ndarray]:
+    """
+    Evaluates crosses of every combination of short window < long window and multiplier and scores them
+    (see score_crosses).
+
+    Returns:
+        dict: 'short_window', 'long_window', 'multiplier' and the scores, 1-D arrays with one value per combination
+    """
+    close = np.asarray(close, dtype=np.float64)
+    short_windows = np.array(sorted(set(short_windows)))
+    long_windows = np.array(sorted(set(long_windows)))
+    multipliers = np.asarray(multipliers, dtype=np.float64)
+    with stage_timer('sweep_sma'):
+        short_smas = rolling_means(close, short_windows.tolist())
+        long_smas = rolling_means(close, long_windows.tolist())
+    short_rows, long_rows = np.nonzero(short_windows[:, None] < long_windows[None, :])
+
+    chunk = pairs_per_chunk(len(close), len(multipliers), memory_bytes)
+    thresholds = multipliers[None, :, None]
+    chunk_scores = []
+    with stage_timer('sweep_crosses'):
+        for start in range(0, len(short_rows), chunk):
+            pairs = slice(start, start+chunk)
+            ratio = (short_smas[short_rows[pairs]]/long_smas[long_rows[pairs]])[:, None, :]
+            # crosses of all multipliers, the first day has no previous day (as in crossunder)
+            flags = np.zeros((len(ratio), len(multipliers), len(close)), dtype=bool)
+            np.logical_and(ratio[..., 1:] > thresholds, ratio[..., :-1] <= thresholds, out=flags[..., 1:])
+            chunk_scores.append(score_crosses(flags, close, tops, window_days))
+
+    result = {
+        'short_window': np.repeat(short_windows[short_rows], len(multipliers)),
+        'long_window': np.repeat(long_windows[long_rows], len(multipliers)),
+        'multiplier': np.tile(multipliers, len(short_rows)),
+    }
+    for name in chunk_scores[0] if chunk_scores else ():
+        result[name] = np.concatenate([scores[name] for scores in chunk_scores]).ravel()
+    return result
+
+
+def sweep_history(df: pd.DataFrame, short_windows: tuple[int, ...] = SHORT_WINDOWS,
+                  long_windows: tuple[int, ...] = LONG_WINDOWS, multipliers: tuple[float, ...] = MULTIPLIERS,
+                  tops: np.ndarray | None = None, window_days: int = TOP_WINDOW_DAYS) -> pd.DataFrame:
+    """
+    Runs the sweep over the history in df (Date and Close) against its cycle tops (see find_cycle_tops).
+
+    Returns:
+        pd.DataFrame: one row per combination with its scores, the per-top columns are named by the date of the top
+        (e.g. 'days_to_top_2017-12-16'), 'mean_abs_days' and 'mean_abs_price_pct' average the called tops.
+        Sorted by the most called tops, then by the fewest false crosses and the smallest mean distance in days.
+    """
+    close = df['Close'].to_numpy(dtype=np.float64)
+    tops = find_cycle_tops(close) if tops is None else np.asarray(tops)
+    result = pd.DataFrame(sweep(close, tops, short_windows, long_windows, multipliers, window_days))
+
+    top_dates = [f"{date:%Y-%m-%d}" for date in df['Date'].iloc[tops]]
+    result = result.rename(columns={f'{prefix}_{k}': f'{prefix}_{date}'
+                                    for k, date in enumerate(top_dates)
+                                    for prefix in ('days_to_top', 'price_to_top_pct')})
+    days = result[[f'days_to_top_{date}' for date in top_dates]]
+    prices = result[[f'price_to_top_pct_{date}' for date in top_dates]]
+    result['mean_abs_days'] = days.abs().mean(axis=1)
+    result['mean_abs_price_pct'] = prices.abs().mean(axis=1)
+    return result.sort_values(['tops_called', 'false_crosses', 'mean_abs_days'], ascending=[False, True, True],
+                              kind='stable', ignore_index=True)
+
+
+def sweep_heatmap(result: pd.DataFrame, value: str = 'mean_abs_days', multiplier: float = 2.0) -> pd.DataFrame:
+    """
+    Returns one score of the sweep result for one multiplier as a short window × long window table.
+    """
+    rows = result[np.isclose(result['multiplier'], multiplier)]
+    return rows.pivot(index='short_window', columns='long_window', values=value)
+
+
+if __name__ == '__main__':
+    pass
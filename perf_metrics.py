@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight instrumentation of the app stages.
+
+Stages are timed by the stage_timer context manager and events (e.g. cache hits and misses) are counted by count.
+Nothing is recorded unless the metrics are enabled:
+    - process-wide by PI_CYCLE_METRICS=1, then the totals of all sessions are aggregated, every rerun is written
+      to the 'pi_cycle.metrics' logger as one JSON line and, if PI_CYCLE_METRICS_PORT is set, the totals are served
+      in Prometheus text format at http://127.0.0.1:<port>/metrics,
+    - for one rerun by start_rerun(collect=True), used by the hidden debug panel of the page.
+A rerun of a single fragment of the page (see top_indicator_content_prep) is recorded as a separate rerun
+with the name of the fragment, it is counted as fragment_reruns instead of reruns.
+When disabled, stage_timer returns a shared no-op context manager, so the overhead is one flag check.
+Memory is measured only while tracemalloc is tracing, it is started for the whole process by PI_CYCLE_TRACE_MEMORY=1
+(see start_memory_tracing).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+LOGGER = logging.getLogger('pi_cycle.metrics')
+ENABLED = os.environ.get('PI_CYCLE_METRICS', '') not in ('', '0')
+METRICS_PORT = int(os.environ.get('PI_CYCLE_METRICS_PORT', '0') or 0)
+# tracemalloc slows down every session of the process, so it is opted in when the server starts, never by a session
+TRACE_MEMORY = os.environ.get('PI_CYCLE_TRACE_MEMORY', '') not in ('', '0')
+
+
+class RerunMetrics:
+    """
+    Stages and events recorded during one rerun of the page.
+
+    Attributes:
+        fragment (str | None): name of the fragment if only the fragment was rerun, None for the whole page
+        stages (list[dict]): name, seconds and peak_mib (None if memory is not traced) of each finished stage
+        events (dict[str, int]): counted events
+    """
+
+    def __init__(self, fragment: str | None = None):
+        self.fragment = fragment
+        self.started_at = time.perf_counter()
+        self.total_seconds: float | None = None
+        self.stages: list[dict] = []
+        self.events: dict[str, int] = {}
+
+
+_current_rerun: contextvars.ContextVar[RerunMetrics | None] = contextvars.ContextVar('pi_cycle_rerun', default=None)
+# process-wide totals, stage name -> [count, sum of seconds, max seconds], event name -> count
+_lock = threading.Lock()
+_stage_totals: dict[str, list] = {}
+_event_totals: dict[str, int] = {}
+# running peaks of the memory of the open stages of the current thread (nested stages reset the tracemalloc peak)
+_open_stages = threading.local()
+_server: ThreadingHTTPServer | None = None
+
+
+class _NullTimer:
+    """
+    Context manager doing nothing, returned by stage_timer when the metrics are disabled.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    """
+    Context manager measuring duration (and traced memory peak) of one stage.
+    """
+
+    __slots__ = ('name', 'rerun', 'start', 'start_memory')
+
+    def __init__(self, name: str, rerun: RerunMetrics | None):
+        self.name = name
+        self.rerun = rerun
+
+    def __enter__(self):
+        stack = _memory_stack()
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # keep the peak of the parent stage before the peak is reset for this one
+                stack[-1] = max(stack[-1], peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+        else:
+            self.start_memory = None
+        stack.append(0)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter()-self.start
+        stack = _memory_stack()
+        running_peak = stack.pop()
+        peak_mib = None
+        if self.start_memory is not None and tracemalloc.is_tracing():
+            peak = max(running_peak, tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1] = max(stack[-1], peak)
+            peak_mib = (peak-self.start_memory)/1024**2
+
+        if self.rerun is not None:
+            self.rerun.stages.append({'name': self.name, 'seconds': seconds, 'peak_mib': peak_mib})
+        if ENABLED:
+            with _lock:
+                totals = _stage_totals.setdefault(self.name, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += seconds
+                totals[2] = max(totals[2], seconds)
+        return False
+
+
+def _memory_stack() -> list:
+    if not hasattr(_open_stages, 'stack'):
+        _open_stages.stack = []
+    return _open_stages.stack
+
+
+def stage_timer(name: str):
+    """
+    Returns context manager timing the stage name, no-op if the metrics are disabled.
+    """
+    rerun = _current_rerun.get()
+    if rerun is None and not ENABLED:
+        return _NULL_TIMER
+    return _StageTimer(name, rerun)
+
+
+def count(event: str, n: int = 1) -> None:
+    """
+    Counts event (e.g. cache hit or miss), no-op if the metrics are disabled.
+    """
+    rerun = _current_rerun.get()
+    if rerun is not None:
+        rerun.events[event] = rerun.events.get(event, 0)+n
+    if ENABLED:
+        with _lock:
+            _event_totals[event] = _event_totals.get(event, 0)+n
+
+
+def start_rerun(collect: bool = False, fragment: str | None = None) -> RerunMetrics | None:
+    """
+    Starts recording of one rerun of the page in the current thread.
+
+    Args:
+        collect (bool): record the rerun even if the metrics are not enabled process-wide (debug panel)
+        fragment (str | None): name of the fragment if only the fragment is rerun
+
+    Returns:
+        RerunMetrics, or None if nothing is recorded
+    """
+    rerun = RerunMetrics(fragment) if collect or ENABLED else None
+    _current_rerun.set(rerun)
+    return rerun
+
+
+def finish_rerun(rerun: RerunMetrics | None) -> None:
+    """
+    Stops recording of the rerun and writes it to the log as one JSON line if the metrics are enabled.
+    """
+    _current_rerun.set(None)
+    if rerun is None:
+        return
+    rerun.total_seconds = time.perf_counter()-rerun.started_at
+    if ENABLED:
+        count('reruns' if rerun.fragment is None else 'fragment_reruns')
+        LOGGER.info(json.dumps({
+            'event': 'rerun',
+            'fragment': rerun.fragment,
+            'total_seconds': round(rerun.total_seconds, 6),
+            'stages': [{**stage, 'seconds': round(stage['seconds'], 6)} for stage in rerun.stages],
+            'events': rerun.events,
+        }))
+
+
+def start_memory_tracing(enabled: bool = TRACE_MEMORY) -> bool:
+    """
+    Starts tracemalloc once per process if enabled (PI_CYCLE_TRACE_MEMORY=1), memory of the stages is measured
+    only while it is tracing. Tracing is never stopped, it is shared by all sessions of the process.
+
+    Returns:
+        bool: True if tracemalloc is tracing
+    """
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return tracemalloc.is_tracing()
+
+
+def render_prometheus_text() -> str:
+    """
+    Returns process-wide totals in Prometheus text exposition format.
+    """
+    with _lock:
+        stage_totals = {name: list(totals) for name, totals in _stage_totals.items()}
+        event_totals = dict(_event_totals)
+
+    lines = ['# HELP pi_cycle_stage_seconds Duration of the app stages.', '# TYPE pi_cycle_stage_seconds summary']
+    for name, (n, total, _) in sorted(stage_totals.items()):
+        lines.append(f'pi_cycle_stage_seconds_count{{stage="{name}"}} {n}')
+        lines.append(f'pi_cycle_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+    lines += ['# HELP pi_cycle_stage_seconds_max Longest duration of the app stages.',
+              '# TYPE pi_cycle_stage_seconds_max gauge']
+    for name, (_, _, longest) in sorted(stage_totals.items()):
+        lines.append(f'pi_cycle_stage_seconds_max{{stage="{name}"}} {longest:.6f}')
+    lines += ['# HELP pi_cycle_events_total Counted events, e.g. cache hits and misses.',
+              '# TYPE pi_cycle_events_total counter']
+    for event, n in sorted(event_totals.items()):
+        lines.append(f'pi_cycle_events_total{{event="{event}"}} {n}')
+    return '\n'.join(lines)+'\n'
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = '127.0.0.1') -> ThreadingHTTPServer | None:
+    """
+    Serves render_prometheus_text at /metrics in a daemon thread, once per process.
+    Does nothing if the metrics are disabled or port is 0.
+    """
+    global _server
+    if not ENABLED or not port:
+        return None
+    # imported only when the endpoint is used, it is not needed by the app itself
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_prometheus_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='pi-cycle-metrics', daemon=True).start()
+    return _server
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental (streaming) Pi Cycle indicator state.
+
+SMA_111, SMA_350 and the crossunder flags of top_indic_calc are updated in constant time per new daily close.
+Running sums use the same compensated (Kahan) add/remove steps as pandas rolling(...).mean(),
+so the values are identical to calc_pi_cycle_indicators over the same history, not only close to them.
+A provisional value of the in-progress day can be evaluated (and revised) without changing the state,
+and the state can be saved to JSON so it survives restarts.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from top_indic_calc import CROSS_LEVELS, SMA_LONG_PERIOD, SMA_SHORT_PERIOD
+
+
+class RollingMeanState:
+    """
+    Mean of the last window values, updated like pandas rolling(window).mean() (min_periods equal to window).
+
+    The last window values are kept in a ring buffer, so the value leaving the window is known in constant time.
+    """
+
+    # scalars of the running sum, in the order of pandas add_mean/remove_mean/calc_mean
+    _SCALARS = ('nobs', 'sum_x', 'neg_ct', 'compensation_add', 'compensation_remove',
+                'num_consecutive_same_value', 'prev_value')
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = np.full(window, np.nan)
+        self.count = 0
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.neg_ct = 0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = math.nan
+
+    def _advanced(self, value: float) -> tuple[dict, float]:
+        """
+        Returns the scalars after adding value (and removing the value leaving the window) and the new mean.
+        The state itself is not changed.
+        """
+        s = {name: getattr(self, name) for name in self._SCALARS}
+
+        if self.count >= self.window:
+            removed = float(self.buffer[self.count % self.window])
+            if removed == removed:
+                s['nobs'] -= 1
+                y = -removed-s['compensation_remove']
+                t = s['sum_x']+y
+                s['compensation_remove'] = t-s['sum_x']-y
+                s['sum_x'] = t
+                if math.copysign(1.0, removed) < 0:
+                    s['neg_ct'] -= 1
+
+        if value == value:
+            s['nobs'] += 1
+            y = value-s['compensation_add']
+            t = s['sum_x']+y
+            s['compensation_add'] = t-s['sum_x']-y
+            s['sum_x'] = t
+            if math.copysign(1.0, value) < 0:
+                s['neg_ct'] += 1
+            # repeated values give exactly the repeated value, without floating point artifacts
+            if value == s['prev_value']:
+                s['num_consecutive_same_value'] += 1
+            else:
+                s['num_consecutive_same_value'] = 1
+            s['prev_value'] = value
+
+        mean = math.nan
+        if s['nobs'] >= self.window:
+            mean = s['sum_x']/s['nobs']
+            if s['num_consecutive_same_value'] >= s['nobs']:
+                mean = s['prev_value']
+            elif s['neg_ct'] == 0 and mean < 0:
+                mean = 0.0
+            elif s['neg_ct'] == s['nobs'] and mean > 0:
+                mean = 0.0
+        return s, mean
+
+    def peek(self, value: float) -> float:
+        """
+        Returns the mean which push(value) would return, without changing the state.
+        """
+        return self._advanced(float(value))[1]
+
+    def push(self, value: float) -> float:
+        """
+        Adds value to the window.
+
+        Returns:
+            float: mean of the last window values, NaN until the window is full
+        """
+        value = float(value)
+        scalars, mean = self._advanced(value)
+        for name, scalar in scalars.items():
+            setattr(self, name, scalar)
+        self.buffer[self.count % self.window] = value
+        self.count += 1
+        return mean
+
+    def to_dict(self) -> dict:
+        """
+        Returns JSON serializable state, see from_dict.
+        """
+        state = {'window': self.window, 'count': self.count, 'buffer': self.buffer.tolist()}
+        state.update({name: getattr(self, name) for name in self._SCALARS})
+        return state
+
+    @classmethod
+    def from_dict(cls, state: dict) -> RollingMeanState:
+        """
+        Restores state saved by to_dict.
+        """
+        rolling = cls(state['window'])
+        rolling.count = state['count']
+        rolling.buffer = np.array(state['buffer'], dtype=float)
+        for name in cls._SCALARS:
+            setattr(rolling, name, state[name])
+        return rolling
+
+
+class PiCycleState:
+    """
+    Streaming state of SMA_111, SMA_350 and the crossunder flags (see calc_pi_cycle_indicators).
+
+    Final daily closes are added by update, in constant time. update_provisional evaluates the in-progress day
+    without changing the state, it can be called repeatedly as the price changes and it is replaced by update
+    once the day is closed.
+    """
+
+    def __init__(self):
+        self.sma_short = RollingMeanState(SMA_SHORT_PERIOD)
+        self.sma_long = RollingMeanState(SMA_LONG_PERIOD)
+        self.prev_sma_short = math.nan
+        self.prev_sma_long = math.nan
+        self.last_date: pd.Timestamp | None = None
+        self.provisional_row: dict | None = None
+
+    def _row(self, date: pd.Timestamp, close: float, sma_short: float, sma_long: float) -> dict:
+        """
+        Returns row with indicator columns, the crossunders are calculated with the same formulas as crossunder.
+        """
+        row = {'Date': date, 'Close': close, 'SMA_111': sma_short, 'SMA_350': sma_long}
+        for column, multiplier in CROSS_LEVELS.items():
+            row[column] = (sma_short > multiplier*sma_long) and (self.prev_sma_short <= multiplier*self.prev_sma_long)
+        return row
+
+    def _check_date(self, date) -> pd.Timestamp:
+        date = pd.Timestamp(date)
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"Date {date:%Y-%m-%d} is not after the last closed day {self.last_date:%Y-%m-%d}.")
+        return date
+
+    def update(self, date, close: float) -> dict:
+        """
+        Adds final close of a new day and discards the provisional value.
+
+        Returns:
+            dict: Date, Close and indicator columns of the day
+        """
+        date = self._check_date(date)
+        row = self._row(date, close, self.sma_short.push(close), self.sma_long.push(close))
+        self.prev_sma_short = row['SMA_111']
+        self.prev_sma_long = row['SMA_350']
+        self.last_date = date
+        self.provisional_row = None
+        return row
+
+    def update_provisional(self, date, close: float) -> dict:
+        """
+        Evaluates close of the in-progress day without changing the state, a later call revises the value.
+
+        Returns:
+            dict: Date, Close and indicator columns of the day, also kept in provisional_row
+        """
+        date = self._check_date(date)
+        self.provisional_row = self._row(date, close, self.sma_short.peek(close), self.sma_long.peek(close))
+        return self.provisional_row
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame) -> PiCycleState:
+        """
+        Builds the state from Date and Close columns of the whole history (from its first row,
+        as the running sums depend on all previous values exactly as in pandas).
+        """
+        state = cls()
+        for date, close in zip(df['Date'], df['Close'].to_numpy(dtype=float)):
+            state.update(date, close)
+        return state
+
+    def to_dict(self) -> dict:
+        """
+        Returns JSON serializable state, see from_dict.
+        """
+        return {
+            'sma_short': self.sma_short.to_dict(),
+            'sma_long': self.sma_long.to_dict(),
+            'prev_sma_short': self.prev_sma_short,
+            'prev_sma_long': self.prev_sma_long,
+            'last_date': None if self.last_date is None else self.last_date.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> PiCycleState:
+        """
+        Restores state saved by to_dict, the provisional value is not restored.
+        """
+        pi_cycle = cls()
+        pi_cycle.sma_short = RollingMeanState.from_dict(state['sma_short'])
+        pi_cycle.sma_long = RollingMeanState.from_dict(state['sma_long'])
+        pi_cycle.prev_sma_short = state['prev_sma_short']
+        pi_cycle.prev_sma_long = state['prev_sma_long']
+        pi_cycle.last_date = None if state['last_date'] is None else pd.Timestamp(state['last_date'])
+        return pi_cycle
+
+    def save(self, path: Path) -> None:
+        """
+        Writes the state to JSON file (floats are written with full precision).
+        """
+        Path(path).write_text(json.dumps(self.to_dict()))
+
+    @classmethod
+    def load(cls, path: Path) -> PiCycleState:
+        """
+        Reads the state written by save.
+        """
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Headless command line interface of the Pi Cycle indicator, without Streamlit and Plotly.
+
+Runs the same load -> extend -> indicators pipeline as the app for many scenario files in one process,
+so the results can be precomputed in cron jobs and pipelines:
+
+    python picycle.py compute --scenario bull.json --out bull.parquet
+    python picycle.py compute --scenario scenarios/*.json --out results/ --update
+    python picycle.py screen --data prices/*.csv --out ranking.csv
+    python picycle.py sweep --out sweep.parquet --short-windows 50:200:2 --long-windows 200:500:5
+
+A scenario file holds the rows of the app's guess table, either as a list or under the "guess" key:
+
+    {"guess": [{"Daily Change (%)": 0.3, "Period (days)": 200}, {"Daily Change (%)": -0.2, "Period (days)": 100}]}
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from asset_screener import screen_assets
+from load_update_price_df import (
+    load_BTC_price_store, load_price_npz, update_btc_data_incremental, with_price_delta,
+)
+from parameter_sweep import LONG_WINDOWS, MULTIPLIERS, SHORT_WINDOWS, sweep_history
+from price_history import CompactHistory, read_price_columns
+from top_indic_calc import calc_pi_cycle_indicators, extend_with_guess
+
+
+GUESS_COLUMNS = ['Daily Change (%)', 'Period (days)']
+# longest guess of one scenario (100 years), its dates stay far below the last date supported by pandas
+MAX_GUESS_DAYS = 100*365
+OUTPUT_FORMATS = ('.parquet', '.feather', '.csv')
+
+
+def load_scenario(path: Path) -> pd.DataFrame:
+    """
+    Reads scenario file into a guess table with the columns of the app's guess table.
+    """
+    return guess_table(json.loads(Path(path).read_text()), name=str(path))
+
+
+def guess_table(scenario: dict | list, name: str = 'scenario') -> pd.DataFrame:
+    """
+    Returns guess table of decoded scenario JSON, a list of guess rows or an object with the 'guess' list.
+    """
+    rows = scenario.get('guess') if isinstance(scenario, dict) else scenario
+    if not isinstance(rows, list):
+        raise ValueError(f"{name}: expected a list of guess rows or an object with the 'guess' list")
+    for number, row in enumerate(rows, start=1):
+        validate_guess_row(row, f"{name}: guess row {number}")
+    n_days = sum(int(row['Period (days)']) for row in rows)
+    if n_days > MAX_GUESS_DAYS:
+        raise ValueError(f"{name}: the guess has {n_days} days, at most {MAX_GUESS_DAYS} days are supported")
+    return pd.DataFrame(rows, columns=GUESS_COLUMNS)
+
+
+def validate_guess_row(row, name: str) -> None:
+    """
+    Raises ValueError unless row has a finite daily change above -100 % and a positive whole number of days.
+    """
+    if not isinstance(row, dict) or any(column not in row for column in GUESS_COLUMNS):
+        raise ValueError(f"{name}: expected an object with the columns {GUESS_COLUMNS}")
+    change, days = row['Daily Change (%)'], row['Period (days)']
+    if not is_number(change) or not math.isfinite(change) or change <= -100:
+        raise ValueError(f"{name}: 'Daily Change (%)' must be a finite number above -100, got {change!r}")
+    if not is_number(days) or not math.isfinite(days) or days < 1 or days != int(days):
+        raise ValueError(f"{name}: 'Period (days)' must be a positive whole number, got {days!r}")
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def load_prices(path: Path | None = None) -> pd.DataFrame:
+    """
+    Loads price history from Feather, NumPy archive (.npz) or CSV file with the rows of its delta file.
+    Without path, the repository price store is loaded (see load_BTC_price_store), a given path is never replaced.
+
+    Raises:
+        FileNotFoundError: if path does not exist
+    """
+    if path is None:
+        return load_BTC_price_store()
+    path = Path(path)
+    if path.suffix == '.csv':
+        return with_price_delta(pd.read_csv(path, parse_dates=['Date']), path)
+    if path.suffix == '.npz':
+        return load_price_npz(path)
+    return load_BTC_price_store(path)
+
+
+def load_history(path: Path | None = None, update: bool = False) -> pd.DataFrame:
+    """
+    Loads price history (see load_prices) and calculates its indicators.
+
+    Args:
+        path (Path | None): price file, the repository price store if None
+        update (bool): download newer candles from Yahoo Finance first, the in-progress day candle is ignored
+    """
+    df = load_prices(path)
+    if update:
+        df = update_btc_data_incremental(df).iloc[:-1]
+    return calc_pi_cycle_indicators(df)
+
+
+def write_result(df: pd.DataFrame, path: Path) -> None:
+    """
+    Writes result in the format given by the suffix of path (.parquet, .feather or .csv).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = df.reset_index(drop=True)
+    if path.suffix == '.parquet':
+        df.to_parquet(path, index=False)
+    elif path.suffix == '.feather':
+        df.to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+
+
+def output_paths(scenario_paths: list[Path], out: Path, out_format: str) -> list[Path]:
+    """
+    Returns output file of every scenario, out is the file of a single scenario or the directory of several ones.
+    """
+    if len(scenario_paths) == 1 and out.suffix in OUTPUT_FORMATS:
+        return [out]
+    if out.suffix:
+        raise ValueError(f"--out must be a directory when computing {len(scenario_paths)} scenarios")
+    return [out/f"{path.stem}{out_format}" for path in scenario_paths]
+
+
+def compute(scenario_paths: list[Path], out: Path, data_path: Path | None = None, update: bool = False,
+            guessed_only: bool = False, out_format: str = '.parquet') -> list[Path]:
+    """
+    Runs the pipeline for all scenario files, the history and its indicators are loaded only once.
+
+    Returns:
+        list[Path]: written result files, in the order of scenario_paths
+    """
+    paths = output_paths(scenario_paths, out, out_format)
+    guess_tables = [load_scenario(path) for path in scenario_paths]
+    history = load_history(data_path, update=update)
+
+    for guess_df, path in zip(guess_tables, paths):
+        df_with_guess = extend_with_guess(history, guess_df)
+        if guessed_only:
+            df_with_guess = df_with_guess.iloc[len(history):]
+        write_result(df_with_guess, path)
+    return paths
+
+
+def screen(data_paths: list[Path], out: Path) -> Path:
+    """
+    Ranks the assets of the price files by the distance to the next cross (see screen_assets),
+    the ticker of every asset is the name of its file without the suffix. Only Date and Close are read.
+    """
+    series = {Path(path).stem: CompactHistory.from_frame(read_price_columns(path, ['Date', 'Close']), source=Path(path))
+              for path in data_paths}
+    write_result(screen_assets(series), out)
+    return out
+
+
+def sweep(data_path: Path | None, out: Path, short_windows: tuple[int, ...] = SHORT_WINDOWS,
+          long_windows: tuple[int, ...] = LONG_WINDOWS, multipliers: tuple[float, ...] = MULTIPLIERS) -> Path:
+    """
+    Scores every combination of the SMA windows and multipliers against the cycle tops of the history
+    (see sweep_history) and writes one row per combination.
+    """
+    write_result(sweep_history(load_prices(data_path), short_windows, long_windows, multipliers), out)
+    return out
+
+
+def window_range(text: str) -> tuple[int, ...]:
+    """
+    Parses inclusive range of windows 'start:stop[:step]' or a single window.
+    """
+    try:
+        bounds = [int(value) for value in text.split(':')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid window range {text!r}, expected start:stop[:step]") from None
+    if len(bounds) == 1:
+        return (bounds[0],)
+    if len(bounds) > 3 or min(bounds) < 1:
+        raise argparse.ArgumentTypeError(f"invalid window range {text!r}, expected start:stop[:step]")
+    start, stop, step = (*bounds, 1) if len(bounds) == 2 else bounds
+    return tuple(range(start, stop+1, step))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='picycle', description=__doc__.split('\n\n')[0].strip())
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compute_parser = commands.add_parser('compute', help='extend the history by scenarios and calculate indicators')
+    compute_parser.add_argument('--scenario', type=Path, nargs='+', action='extend', required=True,
+                                help='scenario JSON file(s) with the guess table rows')
+    compute_parser.add_argument('--out', type=Path, required=True,
+                                help='result file of a single scenario, or directory for several scenarios')
+    compute_parser.add_argument('--format', dest='out_format', choices=OUTPUT_FORMATS, default='.parquet',
+                                help='format of the files written into the --out directory (default: %(default)s)')
+    compute_parser.add_argument('--data', type=Path,
+                                help='price history, Feather, .npz or CSV (default: the repository price store)')
+    compute_parser.add_argument('--update', action='store_true',
+                                help='download newer daily candles from Yahoo Finance first')
+    compute_parser.add_argument('--guessed-only', action='store_true',
+                                help='write only the guessed rows, not the history')
+
+    screen_parser = commands.add_parser('screen', help='rank assets by the distance to the next cross')
+    screen_parser.add_argument('--data', type=Path, nargs='+', action='extend', required=True,
+                               help='price histories of the assets, Feather, .npz or CSV files')
+    screen_parser.add_argument('--out', type=Path, required=True,
+                               help='ranking file, .parquet, .feather or .csv')
+
+    sweep_parser = commands.add_parser('sweep', help='score SMA windows and multipliers against the cycle tops')
+    sweep_parser.add_argument('--data', type=Path,
+                              help='price history, Feather, .npz or CSV (default: the repository price store)')
+    sweep_parser.add_argument('--out', type=Path, required=True,
+                              help='result file with one row per combination, .parquet, .feather or .csv')
+    sweep_parser.add_argument('--short-windows', type=window_range, default=SHORT_WINDOWS, metavar='START:STOP[:STEP]',
+                              help='short SMA windows, inclusive (default: 50:200:2)')
+    sweep_parser.add_argument('--long-windows', type=window_range, default=LONG_WINDOWS, metavar='START:STOP[:STEP]',
+                              help='long SMA windows, inclusive (default: 200:500:5)')
+    sweep_parser.add_argument('--multipliers', type=float, nargs='+', default=MULTIPLIERS,
+                              help='multipliers of the long SMA (default: 1.0 to 3.0 by 0.1 and 1.618)')
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'screen':
+            paths = [screen(args.data, args.out)]
+        elif args.command == 'sweep':
+            paths = [sweep(args.data, args.out, args.short_windows, args.long_windows, tuple(args.multipliers))]
+        else:
+            paths = compute(args.scenario, args.out, data_path=args.data, update=args.update,
+                            guessed_only=args.guessed_only, out_format=args.out_format)
+    except (OSError, ValueError) as error:
+        # ValueError includes PriceSchemaError of invalid price files
+        print(f"picycle: error: {error}", file=sys.stderr)
+        return 1
+    for path in paths:
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
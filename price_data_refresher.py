@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Background refresh of the shared BTC price dataset with stale-while-revalidate semantics.
+
+Sessions are always served the last good snapshot immediately. New candles are pulled
+by a daemon thread shortly after the daily close (UTC midnight) and the snapshot is swapped
+atomically. Failed attempts, and refreshes still missing the finished candle, are retried with exponential backoff.
+The module does not depend on Streamlit, so the refresher can be driven with a fake fetcher and clock.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+import pandas as pd
+
+from perf_metrics import count
+
+
+# delay after the daily close so the provider has time to publish the finished candle
+REFRESH_DELAY_AFTER_CLOSE = timedelta(minutes=5)
+INITIAL_RETRY_BACKOFF = timedelta(seconds=30)
+MAX_RETRY_BACKOFF = timedelta(hours=1)
+# the worker wakes up at least this often, so it does not oversleep if the system clock jumps
+MAX_WORKER_SLEEP = timedelta(minutes=10)
+
+
+def utc_now() -> datetime:
+    """
+    Returns current timezone-aware UTC time.
+    """
+    return datetime.now(timezone.utc)
+
+
+def next_daily_close(now: datetime) -> datetime:
+    """
+    Returns the first UTC midnight strictly after now.
+    """
+    today = now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today + timedelta(days=1)
+
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    """
+    Immutable view of the shared dataset. The DataFrame is shared by all sessions and must not be modified.
+
+    Attributes:
+        df (pd.DataFrame): price history, typically with indicator columns already calculated
+        source (str): human readable name of the data source
+        refreshed_at (datetime): UTC time when the snapshot was created
+    """
+    df: pd.DataFrame
+    source: str
+    refreshed_at: datetime
+
+    @property
+    def last_candle_date(self) -> pd.Timestamp:
+        """
+        Returns the Date of the last row of df (normalized to the day).
+        """
+        return pd.Timestamp(self.df["Date"].iloc[-1]).normalize()
+
+    def is_stale(self, now: datetime) -> bool:
+        """
+        Returns True when the last finished daily candle (yesterday in UTC) is missing in df.
+        """
+        yesterday = pd.Timestamp(now.astimezone(timezone.utc).date()) - pd.Timedelta(days=1)
+        return self.last_candle_date < yesterday
+
+
+class PriceDataRefresher:
+    """
+    Holds the last good PriceSnapshot and refreshes it in the background.
+
+    Args:
+        fetcher (Callable[[], pd.DataFrame]): returns the refreshed dataset, raises on failure
+        initial_snapshot (PriceSnapshot): snapshot served until the first successful refresh
+        source (str): source name stored with snapshots created from fetcher results
+        clock (Callable[[], datetime]): returns current timezone-aware time, replaceable in tests
+    """
+
+    def __init__(
+        self,
+        fetcher: Callable[[], pd.DataFrame],
+        initial_snapshot: PriceSnapshot,
+        source: str = "Yahoo Finance",
+        clock: Callable[[], datetime] = utc_now,
+        refresh_delay: timedelta = REFRESH_DELAY_AFTER_CLOSE,
+        initial_backoff: timedelta = INITIAL_RETRY_BACKOFF,
+        max_backoff: timedelta = MAX_RETRY_BACKOFF,
+    ):
+        self._fetcher = fetcher
+        self._snapshot = initial_snapshot
+        self._source = source
+        self._clock = clock
+        self._refresh_delay = refresh_delay
+        self._initial_backoff = initial_backoff
+        self._max_backoff = max_backoff
+
+        self._backoff = initial_backoff
+        self.last_error: Exception | None = None
+        now = clock()
+        self.next_attempt_at = now if initial_snapshot.is_stale(now) else self._next_scheduled_refresh(now)
+
+        # guards the attempt itself, so concurrent callers never fetch twice nor wait for each other
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def snapshot(self) -> PriceSnapshot:
+        """
+        Returns the last good snapshot without blocking.
+        """
+        return self._snapshot
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Returns True when the background worker thread is alive.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def _next_scheduled_refresh(self, now: datetime) -> datetime:
+        return next_daily_close(now) + self._refresh_delay
+
+    def refresh_once(self) -> bool:
+        """
+        Fetches new data and swaps the snapshot if successful.
+        Does nothing if another refresh is already in progress. If the new snapshot is still stale
+        (see PriceSnapshot.is_stale), the next attempt is scheduled after the retry backoff, not after the next close.
+
+        Returns:
+            True if the snapshot was replaced, False otherwise
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            try:
+                df = self._fetcher()
+            except Exception as error:
+                count('price_refresh_failures')
+                self.last_error = error
+                self.next_attempt_at = self._clock() + self._backoff
+                self._backoff = min(self._backoff * 2, self._max_backoff)
+                return False
+
+            count('price_refresh_successes')
+            now = self._clock()
+            self._snapshot = PriceSnapshot(df=df, source=self._source, refreshed_at=now)
+            self.last_error = None
+            if self._snapshot.is_stale(now):
+                # the provider has not published the finished candle yet, retried as a failure
+                count('price_refresh_stale')
+                self.next_attempt_at = now + self._backoff
+                self._backoff = min(self._backoff * 2, self._max_backoff)
+            else:
+                self._backoff = self._initial_backoff
+                self.next_attempt_at = self._next_scheduled_refresh(now)
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_if_due(self) -> bool:
+        """
+        Runs refresh_once if the next scheduled or retry attempt is due.
+
+        Returns:
+            True if the snapshot was replaced, False otherwise
+        """
+        if self._clock() < self.next_attempt_at:
+            return False
+        return self.refresh_once()
+
+    def start(self) -> bool:
+        """
+        Starts the daemon worker thread.
+
+        Returns:
+            False if threads are not supported (e.g. stlite/Pyodide); refresh_if_due then has to be called by the caller
+        """
+        if self.is_running:
+            return True
+        self._stop_event.clear()
+        thread = threading.Thread(target=self._run, name="price-data-refresher", daemon=True)
+        try:
+            thread.start()
+        except RuntimeError:
+            return False
+        self._thread = thread
+        return True
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Signals the worker thread to finish and waits for it.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            wait = (self.next_attempt_at - self._clock()).total_seconds()
+            if wait > 0:
+                self._stop_event.wait(min(wait, MAX_WORKER_SLEEP.total_seconds()))
+                continue
+            if not self.refresh_once() and self.next_attempt_at <= self._clock():
+                # another caller is refreshing right now
+                self._stop_event.wait(1)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Compact price history: int32 day numbers and a Close array instead of the seven float64/datetime columns
+of the price files.
+
+The indicator and chart paths use only Date and Close, so the other columns (Open, High, Low, Adj Close, Volume)
+are read from the source file only when requested. Dates and closes are validated once when the history
+is created (see validate_price_history), the code using it does not check them again.
+
+Close is stored as float64 by default, so the indicators are the same as from the full DataFrame.
+float32 halves the memory of many assets (e.g. of the screener), the SMAs are still summed in float64.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from load_update_price_df import (
+    CSV_FILE_PATH,
+    FEATHER_FILE_PATH,
+    NPZ_FILE_PATH,
+    PriceSchemaError,
+    apply_price_delta,
+    delta_path,
+    read_price_delta,
+    validate_price_history,
+)
+
+
+# BTC trades every day, a missing day in its validated history is an error
+BTC_MAX_GAP_DAYS = 1
+# runs of missing days up to this long (e.g. a candle not published by Yahoo) are filled with the previous close
+# before the validation (see normalize_price_history), longer gaps are errors
+BTC_MAX_FILLED_DAYS = 3
+
+
+def resolve_price_path(path: Path = FEATHER_FILE_PATH) -> Path:
+    """
+    Returns path if it exists, otherwise the NumPy archive and then the CSV file (the order of load_BTC_price_store).
+    """
+    path = Path(path)
+    for candidate in (path, NPZ_FILE_PATH, CSV_FILE_PATH):
+        if candidate.exists():
+            return candidate
+    raise FileNotFoundError(f"price file {path} does not exist")
+
+
+def read_price_columns(path: Path, columns: list[str]) -> pd.DataFrame:
+    """
+    Reads only columns of price file (Feather, .npz or CSV) with the rows of its delta file,
+    the other columns are not parsed.
+    """
+    path = Path(path)
+    delta_df, _ = read_price_delta(delta_path(path))
+    if delta_df.empty:
+        return read_snapshot_columns(path, columns)
+    # the delta rows are merged by Date
+    df = read_snapshot_columns(path, columns if 'Date' in columns else ['Date', *columns])
+    return apply_price_delta(df, delta_df)[columns]
+
+
+def read_snapshot_columns(path: Path, columns: list[str]) -> pd.DataFrame:
+    """
+    Reads only columns of price file without its delta file.
+    """
+    path = Path(path)
+    if path.suffix == '.csv':
+        return pd.read_csv(path, usecols=columns, parse_dates=['Date'] if 'Date' in columns else False)[columns]
+    if path.suffix == '.npz':
+        # members of the archive are decompressed only when accessed
+        with np.load(path) as archive:
+            data = {column: archive[column] for column in columns}
+        if 'Date' in data:
+            data['Date'] = data['Date'].astype('datetime64[D]').astype('datetime64[ns]')
+        return pd.DataFrame(data)
+
+    from pyarrow import feather
+
+    return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+@dataclass(frozen=True, eq=False)
+class CompactHistory:
+    """
+    Validated price history of one asset. The arrays are shared and must not be modified.
+
+    Attributes:
+        days (np.ndarray): int32 days since 1970-01-01, strictly increasing
+        close (np.ndarray): Close of every day, float64 or float32
+        source (Path | None): price file the history was loaded from, other columns are read from it on demand
+    """
+    days: np.ndarray
+    close: np.ndarray
+    source: Path | None = None
+    _columns: dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, close_dtype=np.float64, max_gap_days: int | None = None,
+                   source: Path | None = None) -> CompactHistory:
+        """
+        Validates Date and Close of df (see validate_price_history) and keeps only them.
+        """
+        days = validate_price_history(df, max_gap_days=max_gap_days)
+        return cls(days, df['Close'].to_numpy(dtype=close_dtype), source)
+
+    @classmethod
+    def load(cls, path: Path = FEATHER_FILE_PATH, close_dtype=np.float64,
+             max_gap_days: int | None = None) -> CompactHistory:
+        """
+        Loads only Date and Close of price file, falls back to the NumPy archive and CSV file (see resolve_price_path).
+        """
+        path = resolve_price_path(path)
+        return cls.from_frame(read_price_columns(path, ['Date', 'Close']), close_dtype=close_dtype,
+                              max_gap_days=max_gap_days, source=path)
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def dates(self) -> np.ndarray:
+        """
+        Returns datetime64[ns] dates of the rows.
+        """
+        return self.days.astype('datetime64[D]').astype('datetime64[ns]')
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns memory of the arrays, including the columns loaded on demand.
+        """
+        return self.days.nbytes+self.close.nbytes+sum(values.nbytes for values in self._columns.values())
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Returns other column (e.g. Volume) of the history, read from the source file on first use.
+
+        Raises:
+            KeyError: if the history was not loaded from a file
+            PriceSchemaError: if the source file was rewritten with a different number of rows since the history was loaded
+        """
+        if name == 'Close':
+            return self.close
+        if name not in self._columns:
+            if self.source is None:
+                raise KeyError(f"{name} is not available, the history was not loaded from a price file")
+            values = read_price_columns(self.source, [name])[name].to_numpy()
+            if len(values) != len(self):
+                raise PriceSchemaError(f"{self.source} has {len(values)} rows, the history was loaded with {len(self)}")
+            self._columns[name] = values
+        return self._columns[name]
+
+    def to_frame(self, columns: tuple[str, ...] = ()) -> pd.DataFrame:
+        """
+        Returns DataFrame with Date, Close and the requested other columns, e.g. for calc_pi_cycle_indicators.
+        """
+        return pd.DataFrame({'Date': self.dates, 'Close': self.close,
+                             **{column: self.column(column) for column in columns}})
+
+
+if __name__ == '__main__':
+    pass
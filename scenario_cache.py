@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of computed scenarios shared by all sessions.
+
+Many sessions submit the same guess table (at least the default one), so the guessed rows with their indicators
+are cached by the version of the history (including a hash of the closes the guessed rows depend on)
+and a canonical hash of the guess table. The guess is normalized the same
+way calc_guess_rows reads it: rows with missing values are dropped, periods are clipped to whole non-negative days,
+empty periods are dropped and consecutive periods with the same daily change are merged, so equivalent tables
+share one entry. Entries are evicted in least recently used order once the cache exceeds its memory budget.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from perf_metrics import count
+from top_indic_calc import SMA_LONG_PERIOD
+
+
+# memory budget of the cached tails, a guess of a few years takes about 100 KiB
+SCENARIO_CACHE_MAX_BYTES = 32*1024**2
+HASH_CHUNK_ROWS = 65_536
+
+
+def normalize_guess(guess_df: pd.DataFrame) -> tuple[tuple[float, int], ...]:
+    """
+    Returns canonical form of the guess table: (daily change in %, number of days) of every period.
+    Tables with the same canonical form give the same guessed rows (see calc_guess_rows).
+    """
+    guess_rows = guess_df[['Daily Change (%)', 'Period (days)']].astype(float).dropna()
+    period_lens = np.clip(guess_rows['Period (days)'].to_numpy(), 0, None).astype(np.int64)
+    segments: list[list] = []
+    for change, days in zip(guess_rows['Daily Change (%)'].to_numpy(), period_lens):
+        if days == 0:
+            continue
+        # -0.0 and 0.0 give the same multiplier
+        change = float(change)+0.0
+        if segments and segments[-1][0] == change:
+            segments[-1][1] += int(days)
+        else:
+            segments.append([change, int(days)])
+    return tuple((change, days) for change, days in segments)
+
+
+def guess_hash(segments: tuple[tuple[float, int], ...]) -> str:
+    """
+    Returns stable hash of the normalized guess (floats are hashed by their exact representation).
+    """
+    canonical = ';'.join(f"{change.hex()}x{days}" for change, days in segments)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def history_version(df: pd.DataFrame, n_closes: int | None = SMA_LONG_PERIOD) -> tuple[pd.Timestamp, int, str]:
+    """
+    Returns version of the history: the last Date, the number of rows (the guessed rows are indexed after them)
+    and a hash of the last n_closes closes, by default the last SMA_LONG_PERIOD closes, the only ones
+    the guessed rows depend on. None hashes all closes (e.g. for the chart of the whole history).
+    A restated or revised close of the same day therefore gives a new version.
+    """
+    closes = (df['Close'] if n_closes is None else df['Close'].iloc[-n_closes:]).to_numpy(dtype=np.float64)
+    digest = hashlib.sha256()
+    # hashed by chunks, a strided column of a long history is not copied at once
+    for start in range(0, len(closes), HASH_CHUNK_ROWS):
+        digest.update(np.ascontiguousarray(closes[start:start+HASH_CHUNK_ROWS]))
+    return pd.Timestamp(df['Date'].iloc[-1]), len(df), digest.hexdigest()
+
+
+class ScenarioCache:
+    """
+    Thread-safe LRU cache of guessed rows with indicator columns, bounded by the memory of the cached DataFrames.
+
+    Cached DataFrames are shared by all sessions and must not be modified.
+
+    Args:
+        max_bytes (int): memory budget, the least recently used entries are evicted above it
+    """
+
+    def __init__(self, max_bytes: int = SCENARIO_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, df: pd.DataFrame, guess_df: pd.DataFrame,
+                       compute: Callable[[pd.DataFrame, pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Returns compute(df, guess_df), from the cache if an equivalent guess was computed for the same history.
+        Concurrent misses of the same key may compute it twice, the result is the same.
+        """
+        segments = normalize_guess(guess_df)
+        if not segments:
+            return compute(df, guess_df)
+        key = (*history_version(df), guess_hash(segments))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            count('scenario_cache_hits')
+            return entry[0]
+
+        count('scenario_cache_misses')
+        tail = compute(df, guess_df)
+        size = int(tail.memory_usage(deep=True).sum())
+        with self._lock:
+            self.misses += 1
+            if size > self.max_bytes or key in self._entries:
+                return tail
+            self._entries[key] = (tail, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return tail
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Returns number of entries, their memory and hit/miss/eviction counters.
+        """
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Batch (Monte Carlo) scenarios of the future Bitcoin price.
+
+Instead of one hand-typed path, many stochastic paths are generated, either bootstrapped from
+historical daily returns or drawn from a daily drift and volatility. SMA_111, SMA_350 and the crossunder
+levels are calculated for all paths at once from 2-D cumulative sums, paths are processed in chunks
+so the memory stays bounded. The result is the probability and the date distribution of the first
+crossunder of each level within the simulated period.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from top_indic_calc import CROSS_LEVELS, SMA_LONG_PERIOD, SMA_SHORT_PERIOD
+
+
+CROSS_LEVEL_NAMES = {
+    'crossunder_SMA_350': '350 Days SMA',
+    'crossunder_1.62SMA_350': '1.62 × 350 Days SMA',
+    'crossunder_2SMA_350': '2 × 350 Days SMA',
+}
+# rough budget for the arrays of one chunk of paths, the number of paths per chunk is derived from it
+CHUNK_MEMORY_BYTES = 64*1024**2
+# number of float64 arrays of the (paths, days) shape alive at the same time while a chunk is evaluated
+ARRAYS_PER_CHUNK = 6
+
+
+def historical_daily_multipliers(df: pd.DataFrame, lookback_days: int | None = None) -> np.ndarray:
+    """
+    Returns daily multipliers (Close / previous Close) of the historical data, optionally only of the last lookback_days
+    """
+    close = df['Close'].to_numpy(dtype=float)
+    if lookback_days is not None:
+        close = close[-(lookback_days+1):]
+    multipliers = close[1:]/close[:-1]
+    return multipliers[np.isfinite(multipliers)]
+
+
+def bootstrap_multipliers(historical_multipliers: np.ndarray, n_paths: int, n_days: int,
+                          rng: np.random.Generator) -> np.ndarray:
+    """
+    Draws daily multipliers of n_paths paths from the historical ones (with replacement).
+
+    Returns:
+        np.ndarray: array of shape (n_paths, n_days)
+    """
+    return rng.choice(historical_multipliers, size=(n_paths, n_days))
+
+
+def drift_volatility_multipliers(daily_change_pct: float, volatility_pct: float, n_paths: int, n_days: int,
+                                 rng: np.random.Generator) -> np.ndarray:
+    """
+    Draws daily multipliers of n_paths paths from log-normal distribution, so the price stays positive.
+    The median daily change is daily_change_pct and volatility_pct is the standard deviation of daily log return (in %).
+
+    Returns:
+        np.ndarray: array of shape (n_paths, n_days)
+    """
+    log_returns = rng.normal(np.log1p(daily_change_pct/100), volatility_pct/100, size=(n_paths, n_days))
+    return np.exp(log_returns)
+
+
+def rolling_mean_2d(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Calculates rolling mean along the rows of 2-D array from cumulative sums.
+
+    Returns:
+        np.ndarray: array with values.shape[1]-window+1 columns, column j is the mean of values[:, j:j+window]
+    """
+    cumsum = np.cumsum(values, axis=1)
+    means = cumsum[:, window-1:].copy()
+    means[:, 1:] -= cumsum[:, :-window]
+    means /= window
+    return means
+
+
+def first_cross_days(history_tail: np.ndarray, close_paths: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Finds the first crossunder of every level in CROSS_LEVELS for each path.
+
+    Args:
+        history_tail (np.ndarray): the last SMA_LONG_PERIOD historical closes
+        close_paths (np.ndarray): guessed closes of shape (n_paths, n_days) following the history
+
+    Returns:
+        dict: crossunder column name -> index of the first guessed day with the crossunder, -1 if there is none
+    """
+    n_paths, n_days = close_paths.shape
+    closes = np.concatenate((np.broadcast_to(history_tail, (n_paths, len(history_tail))), close_paths), axis=1)
+    # SMAs of the last historical day (needed for the crossunder of the first guessed day) and of all guessed days
+    sma_short = rolling_mean_2d(closes[:, -(n_days+SMA_SHORT_PERIOD):], SMA_SHORT_PERIOD)
+    sma_long = rolling_mean_2d(closes, SMA_LONG_PERIOD)
+    del closes
+
+    first_days = {}
+    for column, multiplier in CROSS_LEVELS.items():
+        above = sma_short > multiplier*sma_long
+        crosses = above[:, 1:] & ~above[:, :-1]
+        first_days[column] = np.where(crosses.any(axis=1), crosses.argmax(axis=1), -1)
+    return first_days
+
+
+def paths_per_chunk(n_days: int, memory_bytes: int = CHUNK_MEMORY_BYTES) -> int:
+    """
+    Returns number of paths processed at once so that one chunk fits into memory_bytes.
+    """
+    bytes_per_path = ARRAYS_PER_CHUNK*8*(n_days+SMA_LONG_PERIOD)
+    return max(1, memory_bytes//bytes_per_path)
+
+
+def simulate_first_crosses(df: pd.DataFrame, n_paths: int, n_days: int, method: str = 'bootstrap',
+                           daily_change_pct: float = 0.0, volatility_pct: float = 3.0,
+                           lookback_days: int | None = None, seed: int | None = None,
+                           chunk_size: int | None = None) -> pd.DataFrame:
+    """
+    Simulates n_paths future price paths of n_days following df and counts the first crossunders on each day.
+
+    Args:
+        df (pd.DataFrame): historical data with Date and Close columns, at least SMA_LONG_PERIOD rows
+        n_paths (int): number of simulated paths
+        n_days (int): number of simulated days of each path
+        method (str): 'bootstrap' to draw historical daily changes (optionally of the last lookback_days),
+            'drift' to draw from daily_change_pct and volatility_pct
+        seed (int | None): seed of the random generator, for reproducible results
+        chunk_size (int | None): number of paths evaluated at once, derived from CHUNK_MEMORY_BYTES if None
+
+    Returns:
+        pd.DataFrame: Date column of the simulated days and, for every crossunder column in CROSS_LEVELS,
+        the number of paths with the first crossunder on that day
+    """
+    if len(df) < SMA_LONG_PERIOD:
+        raise ValueError(f"At least {SMA_LONG_PERIOD} historical rows are needed for the simulation.")
+    if method not in ('bootstrap', 'drift'):
+        raise ValueError(f"Unknown simulation method: {method}")
+
+    rng = np.random.default_rng(seed)
+    history_tail = df['Close'].to_numpy(dtype=float)[-SMA_LONG_PERIOD:]
+    if method == 'bootstrap':
+        historical_multipliers = historical_daily_multipliers(df, lookback_days)
+    chunk_size = chunk_size or paths_per_chunk(n_days)
+
+    counts = {column: np.zeros(n_days, dtype=np.int64) for column in CROSS_LEVELS}
+    for chunk_start in range(0, n_paths, chunk_size):
+        chunk_paths = min(chunk_size, n_paths-chunk_start)
+        if method == 'bootstrap':
+            multipliers = bootstrap_multipliers(historical_multipliers, chunk_paths, n_days, rng)
+        else:
+            multipliers = drift_volatility_multipliers(daily_change_pct, volatility_pct, chunk_paths, n_days, rng)
+        # prices of the paths, the multipliers are reused in place to keep the memory bounded
+        close_paths = np.cumprod(multipliers, axis=1, out=multipliers)
+        close_paths *= history_tail[-1]
+
+        for column, first_days in first_cross_days(history_tail, close_paths).items():
+            counts[column] += np.bincount(first_days[first_days >= 0], minlength=n_days)
+
+    dates = pd.date_range(start=df['Date'].iloc[-1]+pd.Timedelta(days = 1), periods=n_days, freq='D')
+    return pd.DataFrame({'Date': dates, **counts})
+
+
+def summarize_first_crosses(first_crosses_df: pd.DataFrame, n_paths: int,
+                            quantiles: tuple[float, ...] = (0.05, 0.5, 0.95)) -> pd.DataFrame:
+    """
+    Summarizes the output of simulate_first_crosses.
+
+    Returns:
+        pd.DataFrame: one row per crossunder level with the probability of the crossunder within the simulated
+        period and the dates of the quantiles of the first crossunder (among the paths with a crossunder)
+    """
+    rows = []
+    for column, name in CROSS_LEVEL_NAMES.items():
+        counts = first_crosses_df[column].to_numpy()
+        n_crossed = counts.sum()
+        row = {'Level': name, 'Probability (%)': 100*n_crossed/n_paths}
+        cumulative = np.cumsum(counts)
+        for q in quantiles:
+            day = np.searchsorted(cumulative, q*n_crossed) if n_crossed else None
+            row[f'{q:.0%} Date'] = first_crosses_df['Date'].iloc[day] if day is not None else pd.NaT
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    pass
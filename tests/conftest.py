@@ -0,0 +1,14 @@
+"""
+Correctness tests of the app modules, run with:
+    python -m pytest tests
+
+The synthetic histories, the recorded Yahoo payload and the mock Yahoo server are shared with the benchmarks
+(see benchmarks/synthetic_prices.py and benchmarks/mock_yahoo.py).
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT/'benchmarks'))
+sys.path.insert(0, str(ROOT))
@@ -0,0 +1,188 @@
+"""
+Local HTTP API of the indicator data (see indicator_api), served on a free port from a synthetic history.
+"""
+
+import http.client
+import json
+import socket
+from datetime import timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicator_api import IndicatorAPI, MAX_BODY_BYTES, ServerThread, cross_table
+from price_data_refresher import PriceDataRefresher, PriceSnapshot
+from synthetic_prices import synthetic_price_history
+from top_indic_calc import calc_guess_tail, calc_pi_cycle_indicators
+
+
+HISTORY_ROWS = 5000
+GUESS = {'guess': [{'Daily Change (%)': 0.3, 'Period (days)': 200}, {'Daily Change (%)': -0.2, 'Period (days)': 100}]}
+
+
+@pytest.fixture(scope='module')
+def full_history():
+    return calc_pi_cycle_indicators(synthetic_price_history(HISTORY_ROWS))
+
+
+@pytest.fixture
+def api(full_history):
+    # the day after the last served candle, the fetcher adds it
+    now = full_history['Date'].iloc[-1].to_pydatetime().replace(tzinfo=timezone.utc)
+    snapshot = PriceSnapshot(full_history.iloc[:-1], 'test', now)
+    return IndicatorAPI(PriceDataRefresher(lambda: full_history, snapshot, clock=lambda: now), clock=lambda: now)
+
+
+@pytest.fixture
+def client(api):
+    server = ServerThread(api)
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=10)
+
+    def request(method, path, body=None, headers=None):
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+
+    yield request
+    connection.close()
+    server.stop()
+
+
+def read_arrow(body: bytes) -> pd.DataFrame:
+    pyarrow = pytest.importorskip('pyarrow')
+    return pyarrow.ipc.open_stream(body).read_all().to_pandas()
+
+
+def test_json_and_not_modified(api, client):
+    df = api.refresher.snapshot.df
+    response, body = client('GET', '/v1/indicators')
+    assert response.status == 200 and response.getheader('Content-Type') == 'application/json'
+    payload = json.loads(body)
+    table = pd.DataFrame(payload['data'], columns=payload['columns'])
+    assert payload['columns'] == ['Date', 'Close', 'SMA_111', 'SMA_350'] and len(table) == len(df)
+    assert table['Date'].iloc[-1] == f"{df['Date'].iloc[-1]:%Y-%m-%d}"
+    np.testing.assert_allclose(table['SMA_350'].to_numpy(dtype=float), df['SMA_350'], rtol=1e-9)
+
+    # the encoded response is reused, a poller with its ETag gets an empty 304
+    etag = response.getheader('ETag')
+    assert client('GET', '/v1/indicators')[1] == body
+    response, body = client('GET', '/v1/indicators', headers={'If-None-Match': etag})
+    assert response.status == 304 and body == b'' and response.getheader('ETag') == etag
+
+
+def test_arrow_format(api, client):
+    df = api.refresher.snapshot.df
+    by_query, body = client('GET', '/v1/crosses?format=arrow')
+    by_accept, accepted_body = client('GET', '/v1/crosses', headers={'Accept': 'application/vnd.apache.arrow.stream'})
+    assert by_query.status == by_accept.status == 200 and body == accepted_body
+    assert by_query.getheader('ETag') != client('GET', '/v1/crosses')[0].getheader('ETag')
+    pd.testing.assert_frame_equal(read_arrow(body), cross_table(df), check_dtype=False)
+
+
+def test_refresh_changes_etag(api, client):
+    response, _ = client('GET', '/v1/history')
+    etag = response.getheader('ETag')
+    assert api.refresher.refresh_once()
+
+    response, body = client('GET', '/v1/history', headers={'If-None-Match': etag})
+    assert response.status == 200 and response.getheader('ETag') != etag
+    assert len(json.loads(body)['data']) == HISTORY_ROWS
+
+
+def test_scenario(api, client):
+    df = api.refresher.snapshot.df
+    response, body = client('POST', '/v1/scenario?format=arrow', body=json.dumps(GUESS))
+    assert response.status == 200
+    guess_df = pd.DataFrame(GUESS['guess'])
+    expected = calc_guess_tail(df, guess_df)[read_arrow(body).columns].reset_index(drop=True)
+    pd.testing.assert_frame_equal(read_arrow(body), expected, check_dtype=False)
+
+    # equivalent guess tables share the cached rows, and the encoded response in the same format
+    response, json_body = client('POST', '/v1/scenario', body=json.dumps(GUESS['guess']))
+    assert response.status == 200 and api.cache.stats()['hits'] == 1
+    merged = {'guess': [{'Daily Change (%)': 0.3, 'Period (days)': 150}, {'Daily Change (%)': 0.3, 'Period (days)': 50},
+                        *GUESS['guess'][1:]]}
+    assert client('POST', '/v1/scenario', body=json.dumps(merged))[1] == json_body
+    assert api.cache.stats()['hits'] == 1
+
+
+@pytest.mark.parametrize('method, path, body, status', [
+    ('GET', '/v1/unknown', None, 404),
+    ('POST', '/v1/history', None, 405),
+    ('GET', '/v1/scenario', None, 405),
+    ('GET', '/v1/indicators?format=xml', None, 400),
+    ('POST', '/v1/scenario', b'{"guess": 3', 400),
+    ('POST', '/v1/scenario', b'{"guess": [{"Daily Change (%)": "up", "Period (days)": 10}]}', 400),
+    ('POST', '/v1/scenario', b'{"guess": [{"Daily Change (%)": NaN, "Period (days)": 10}]}', 400),
+    ('POST', '/v1/scenario', b'{"guess": [{"Daily Change (%)": 0.1, "Period (days)": 2.5}]}', 400),
+    ('POST', '/v1/scenario', b'{"guess": [{"Daily Change (%)": 0.1, "Period (days)": 0}]}', 400),
+    ('POST', '/v1/scenario', b'{"guess": [{"Daily Change (%)": 0.1}]}', 400),
+])
+def test_errors(client, method, path, body, status):
+    response, response_body = client(method, path, body=body)
+    assert response.status == status and 'error' in json.loads(response_body)
+
+
+@pytest.mark.parametrize('period', ['1e6', '1e9'])
+def test_too_long_guess(api, client, period):
+    # beyond the last date of pandas, and a guess of several GiB
+    body = f'{{"guess": [{{"Daily Change (%)": 0.1, "Period (days)": {period}}}]}}'.encode()
+    response, response_body = client('POST', '/v1/scenario', body=body)
+    assert response.status == 400 and 'at most' in json.loads(response_body)['error']
+    assert api.cache.stats()['misses'] == 0
+
+
+def test_restated_close_changes_etag(full_history):
+    # the same days, but the close of the last one was revised
+    now = full_history['Date'].iloc[-1].to_pydatetime().replace(tzinfo=timezone.utc)
+    served = full_history.iloc[:-1]
+    restated = served.copy()
+    restated.loc[restated.index[-1], 'Close'] *= 1.01
+    refresher = PriceDataRefresher(lambda: restated, PriceSnapshot(served, 'test', now), clock=lambda: now)
+    api = IndicatorAPI(refresher, clock=lambda: now)
+
+    etag = api.handle('GET', '/v1/history', {}).headers['ETag']
+    assert api.refresher.refresh_once()
+    response = api.handle('GET', '/v1/history', {'if-none-match': etag})
+    assert response.status == 200 and response.headers['ETag'] != etag
+
+
+def test_body_too_large(api):
+    server = ServerThread(api)
+    try:
+        # answered after the head, before the body is sent
+        with socket.create_connection(('127.0.0.1', server.port), timeout=10) as connection:
+            connection.sendall(f'POST /v1/scenario HTTP/1.1\r\nContent-Length: {MAX_BODY_BYTES+1}\r\n\r\n'.encode())
+            response = connection.makefile('rb').read()
+    finally:
+        server.stop()
+    assert response.startswith(b'HTTP/1.1 413 ') and b'Connection: close' in response
+
+
+def test_expect_continue(api):
+    expected = api.handle('POST', '/v1/scenario', {}, json.dumps(GUESS).encode()).body
+    body = json.dumps(GUESS).encode()
+    head = f'POST /v1/scenario HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n'
+    server = ServerThread(api)
+    try:
+        # the body is only sent after the interim response, as by curl for larger bodies
+        with socket.create_connection(('127.0.0.1', server.port), timeout=10) as connection:
+            connection.sendall(f'{head}Expect: 100-continue\r\n\r\n'.encode())
+            stream = connection.makefile('rb')
+            assert stream.readline() == b'HTTP/1.1 100 Continue\r\n' and stream.readline() == b'\r\n'
+            connection.sendall(body)
+            response = stream.read()
+        with socket.create_connection(('127.0.0.1', server.port), timeout=10) as connection:
+            connection.sendall(f'{head}Expect: something-else\r\n\r\n'.encode())
+            rejected = connection.makefile('rb').read()
+    finally:
+        server.stop()
+    assert response.startswith(b'HTTP/1.1 200 ') and response.endswith(b'\r\n\r\n'+expected)
+    assert rejected.startswith(b'HTTP/1.1 417 ') and b'Connection: close' in rejected
+
+
+def test_status(api, client):
+    response, body = client('GET', '/v1/status')
+    status = json.loads(body)
+    assert response.status == 200 and status['rows'] == HISTORY_ROWS-1 and status['source'] == 'test'
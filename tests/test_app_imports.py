@@ -0,0 +1,16 @@
+"""
+Modules loaded by the app, the stlite build ships only the packages of the browser.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+
+def test_app_modules_do_not_import_requests():
+    # requests (and the metrics endpoint) are loaded only when used, the stlite build does not ship them
+    script = ("import sys, app_data_loader, top_indicator_content_prep, BTC_plot_with_future_estimate; "
+              "print([m for m in ('requests', 'http.server') if m in sys.modules])")
+    result = subprocess.run([sys.executable, '-c', script], cwd=Path(__file__).resolve().parents[1],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == '[]'
@@ -0,0 +1,48 @@
+"""
+Shared BTC dataset (see btc_price_data): missing days of the fetched candles and the fallback of the startup snapshot.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from btc_price_data import historical_indicators, load_local_history
+from load_update_price_df import PriceSchemaError, write_price_csv, write_price_feather, write_price_npz
+from synthetic_prices import synthetic_price_history
+from top_indic_calc import calc_pi_cycle_indicators
+
+
+@pytest.fixture(scope='module')
+def candles():
+    return synthetic_price_history(1000)
+
+
+def test_missing_day_of_fetched_candles_is_filled(candles):
+    df = historical_indicators(candles.drop(index=[500]))
+    expected = candles[['Date', 'Close']].iloc[:-1].copy()
+    expected.loc[500, 'Close'] = expected['Close'].iloc[499]
+    pd.testing.assert_frame_equal(df, calc_pi_cycle_indicators(expected.reset_index(drop=True)))
+
+
+def test_long_gap_of_fetched_candles_is_an_error(candles):
+    with pytest.raises(PriceSchemaError, match='gap of 11 days'):
+        historical_indicators(candles.drop(index=range(500, 510)))
+
+
+def test_local_history_falls_back_to_next_valid_file(tmp_path, candles):
+    feather_path, npz_path, csv_path = tmp_path/'prices.feather', tmp_path/'prices.npz', tmp_path/'prices.csv'
+    # the local store has a month missing, the archive is truncated, the bundled CSV file is older but valid
+    write_price_feather(candles.drop(index=range(500, 530)), output_path=feather_path)
+    write_price_npz(candles, output_path=npz_path)
+    npz_path.write_bytes(npz_path.read_bytes()[:100])
+    write_price_csv(candles.iloc[:900], output_path=csv_path)
+
+    history = load_local_history((feather_path, tmp_path/'missing.feather', npz_path, csv_path))
+    assert len(history) == 900
+    # the CSV file stores the closes rounded to 16 significant digits
+    np.testing.assert_allclose(history.close, candles['Close'].iloc[:900], rtol=1e-15)
+
+    with pytest.raises(PriceSchemaError, match='gap of 31 days'):
+        load_local_history((feather_path, npz_path))
+    with pytest.raises(FileNotFoundError):
+        load_local_history((tmp_path/'missing.feather',))
@@ -0,0 +1,101 @@
+"""
+Chart of the history and the future estimate (see BTC_plot_with_future_estimate): the downsampled lines,
+the cached static part and its invalidation.
+"""
+
+import base64
+import json
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import BTC_plot_with_future_estimate
+from BTC_plot_with_future_estimate import (
+    APP_CHART_MAX_POINTS, CROSSUNDER_COLUMNS, SMA_LINES, build_BTC_figure, build_static_figure, downsample_line,
+    minmax_indices, plot_BTC_chart,
+)
+from synthetic_prices import synthetic_price_history
+from top_indic_calc import calc_pi_cycle_indicators
+from top_indicator_content_prep import prepare_data_for_plot
+
+
+GUESSES = {
+    'multi_year': pd.DataFrame({'Daily Change (%)': [0.3, -0.2, 0.15, 0.05], 'Period (days)': [400, 300, 500, 260]}),
+}
+
+
+@pytest.fixture(scope='module')
+def history_with_indicators():
+    return calc_pi_cycle_indicators(synthetic_price_history(50_000))
+
+
+@pytest.mark.parametrize('n', [5, 101, 4000, 4001, 4003, 50_000])
+@pytest.mark.parametrize('n_out', [2, 3, 10, 2000])
+def test_minmax_indices(n, n_out):
+    y = np.random.default_rng(n).normal(size=n).cumsum()
+    positions = minmax_indices(y, n_out)
+    assert len(positions) <= n_out+2 and np.all(np.diff(positions) > 0)
+    if n_out >= n:
+        np.testing.assert_array_equal(positions, np.arange(n))
+        return
+    # the first and the last point and the extremes of every bucket of consecutive points
+    assert positions[0] == 0 and positions[-1] == n-1
+    width = -(-n//(n_out//2))
+    for start in range(0, n, width):
+        bucket = y[start:start+width]
+        assert {start+bucket.argmin(), start+bucket.argmax()} <= set(positions)
+
+
+@pytest.mark.parametrize('max_points', [50, APP_CHART_MAX_POINTS])
+def test_downsampled_lines_keep_crosses_and_boundary(history_with_indicators, max_points):
+    df = prepare_data_for_plot(history_with_indicators, GUESSES['multi_year'])
+    boundary = len(history_with_indicators)-1
+    keep = df[CROSSUNDER_COLUMNS].fillna(False).to_numpy(dtype=bool).any(axis=1)
+    assert keep[:boundary].sum() > 0 and keep[boundary:].sum() > 0
+    dates = df['Date'].to_numpy()
+    lines = [df['Close'].to_numpy(dtype=float)]+[multiplier*df[column].to_numpy(dtype=float)
+                                                 for column, multiplier, _, _ in SMA_LINES]
+    # the historical part ends and the estimate starts at the boundary point, as the traces of the chart
+    for part in (slice(None, boundary+1), slice(boundary, None)):
+        for y in lines:
+            x_out, y_out = downsample_line(dates[part], y[part], max_points, keep[part])
+            assert len(x_out) <= max_points+2+keep[part].sum()
+            kept = set(x_out)
+            assert dates[boundary] in kept
+            assert set(dates[part][keep[part]]) <= kept
+            np.testing.assert_array_equal(y_out, y[part][np.isin(dates[part], x_out)])
+
+
+@pytest.mark.parametrize('max_points', [None, APP_CHART_MAX_POINTS], ids=['full', 'downsampled'])
+def test_cached_static_figure(history_with_indicators, max_points):
+    df_with_guess = prepare_data_for_plot(history_with_indicators, GUESSES['multi_year'])
+    last_index = history_with_indicators.index[-1]
+    static_figure = build_static_figure(history_with_indicators, max_points=max_points).to_dict()
+    static_pickle = pickle.dumps(static_figure)
+    cached = build_BTC_figure(df_with_guess, last_index, max_points, static_figure=static_figure)
+    # the same figure as built without the cache, and the shared static part is not modified
+    assert json.loads(cached.to_json()) == json.loads(build_BTC_figure(df_with_guess, last_index, max_points).to_json())
+    assert pickle.dumps(static_figure) == static_pickle
+
+
+@pytest.mark.parametrize('revised_row', [-1, 0], ids=['last_close', 'first_close'])
+def test_static_figure_cache_follows_revised_closes(history_with_indicators, monkeypatch, revised_row):
+    # Streamlit is stubbed, the figure is returned instead of being shown
+    monkeypatch.setattr(BTC_plot_with_future_estimate.st, 'plotly_chart', lambda fig, **kwargs: fig)
+    BTC_plot_with_future_estimate._get_static_figure.clear()
+    history = history_with_indicators.iloc[-3000:]
+
+    def history_closes(df: pd.DataFrame) -> np.ndarray:
+        fig = plot_BTC_chart(prepare_data_for_plot(df, GUESSES['multi_year']), df.index[-1])
+        # the cached figure dict holds the arrays base64 encoded
+        y = fig.data[0].y
+        return np.frombuffer(base64.b64decode(y['bdata']), dtype=y['dtype']) if isinstance(y, dict) else np.asarray(y)
+
+    np.testing.assert_array_equal(history_closes(history), history['Close'])
+    # the same last day and number of rows, but a revised (or restated) close, the chart is rebuilt
+    revised = history.copy()
+    revised.loc[revised.index[revised_row], 'Close'] *= 1.05
+    np.testing.assert_array_equal(history_closes(revised), revised['Close'])
+    np.testing.assert_array_equal(history_closes(history), history['Close'])
@@ -0,0 +1,68 @@
+"""
+Fragments of the page (see top_indicator_content_prep.page_fragment): the only use of the private script run context
+of Streamlit, pinned to the installed Streamlit version, and the fallback to a full page rerun without it.
+"""
+
+import dataclasses
+from types import SimpleNamespace
+
+import pytest
+import streamlit
+from streamlit.runtime.scriptrunner import ScriptRunContext
+from streamlit.testing.v1 import AppTest
+
+import top_indicator_content_prep
+from top_indicator_content_prep import is_fragment_rerun
+
+
+def fragment_page():
+    import streamlit as st
+
+    from top_indicator_content_prep import is_fragment_rerun, page_fragment
+
+    @page_fragment
+    def view():
+        st.write(f'fragment rerun: {is_fragment_rerun()}')
+
+    view()
+
+
+def test_script_run_context_lists_fragments_of_rerun():
+    # is_fragment_rerun reads this private field, a Streamlit upgrade removing it fails here (and the app falls back)
+    fields = {field.name for field in dataclasses.fields(ScriptRunContext)}
+    assert 'fragment_ids_this_run' in fields, f'Streamlit {streamlit.__version__} has no fragment_ids_this_run'
+
+
+def test_full_page_rerun_is_not_a_fragment_rerun():
+    assert is_fragment_rerun() is False
+    app = AppTest.from_function(fragment_page).run()
+    assert not app.exception
+    assert app.markdown[0].value == 'fragment rerun: False'
+
+
+@pytest.mark.parametrize('ctx, expected', [
+    (SimpleNamespace(fragment_ids_this_run=['fragment-id']), True),
+    (SimpleNamespace(fragment_ids_this_run=[]), False),
+    (SimpleNamespace(), False),
+    (None, False),
+], ids=['fragment_rerun', 'page_rerun', 'missing_attribute', 'no_script_run'])
+def test_fragment_rerun_from_context(monkeypatch, ctx, expected):
+    monkeypatch.setattr('streamlit.runtime.scriptrunner.get_script_run_ctx', lambda suppress_warning=False: ctx)
+    assert is_fragment_rerun() is expected
+
+
+@pytest.mark.parametrize('ctx, recorded', [(SimpleNamespace(fragment_ids_this_run=['fragment-id']), True),
+                                           (SimpleNamespace(), False)], ids=['fragment_rerun', 'missing_attribute'])
+def test_fragment_rerun_is_recorded_separately(monkeypatch, ctx, recorded):
+    # without the context the function is only called, as during a page rerun
+    reruns = []
+    monkeypatch.setattr(top_indicator_content_prep, 'st', SimpleNamespace(fragment=lambda function: function,
+                                                                          query_params={}))
+    monkeypatch.setattr(top_indicator_content_prep, 'start_rerun', lambda **kwargs: reruns.append(kwargs))
+    monkeypatch.setattr('streamlit.runtime.scriptrunner.get_script_run_ctx', lambda suppress_warning=False: ctx)
+
+    def view():
+        return 'rendered'
+
+    assert top_indicator_content_prep.page_fragment(view)() == 'rendered'
+    assert reruns == ([{'collect': False, 'fragment': 'view'}] if recorded else [])
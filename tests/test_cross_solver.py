@@ -0,0 +1,32 @@
+"""
+Closed-form crossunder days of the scenarios (see cross_solver) against the guessed rows of the app.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cross_solver import CrossSolver
+from synthetic_prices import synthetic_price_history
+from top_indic_calc import CROSS_LEVELS, calc_pi_cycle_indicators, extend_with_guess
+
+
+@pytest.fixture(scope='module', params=[5_000, 50_000], ids=lambda n: f'{n//1000}k')
+def history_with_indicators(request):
+    return calc_pi_cycle_indicators(synthetic_price_history(request.param))
+
+
+@pytest.mark.parametrize('daily_change', [-0.2, 0.1, 0.3, 1.0])
+def test_cross_solver_matches_scenario_rows(history_with_indicators, daily_change):
+    n_days = 1500
+    guess = pd.DataFrame({'Daily Change (%)': [daily_change], 'Period (days)': [n_days]})
+    tail = extend_with_guess(history_with_indicators, guess).iloc[len(history_with_indicators):]
+    solver = CrossSolver(history_with_indicators['Close'].to_numpy(), horizon_days=n_days)
+    for column, multiplier in CROSS_LEVELS.items():
+        crosses = np.flatnonzero(tail[column].to_numpy())
+        expected = int(crosses[0])+1 if len(crosses) else None
+        assert solver.first_cross_day(daily_change, multiplier) == expected
+        min_change = solver.min_daily_change_to_cross(multiplier, n_days)
+        if min_change is not None:
+            assert solver.first_cross_day(min_change, multiplier, n_days) is not None
+            assert solver.first_cross_day(min_change-2e-6, multiplier, n_days) is None
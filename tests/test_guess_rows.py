@@ -0,0 +1,62 @@
+"""
+Guessed rows of the scenario (see calc_guess_rows): identical to the previous implementation,
+their indicators (see calc_guess_tail) equal to a recalculation of the whole history.
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from legacy_guess import add_guess_to_df_baseline
+from load_update_price_df import parse_yahoo_chart_payload
+from synthetic_prices import YAHOO_PAYLOAD_PATH, synthetic_price_history
+from top_indic_calc import (
+    INDICATOR_COLUMNS, add_guess_to_df, add_guess_with_indicators, calc_guess_rows, calc_pi_cycle_indicators,
+)
+
+
+def guess(changes, periods) -> pd.DataFrame:
+    return pd.DataFrame({'Daily Change (%)': changes, 'Period (days)': periods})
+
+
+GUESSES = {
+    'default': guess([0.1], [300]),
+    'multi_row': guess([0.3, -0.2, 0.15, 0.05], [400, 300, 500, 260]),
+    'negative': guess([-0.5, -2.0, -0.01], [200, 30, 90]),
+    'period_1': guess([5.0, -3.0, 1.0], [1, 1, 1]),
+    'missing_values': guess([0.2, None, -0.1, 0.4], [50, 20, None, 10]),
+    'fractional_and_zero_periods': guess([0.2, 0.1, -0.3], [10.7, 0, 5.2]),
+    'empty': guess([], []),
+}
+
+
+@pytest.fixture(scope='module', params=['btc', 'synthetic', 'short'])
+def history(request):
+    if request.param == 'btc':
+        # the recorded daily BTC history
+        return parse_yahoo_chart_payload(json.loads(YAHOO_PAYLOAD_PATH.read_text()))
+    # the short history is shorter than the long SMA window
+    return synthetic_price_history(2000 if request.param == 'synthetic' else 200, seed=7)
+
+
+@pytest.mark.parametrize('name', GUESSES)
+def test_matches_baseline(history, name):
+    expected = add_guess_to_df_baseline(history, GUESSES[name])
+    df_with_guess = add_guess_to_df(history, GUESSES[name])
+    pd.testing.assert_frame_equal(df_with_guess, expected, check_exact=True)
+    expected_rows = expected.iloc[len(history):][['Date', 'Close']]
+    pd.testing.assert_frame_equal(calc_guess_rows(history, GUESSES[name]), expected_rows,
+                                  check_exact=True, check_index_type=False)
+
+
+@pytest.mark.parametrize('name', GUESSES)
+def test_guess_tail_matches_full_recalculation(history, name):
+    expected = calc_pi_cycle_indicators(add_guess_to_df(history, GUESSES[name]))
+    df_with_guess = add_guess_with_indicators(calc_pi_cycle_indicators(history), GUESSES[name])
+    prices = [column for column in expected.columns if column not in INDICATOR_COLUMNS]
+    pd.testing.assert_frame_equal(df_with_guess[prices], expected[prices], check_exact=True)
+    # the rolling sums of the guessed rows start from the last long window, not from the first row of the history
+    for column in ['SMA_111', 'SMA_350']:
+        pd.testing.assert_series_equal(df_with_guess[column], expected[column], check_exact=False, rtol=1e-12)
+    pd.testing.assert_frame_equal(df_with_guess[INDICATOR_COLUMNS[2:]], expected[INDICATOR_COLUMNS[2:]])
@@ -0,0 +1,96 @@
+"""
+Incremental update of the price history (see update_btc_data_incremental) against a local mock of the Yahoo Finance
+chart API serving the candles of a synthetic history.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from load_update_price_df import (
+    CSV_COLUMNS, parse_yahoo_chart_payload, update_btc_data_incremental, yahoo_chart_base_url,
+)
+from mock_yahoo import MockYahooServer, serve_mock_yahoo
+from synthetic_prices import synthetic_price_history, yahoo_chart_payload
+
+
+HISTORY_ROWS = 1000
+STORED_ROWS = 990
+
+
+@pytest.fixture(scope='module')
+def full_history():
+    # parsed from the payload, as returned by fetch_yahoo_btc_data
+    return parse_yahoo_chart_payload(yahoo_chart_payload(synthetic_price_history(HISTORY_ROWS)))
+
+
+@pytest.fixture
+def yahoo_server(full_history):
+    with serve_mock_yahoo({'BTC-USD': full_history}) as server:
+        yield server
+
+
+@pytest.fixture
+def stored(full_history):
+    # the last stored row was the in-progress candle of its day
+    df = full_history.iloc[:STORED_ROWS].copy()
+    df.loc[df.index[-1], ['High', 'Close', 'Adj Close']] *= 0.99
+    return df
+
+
+def update(df: pd.DataFrame, server: MockYahooServer, delta: pd.DataFrame | None = None) -> tuple[pd.DataFrame, list]:
+    """
+    Returns df updated from the mock Yahoo API at noon of the last served day and the queries of the requests.
+    The requests with period1 are served the candles of delta instead of the full history, if it is given.
+    """
+    if delta is not None:
+        server.period_histories['BTC-USD'] = delta
+    full = server.histories['BTC-USD']
+    now = full['Date'].iloc[-1].to_pydatetime().replace(tzinfo=timezone.utc)+timedelta(hours=12)
+    updated = update_btc_data_incremental(df, base_url=yahoo_chart_base_url('BTC-USD', server.api_url), now=now)
+    return updated, [query for _, query in server.requests]
+
+
+def test_appends_delta(stored, full_history, yahoo_server):
+    updated, queries = update(stored, yahoo_server)
+    pd.testing.assert_frame_equal(updated, full_history, check_exact=True)
+    # only the candles since the last stored day are requested
+    last_day = datetime.combine(stored['Date'].iloc[-1].date(), datetime.min.time(), timezone.utc)
+    assert len(queries) == 1 and queries[0]['period1'] == str(int(last_day.timestamp()))
+
+
+def test_revised_in_progress_close(stored, full_history, yahoo_server):
+    # the only candle returned is the stored day, closed since
+    yahoo_server.histories['BTC-USD'] = full_history.iloc[:STORED_ROWS]
+    updated, queries = update(stored, yahoo_server)
+    pd.testing.assert_frame_equal(updated, full_history.iloc[:STORED_ROWS], check_exact=True)
+    assert updated['Close'].iloc[-1] != stored['Close'].iloc[-1]
+    assert len(queries) == 1
+
+
+def test_already_up_to_date(stored, full_history, yahoo_server):
+    updated, queries = update(stored, yahoo_server, delta=stored.iloc[-1:])
+    pd.testing.assert_frame_equal(updated, stored[CSV_COLUMNS], check_exact=True)
+    assert len(queries) == 1
+
+
+def test_restated_open_refetches_full_history(stored, full_history, yahoo_server):
+    delta = full_history.iloc[STORED_ROWS-1:].copy()
+    delta.loc[delta.index[0], 'Open'] *= 1.001
+    updated, queries = update(stored, yahoo_server, delta=delta)
+    pd.testing.assert_frame_equal(updated, full_history, check_exact=True)
+    assert len(queries) == 2 and queries[1]['range'] == '50y'
+
+
+def test_gap_refetches_full_history(stored, full_history, yahoo_server):
+    # the returned candles start after the last stored day, the overlap candle is missing
+    updated, queries = update(stored, yahoo_server, delta=full_history.iloc[STORED_ROWS+2:])
+    pd.testing.assert_frame_equal(updated, full_history, check_exact=True)
+    assert len(queries) == 2 and queries[1]['range'] == '50y'
+
+
+def test_empty_history_fetches_full_history(full_history, yahoo_server):
+    updated, queries = update(full_history.iloc[:0], yahoo_server)
+    pd.testing.assert_frame_equal(updated, full_history, check_exact=True)
+    assert len(queries) == 1 and queries[0]['range'] == '50y'
@@ -0,0 +1,139 @@
+"""
+Multi-asset ingestion against a local mock of the Yahoo Finance chart API.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+import multi_asset_ingestion
+from load_update_price_df import yahoo_chart_base_url
+from mock_yahoo import MockYahooServer, serve_mock_yahoo
+from multi_asset_ingestion import MultiAssetIngestor, create_session
+from price_data_refresher import INITIAL_RETRY_BACKOFF
+from synthetic_prices import synthetic_price_history
+
+
+TICKERS = ['BTC-USD', 'ETH-USD', 'SOL-USD', 'ADA-USD', 'XRP-USD', 'DOGE-USD', 'DOT-USD', 'LTC-USD']
+HISTORY_ROWS = 2000
+
+
+@pytest.fixture
+def yahoo_server():
+    histories = {ticker: synthetic_price_history(HISTORY_ROWS, seed=seed) for seed, ticker in enumerate(TICKERS)}
+    with serve_mock_yahoo(histories, visible_rows=HISTORY_ROWS-10) as server:
+        yield server
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+def visible_day_clock(server: MockYahooServer) -> FakeClock:
+    # noon of the last published (in-progress) day
+    last_date = server.histories[TICKERS[0]]['Date'].iloc[server.visible_rows-1]
+    return FakeClock(last_date.to_pydatetime().replace(tzinfo=timezone.utc)+timedelta(hours=12))
+
+
+def test_partial_failure(yahoo_server):
+    ingestor = MultiAssetIngestor(session=create_session(retries=0), api_url=yahoo_server.api_url)
+    results = ingestor.fetch(['BTC-USD', 'FAIL-USD', 'ETH-USD'])
+    assert list(results) == ['BTC-USD', 'FAIL-USD', 'ETH-USD']
+    assert results['BTC-USD'].is_ok and results['ETH-USD'].is_ok
+    assert not results['FAIL-USD'].is_ok and results['FAIL-USD'].error is not None
+
+
+def test_cached_until_daily_close_then_incremental(yahoo_server):
+    clock = visible_day_clock(yahoo_server)
+    ingestor = MultiAssetIngestor(session=create_session(retries=0), api_url=yahoo_server.api_url, clock=clock)
+    first = ingestor.fetch(['BTC-USD'])['BTC-USD']
+    n_requests = len(yahoo_server.requests)
+
+    # served from the cache until the next daily close
+    clock.now += timedelta(hours=6)
+    assert ingestor.fetch(['BTC-USD'])['BTC-USD'] is first
+    assert len(yahoo_server.requests) == n_requests
+
+    # after the close only the candles since the last stored day are requested
+    yahoo_server.visible_rows += 1
+    clock.now += timedelta(days=1)
+    second = ingestor.fetch(['BTC-USD'])['BTC-USD']
+    assert 'period1' in yahoo_server.requests[-1][1]
+    expected = yahoo_server.histories['BTC-USD'].iloc[:yahoo_server.visible_rows]
+    pd.testing.assert_frame_equal(second.data, expected, check_dtype=False)
+
+
+def test_failed_ticker_keeps_last_good_data(yahoo_server):
+    clock = visible_day_clock(yahoo_server)
+    ingestor = MultiAssetIngestor(session=create_session(retries=0), api_url=yahoo_server.api_url, clock=clock)
+    good = ingestor.fetch(['BTC-USD'])['BTC-USD']
+
+    yahoo_server.histories.pop('BTC-USD')
+    clock.now += timedelta(days=1)
+    stale = ingestor.fetch(['BTC-USD'])['BTC-USD']
+    assert stale.data is good.data and stale.fetched_at == good.fetched_at and stale.error is not None
+
+
+@pytest.mark.parametrize('ticker, path', [
+    ('BTC-USD', 'BTC-USD'), ('^GSPC', '%5EGSPC'), ('EURUSD=X', 'EURUSD%3DX'), ('0700.HK', '0700.HK'),
+])
+def test_ticker_url(ticker, path):
+    assert yahoo_chart_base_url(ticker, 'https://api') == f'https://api/{path}'
+
+
+@pytest.mark.parametrize('ticker', ['', '../../v7/finance/quote', 'BTC-USD?range=1d', 'BTC USD', 'BTC/USD', 'X'*21])
+def test_invalid_ticker(yahoo_server, ticker):
+    with pytest.raises(ValueError, match='Invalid Yahoo Finance ticker'):
+        yahoo_chart_base_url(ticker)
+    ingestor = MultiAssetIngestor(session=create_session(retries=0), api_url=yahoo_server.api_url)
+    results = ingestor.fetch(['BTC-USD', ticker])
+    assert results['BTC-USD'].is_ok
+    assert not results[ticker].is_ok and isinstance(results[ticker].error, ValueError)
+    assert [ticker for ticker, _ in yahoo_server.requests] == ['BTC-USD']
+
+
+def test_least_recently_requested_tickers_are_evicted(yahoo_server):
+    clock = visible_day_clock(yahoo_server)
+    ingestor = MultiAssetIngestor(session=create_session(retries=0), api_url=yahoo_server.api_url, clock=clock,
+                                  max_tickers=3)
+    ingestor.fetch(TICKERS[:3])
+    # the first ticker becomes the most recently requested one, the second is evicted by the fourth
+    ingestor.fetch(TICKERS[:1])
+    ingestor.fetch(TICKERS[3:4])
+    assert len(ingestor) == 3 and ingestor.evictions == 1
+
+    n_requests = len(yahoo_server.requests)
+    ingestor.fetch([TICKERS[0], TICKERS[2], TICKERS[3]])
+    assert len(yahoo_server.requests) == n_requests
+    ingestor.fetch(TICKERS[1:2])
+    assert yahoo_server.requests[n_requests:] == [(TICKERS[1], {'range': '50y', 'interval': '1d'})]
+
+    # more tickers than max_tickers in one call are all returned
+    results = ingestor.fetch(TICKERS)
+    assert list(results) == TICKERS and all(result.is_ok for result in results.values())
+    assert len(ingestor) == 3
+
+
+def test_session_failure_fails_every_ticker(yahoo_server, monkeypatch):
+    clock = visible_day_clock(yahoo_server)
+    ingestor = MultiAssetIngestor(api_url=yahoo_server.api_url, clock=clock)
+
+    def missing_requests(*args, **kwargs):
+        raise ModuleNotFoundError("No module named 'requests'")
+
+    # requests is not shipped with the stlite build
+    monkeypatch.setattr(multi_asset_ingestion, 'create_session', missing_requests)
+    results = ingestor.fetch(['BTC-USD', 'ETH-USD'])
+    assert list(results) == ['BTC-USD', 'ETH-USD']
+    assert all(not result.is_ok and isinstance(result.error, ModuleNotFoundError) for result in results.values())
+    assert yahoo_server.requests == []
+
+    # the session is created again when the tickers are retried
+    monkeypatch.undo()
+    clock.now += INITIAL_RETRY_BACKOFF
+    assert all(result.is_ok for result in ingestor.fetch(['BTC-USD', 'ETH-USD']).values())
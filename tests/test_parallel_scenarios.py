@@ -0,0 +1,80 @@
+"""
+Parallel scenario batches (see parallel_scenarios): the same results in worker processes as in the current process
+and the shared history released after every call.
+"""
+
+from multiprocessing import shared_memory
+
+import pandas as pd
+import pytest
+
+import parallel_scenarios
+from parallel_scenarios import run_change_period_grid, run_guess_scenarios, run_monte_carlo
+from synthetic_prices import synthetic_price_history
+
+
+@pytest.fixture(scope='module')
+def history():
+    return synthetic_price_history(1500, seed=3)
+
+
+@pytest.fixture
+def shared_block_names(monkeypatch):
+    """
+    Names of the shared memory blocks created by the calls of the test.
+    """
+    names = []
+
+    class RecordedSharedHistory(parallel_scenarios.SharedHistory):
+        def __init__(self, df: pd.DataFrame):
+            super().__init__(df)
+            names.append(self.name)
+
+    monkeypatch.setattr(parallel_scenarios, 'SharedHistory', RecordedSharedHistory)
+    return names
+
+
+def assert_unlinked(names: list[str]) -> None:
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_guess_scenarios_by_workers(history, shared_block_names):
+    guess_tables = [pd.DataFrame({'Daily Change (%)': [change, -0.1], 'Period (days)': [period, 100]})
+                    for change in (-0.2, 0.1, 0.3) for period in (50, 400)]
+    expected = run_guess_scenarios(history, guess_tables, max_workers=1)
+    assert not shared_block_names
+    pd.testing.assert_frame_equal(run_guess_scenarios(history, guess_tables, max_workers=2), expected)
+    assert len(expected) == len(guess_tables)
+    assert_unlinked(shared_block_names)
+
+
+def test_change_period_grid_by_workers(history, shared_block_names):
+    expected = run_change_period_grid(history, [-0.1, 0.2, 0.5], [30, 365], max_workers=1)
+    pd.testing.assert_frame_equal(run_change_period_grid(history, [-0.1, 0.2, 0.5], [30, 365], max_workers=2),
+                                  expected)
+    assert len(expected) == 6
+    assert_unlinked(shared_block_names)
+
+
+@pytest.mark.parametrize('method', ['bootstrap', 'drift'])
+def test_monte_carlo_by_workers(history, shared_block_names, method):
+    kwargs = {'n_paths': 90, 'n_days': 500, 'chunk_size': 20, 'seed': 8, 'method': method, 'daily_change_pct': 0.3}
+    expected = run_monte_carlo(history, max_workers=1, **kwargs)
+    pd.testing.assert_frame_equal(run_monte_carlo(history, max_workers=2, **kwargs), expected)
+    assert len(expected) == 500
+    assert_unlinked(shared_block_names)
+
+
+def test_shared_history_is_unlinked_after_failed_task(history, shared_block_names):
+    with pytest.raises(ValueError, match='Unknown simulation method'):
+        run_monte_carlo(history, 10, 100, max_workers=2, method='unknown')
+    assert_unlinked(shared_block_names)
+
+
+@pytest.mark.parametrize('n_paths, n_days', [(0, 100), (10, 0), (-1, 100)])
+def test_monte_carlo_needs_paths_and_days(history, n_paths, n_days):
+    with pytest.raises(ValueError, match='At least one path and one day'):
+        run_monte_carlo(history, n_paths, n_days, max_workers=1)
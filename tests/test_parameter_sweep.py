@@ -0,0 +1,33 @@
+"""
+Parameter sweep of the SMA windows and multipliers (see parameter_sweep) against the crossunders of calc_sma_crosses.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from load_update_price_df import parse_yahoo_chart_payload
+from parameter_sweep import find_cycle_tops, sweep_history
+from synthetic_prices import YAHOO_PAYLOAD_PATH
+from top_indic_calc import calc_sma_crosses, crossunder_column
+
+
+@pytest.fixture(scope='module')
+def btc_history():
+    # the recorded daily BTC history
+    return parse_yahoo_chart_payload(json.loads(YAHOO_PAYLOAD_PATH.read_text()))
+
+
+def test_parameter_sweep_matches_crossunder(btc_history):
+    result = sweep_history(btc_history, short_windows=(60, 111, 150), long_windows=(300, 350), multipliers=(1.0, 2.0))
+    tops = find_cycle_tops(btc_history['Close'].to_numpy())
+    for row in result.itertuples():
+        flags = calc_sma_crosses(btc_history, (row.short_window, row.long_window), (row.multiplier,),
+                                 row.short_window, row.long_window)
+        crosses = np.flatnonzero(flags[crossunder_column(row.multiplier, row.long_window)].to_numpy())
+        assert row.crosses == len(crosses)
+        for top, date in zip(tops, btc_history['Date'].iloc[tops]):
+            near = crosses[np.abs(crosses-top) <= 365]-top
+            expected = near[np.argmin(2*np.abs(near)+(near > 0))] if len(near) else np.nan
+            np.testing.assert_equal(result.loc[row.Index, f'days_to_top_{date:%Y-%m-%d}'], expected)
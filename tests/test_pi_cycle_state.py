@@ -0,0 +1,108 @@
+"""
+Streaming Pi Cycle state (see pi_cycle_state): values identical to pandas rolling().mean(), also after appends.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pi_cycle_state import PiCycleState
+from synthetic_prices import synthetic_price_history
+from top_indic_calc import CROSS_LEVELS, INDICATOR_COLUMNS, SMA_LONG_PERIOD, SMA_SHORT_PERIOD
+
+
+def with_flat_prices(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns df with a run of one repeated close longer than the long window (the exact repeated value in pandas).
+    """
+    df = df.copy()
+    df.loc[600:1100, 'Close'] = df.loc[600, 'Close']
+    return df
+
+
+def with_price_span(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns df with prices spanning seven orders of magnitude, where the rounding of a naive running sum differs.
+    """
+    return df.assign(Close=df['Close'].to_numpy()*np.logspace(-5, 2, len(df)))
+
+
+HISTORIES = {
+    'synthetic': lambda: synthetic_price_history(2000, seed=3),
+    'flat': lambda: with_flat_prices(synthetic_price_history(2000, seed=4)),
+    'price_span': lambda: with_price_span(synthetic_price_history(2000, seed=5)),
+}
+
+
+@pytest.fixture(params=list(HISTORIES), ids=list(HISTORIES))
+def history(request):
+    return HISTORIES[request.param]()
+
+
+def pandas_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Indicator columns from pandas rolling().mean() and the crossunder formula, independently of top_indic_calc.
+    """
+    sma_short = df['Close'].rolling(window=SMA_SHORT_PERIOD).mean()
+    sma_long = df['Close'].rolling(window=SMA_LONG_PERIOD).mean()
+    columns = {'SMA_111': sma_short, 'SMA_350': sma_long}
+    for column, multiplier in CROSS_LEVELS.items():
+        columns[column] = (sma_short > multiplier*sma_long) & (sma_short.shift() <= multiplier*sma_long.shift())
+    return pd.DataFrame(columns)[INDICATOR_COLUMNS]
+
+
+def assert_rows_equal(rows: list[dict], expected: pd.DataFrame):
+    streamed = pd.DataFrame(rows, index=expected.index)
+    pd.testing.assert_series_equal(streamed['Date'], expected['Date'])
+    for column in INDICATOR_COLUMNS:
+        # exact equality, NaN in the same rows
+        np.testing.assert_array_equal(streamed[column].to_numpy(), expected[column].to_numpy(), err_msg=column)
+
+
+def test_matches_pandas_rolling(history):
+    state = PiCycleState()
+    rows = [state.update(date, close) for date, close in zip(history['Date'], history['Close'])]
+    assert_rows_equal(rows, history[['Date']].join(pandas_indicators(history)))
+    assert state.to_dict() == PiCycleState.from_history(history).to_dict()
+
+
+@pytest.mark.parametrize('n_initial', [100, SMA_LONG_PERIOD, 1500])
+def test_appends_match_pandas_rolling(history, tmp_path, n_initial):
+    # the state is built from the first rows, saved, loaded (as after a restart) and the rest is appended day by day
+    path = tmp_path/'pi_cycle_state.json'
+    PiCycleState.from_history(history.iloc[:n_initial]).save(path)
+    state = PiCycleState.load(path)
+
+    rows = []
+    for date, close in zip(history['Date'].iloc[n_initial:], history['Close'].iloc[n_initial:]):
+        # the in-progress day is evaluated (and revised) before its final close
+        state.update_provisional(date, close*1.1)
+        provisional = state.update_provisional(date, close)
+        rows.append(state.update(date, close))
+        assert provisional == rows[-1]
+        assert state.provisional_row is None
+    expected = history[['Date']].join(pandas_indicators(history)).iloc[n_initial:]
+    assert_rows_equal(rows, expected)
+
+
+def test_provisional_does_not_change_state():
+    history = synthetic_price_history(500)
+    state = PiCycleState.from_history(history)
+    saved = state.to_dict()
+    next_day = history['Date'].iloc[-1]+pd.Timedelta(days=1)
+    state.update_provisional(next_day, 1e6)
+    assert state.to_dict() == saved
+
+    close = history['Close'].iloc[-1]*1.01
+    expected = pandas_indicators(pd.concat([history, pd.DataFrame({'Date': [next_day], 'Close': [close]})],
+                                           ignore_index=True)).iloc[-1]
+    row = state.update_provisional(next_day, close)
+    assert row['SMA_111'] == expected['SMA_111'] and row['SMA_350'] == expected['SMA_350']
+
+
+def test_date_must_follow_last_closed_day():
+    history = synthetic_price_history(10)
+    state = PiCycleState.from_history(history)
+    for method in (state.update, state.update_provisional):
+        with pytest.raises(ValueError, match='is not after the last closed day'):
+            method(history['Date'].iloc[-1], 1.0)
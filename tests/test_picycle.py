@@ -0,0 +1,48 @@
+"""
+Headless command line interface (see picycle): price files given on the command line.
+"""
+
+import json
+
+import pytest
+
+from load_update_price_df import load_BTC_price_store, write_price_csv
+from picycle import load_prices, main
+from synthetic_prices import synthetic_price_history
+
+
+@pytest.fixture
+def scenario(tmp_path):
+    path = tmp_path/'bull.json'
+    path.write_text(json.dumps({'guess': [{'Daily Change (%)': 0.3, 'Period (days)': 20}]}))
+    return path
+
+
+@pytest.mark.parametrize('name', ['prices.feather', 'prices.npz', 'prices.csv'])
+def test_missing_data_file_does_not_fall_back(tmp_path, name):
+    # the repository price files exist, but an explicitly given file never falls back to them
+    missing = tmp_path/name
+    with pytest.raises(FileNotFoundError, match=str(missing)):
+        load_prices(missing)
+    if name.endswith('.feather'):
+        with pytest.raises(FileNotFoundError, match=str(missing)):
+            load_BTC_price_store(missing)
+
+
+@pytest.mark.parametrize('command', ['compute', 'sweep'])
+def test_cli_missing_data_file(tmp_path, scenario, capsys, command):
+    missing = tmp_path/'missing.feather'
+    out = tmp_path/'result.csv'
+    args = ['--scenario', str(scenario)] if command == 'compute' else ['--short-windows', '111', '--long-windows', '350']
+    assert main([command, *args, '--data', str(missing), '--out', str(out)]) == 1
+    assert str(missing) in capsys.readouterr().err
+    assert not out.exists()
+
+
+def test_cli_compute(tmp_path, scenario, capsys):
+    data = tmp_path/'prices.csv'
+    write_price_csv(synthetic_price_history(500), output_path=data)
+    out = tmp_path/'result.csv'
+    assert main(['compute', '--scenario', str(scenario), '--data', str(data), '--out', str(out), '--guessed-only']) == 0
+    assert capsys.readouterr().out.strip() == str(out)
+    assert len(out.read_text().splitlines()) == 1+20
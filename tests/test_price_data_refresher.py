@@ -0,0 +1,173 @@
+"""
+Background refresh of the shared price snapshot (see price_data_refresher), driven by a fake fetcher and clock.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from price_data_refresher import (
+    INITIAL_RETRY_BACKOFF, REFRESH_DELAY_AFTER_CLOSE, PriceDataRefresher, PriceSnapshot, next_daily_close,
+)
+from synthetic_prices import synthetic_price_history
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+class FakeFetcher:
+    """
+    Returns the given results one after another, exceptions are raised. The calls are counted.
+    """
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self) -> pd.DataFrame:
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture(scope='module')
+def history():
+    return synthetic_price_history(1000)
+
+
+@pytest.fixture
+def stale(history):
+    # the snapshot misses the finished candle of yesterday, the last candle of history
+    now = history['Date'].iloc[-1].to_pydatetime().replace(tzinfo=timezone.utc)+timedelta(days=1, hours=12)
+    return PriceSnapshot(history.iloc[:-1], 'local file', now-timedelta(days=3)), FakeClock(now)
+
+
+def test_failure_backs_off_and_serves_stale_snapshot(stale):
+    snapshot, clock = stale
+    fetcher = FakeFetcher(*[ConnectionError(f'attempt {i}') for i in range(10)])
+    refresher = PriceDataRefresher(fetcher, snapshot, clock=clock, max_backoff=timedelta(minutes=10))
+
+    backoffs = []
+    for _ in range(7):
+        clock.now = refresher.next_attempt_at
+        assert refresher.refresh_if_due() is False
+        backoffs.append(refresher.next_attempt_at-clock.now)
+        assert refresher.snapshot is snapshot
+    assert fetcher.calls == 7
+    assert backoffs == [INITIAL_RETRY_BACKOFF*2**i for i in range(5)]+[timedelta(minutes=10)]*2
+    assert str(refresher.last_error) == 'attempt 6'
+
+
+def test_success_swaps_snapshot_and_resets_backoff(stale, history):
+    snapshot, clock = stale
+    fetcher = FakeFetcher(ConnectionError(), ConnectionError(), history, ConnectionError())
+    refresher = PriceDataRefresher(fetcher, snapshot, source='fake', clock=clock)
+    for _ in range(2):
+        clock.now = refresher.next_attempt_at
+        refresher.refresh_if_due()
+
+    clock.now = refresher.next_attempt_at
+    assert refresher.refresh_if_due() is True
+    assert refresher.snapshot.df is history
+    assert (refresher.snapshot.source, refresher.snapshot.refreshed_at) == ('fake', clock.now)
+    assert refresher.last_error is None
+    assert refresher.next_attempt_at == next_daily_close(clock.now)+REFRESH_DELAY_AFTER_CLOSE
+
+    # the next failure starts from the initial backoff again
+    clock.now = refresher.next_attempt_at
+    assert refresher.refresh_if_due() is False
+    assert refresher.next_attempt_at == clock.now+INITIAL_RETRY_BACKOFF
+    assert refresher.snapshot.df is history
+
+
+def test_stale_refresh_is_retried_with_backoff(stale, history):
+    snapshot, clock = stale
+    # the first refreshes return the data of the snapshot again, the finished candle is not published yet
+    fetcher = FakeFetcher(snapshot.df, snapshot.df, ConnectionError(), history)
+    refresher = PriceDataRefresher(fetcher, snapshot, clock=clock)
+    backoffs = []
+    for _ in range(3):
+        clock.now = refresher.next_attempt_at
+        refresher.refresh_if_due()
+        backoffs.append(refresher.next_attempt_at-clock.now)
+    assert backoffs == [INITIAL_RETRY_BACKOFF*2**i for i in range(3)]
+    assert refresher.snapshot.df is snapshot.df and refresher.snapshot.is_stale(clock.now)
+
+    clock.now = refresher.next_attempt_at
+    assert refresher.refresh_if_due() is True
+    assert refresher.snapshot.df is history and not refresher.snapshot.is_stale(clock.now)
+    assert refresher.next_attempt_at == next_daily_close(clock.now)+REFRESH_DELAY_AFTER_CLOSE
+    assert fetcher.calls == 4
+
+
+def test_refresh_if_due(history):
+    # a fresh snapshot is refreshed after the next daily close, a stale one at once
+    now = history['Date'].iloc[-1].to_pydatetime().replace(tzinfo=timezone.utc)+timedelta(hours=12)
+    clock = FakeClock(now)
+    fetcher = FakeFetcher(history, history)
+    refresher = PriceDataRefresher(fetcher, PriceSnapshot(history, 'local file', now), clock=clock)
+    due = next_daily_close(now)+REFRESH_DELAY_AFTER_CLOSE
+    assert refresher.next_attempt_at == due
+
+    for clock.now in (now, due-timedelta(seconds=1)):
+        assert refresher.refresh_if_due() is False
+    assert fetcher.calls == 0
+    clock.now = due
+    assert refresher.refresh_if_due() is True
+    assert fetcher.calls == 1
+    assert refresher.refresh_if_due() is False and fetcher.calls == 1
+
+    stale_refresher = PriceDataRefresher(fetcher, PriceSnapshot(history, 'local file', now),
+                                         clock=FakeClock(now+timedelta(days=2)))
+    assert stale_refresher.refresh_if_due() is True
+
+
+def test_no_concurrent_refreshes(stale, history):
+    snapshot, clock = stale
+    started, release = threading.Event(), threading.Event()
+    fetcher = FakeFetcher(history)
+
+    def slow_fetcher():
+        started.set()
+        release.wait(10)
+        return fetcher()
+
+    refresher = PriceDataRefresher(slow_fetcher, snapshot, clock=clock)
+    thread = threading.Thread(target=refresher.refresh_once)
+    thread.start()
+    assert started.wait(10)
+    # callers during the refresh neither fetch nor wait, they are served the previous snapshot
+    assert refresher.refresh_once() is False
+    assert refresher.refresh_if_due() is False
+    assert refresher.snapshot is snapshot
+    release.set()
+    thread.join(10)
+    assert fetcher.calls == 1
+    assert refresher.snapshot.df is history
+
+
+def test_worker_thread(stale, history):
+    snapshot, clock = stale
+    refreshed = threading.Event()
+
+    def fetcher():
+        refreshed.set()
+        return history
+
+    refresher = PriceDataRefresher(fetcher, snapshot, clock=clock)
+    assert refresher.start() is True
+    try:
+        assert refreshed.wait(10)
+    finally:
+        refresher.stop(timeout=10)
+    assert not refresher.is_running
+    assert refresher.snapshot.df is history
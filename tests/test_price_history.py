@@ -0,0 +1,75 @@
+"""
+Validation of the price histories (see price_history) and the normalization of the fetched candles.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from load_update_price_df import (
+    CSV_COLUMNS, PriceSchemaError, normalize_price_history, parse_yahoo_chart_payload, validate_price_history,
+)
+from price_history import BTC_MAX_GAP_DAYS, CompactHistory
+from synthetic_prices import synthetic_price_history, yahoo_chart_payload
+
+
+@pytest.mark.parametrize('rows, max_gap_days, message', [
+    ([('2024-01-01', 1.0), ('2024-01-01', 2.0)], None, 'duplicate date'),
+    ([('2024-01-02', 1.0), ('2024-01-01', 2.0)], None, 'date out of order'),
+    ([('2024-01-01', 1.0), ('2024-01-04', 2.0)], 1, 'gap of 3 days'),
+    ([('2024-01-01', 1.0), ('2024-01-02', float('nan'))], None, 'invalid Close'),
+])
+def test_validate_price_history(rows, max_gap_days, message):
+    df = pd.DataFrame(rows, columns=['Date', 'Close']).astype({'Date': 'datetime64[ns]'})
+    with pytest.raises(PriceSchemaError, match=message):
+        CompactHistory.from_frame(df, max_gap_days=max_gap_days)
+
+
+@pytest.fixture(scope='module')
+def candles():
+    return synthetic_price_history(30)
+
+
+def test_normalize_keeps_valid_history(candles):
+    assert normalize_price_history(candles, fill_missing_days=3) is candles
+
+
+def test_repeated_and_unordered_candles_are_normalized(candles):
+    # Yahoo repeating a day with a later candle and returning candles out of order
+    repeated = candles.iloc[[10]].assign(Date=candles['Date'].iloc[10]+pd.Timedelta(hours=15), Close=1.0)
+    df = pd.concat([candles.iloc[:20], repeated, candles.iloc[[25, 20, 21, 22, 23, 24]], candles.iloc[26:]])
+    expected = candles.copy()
+    expected.iloc[10] = repeated.iloc[0]
+    pd.testing.assert_frame_equal(normalize_price_history(df), expected)
+    pd.testing.assert_frame_equal(parse_yahoo_chart_payload(yahoo_chart_payload(df)),
+                                  parse_yahoo_chart_payload(yahoo_chart_payload(expected)))
+
+
+@pytest.mark.parametrize('missing, filled', [([12], True), ([12, 13, 14], True), ([12, 13, 14, 15], False)])
+def test_short_gaps_are_filled(candles, missing, filled):
+    df = candles.drop(index=missing).reset_index(drop=True)
+    normalized = normalize_price_history(df, fill_missing_days=3)
+    if not filled:
+        assert normalized is df
+        with pytest.raises(PriceSchemaError, match=f'gap of {len(missing)+1} days'):
+            validate_price_history(normalized, max_gap_days=BTC_MAX_GAP_DAYS)
+        return
+    validate_price_history(normalized, max_gap_days=BTC_MAX_GAP_DAYS)
+    pd.testing.assert_series_equal(normalized['Date'], candles['Date'])
+    previous_close = candles['Close'].iloc[missing[0]-1]
+    for column in ['Open', 'High', 'Low', 'Close', 'Adj Close']:
+        np.testing.assert_array_equal(normalized[column].iloc[missing], previous_close)
+    np.testing.assert_array_equal(normalized['Volume'].iloc[missing], 0.0)
+    assert list(normalized.columns) == CSV_COLUMNS and normalized.dtypes.equals(candles.dtypes)
+
+
+@pytest.mark.parametrize('column, value, message', [
+    ('Close', -1.0, 'invalid Close'),
+    ('Close', float('inf'), 'invalid Close'),
+    ('Date', pd.NaT, 'Date contains missing values'),
+])
+def test_corrupt_candles_are_not_normalized(candles, column, value, message):
+    df = candles.copy()
+    df.loc[5, column] = value
+    with pytest.raises(PriceSchemaError, match=message):
+        validate_price_history(normalize_price_history(df, fill_missing_days=3))
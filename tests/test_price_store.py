@@ -0,0 +1,165 @@
+"""
+Append-only price store: delta segments, compaction and interrupted writes (see load_update_price_df).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import load_update_price_df
+from load_update_price_df import (
+    CSV_COLUMNS, DELTA_ROW_DTYPE, DELTA_SEGMENT_HEADER, append_price_delta, compact_price_store, delta_path,
+    load_BTC_price_store, load_price_npz, read_price_delta, update_price_store_from_yahoo, write_price_csv,
+    write_price_feather, write_price_npz,
+)
+from picycle import load_prices
+from price_history import CompactHistory, read_price_columns
+from synthetic_prices import synthetic_price_history
+
+
+HISTORY_ROWS = 1000
+STORED_ROWS = 990
+SEGMENT_BYTES = DELTA_SEGMENT_HEADER.size+2*DELTA_ROW_DTYPE.itemsize
+
+
+@pytest.fixture(scope='module')
+def full_history():
+    return synthetic_price_history(HISTORY_ROWS)
+
+
+def published(full_history: pd.DataFrame, n_rows: int) -> pd.DataFrame:
+    """
+    Returns the first n_rows days as published by Yahoo, the last one is an in-progress candle.
+    """
+    df = full_history.iloc[:n_rows].copy()
+    df.loc[df.index[-1], ['High', 'Close', 'Adj Close']] *= 0.99
+    return df
+
+
+@pytest.fixture
+def store(tmp_path, full_history, monkeypatch):
+    paths = {'feather_path': tmp_path/'prices.feather', 'csv_path': tmp_path/'prices.csv',
+             'npz_path': tmp_path/'prices.npz'}
+    compact_price_store(published(full_history, STORED_ROWS), **paths)
+    # every update publishes one more day, the previous in-progress candle is finished
+    monkeypatch.setattr(load_update_price_df, 'update_btc_data_incremental',
+                        lambda df: pd.concat([df.iloc[:-1], published(full_history, len(df)+1).iloc[-2:]],
+                                             ignore_index=True))
+    return paths
+
+
+def assert_store_equals(paths: dict, expected: pd.DataFrame) -> None:
+    expected = expected[CSV_COLUMNS].reset_index(drop=True)
+    pd.testing.assert_frame_equal(load_BTC_price_store(paths['feather_path']), expected)
+    pd.testing.assert_frame_equal(load_price_npz(paths['npz_path']), expected)
+    pd.testing.assert_frame_equal(load_prices(paths['csv_path']), expected)
+    pd.testing.assert_frame_equal(read_price_columns(paths['csv_path'], ['Close']), expected[['Close']])
+    # the default CSV parser may differ in the last bit
+    np.testing.assert_allclose(CompactHistory.load(paths['csv_path']).close, expected['Close'], rtol=1e-15)
+
+
+def test_daily_update_appends_only_new_rows(store, full_history):
+    snapshots = {name: path.read_bytes() for name, path in store.items()}
+    for _ in range(3):
+        update_price_store_from_yahoo(**store)
+
+    # the snapshots are untouched, each update appended the new day and the finished in-progress one
+    assert all(store[name].read_bytes() == data for name, data in snapshots.items())
+    assert delta_path(store['feather_path']).stat().st_size == 3*SEGMENT_BYTES
+    assert_store_equals(store, published(full_history, STORED_ROWS+3))
+
+
+def test_archive_with_other_name_has_its_own_delta(tmp_path, full_history, monkeypatch):
+    paths = {'feather_path': tmp_path/'prices.feather', 'csv_path': None, 'npz_path': tmp_path/'stlite.npz'}
+    compact_price_store(published(full_history, STORED_ROWS), **paths)
+    archive = paths['npz_path'].read_bytes()
+    monkeypatch.setattr(load_update_price_df, 'update_btc_data_incremental',
+                        lambda df: published(full_history, STORED_ROWS+1))
+    update_price_store_from_yahoo(**paths)
+    assert paths['npz_path'].read_bytes() == archive
+    assert delta_path(paths['npz_path']).stat().st_size == SEGMENT_BYTES
+    pd.testing.assert_frame_equal(load_price_npz(paths['npz_path']), load_BTC_price_store(paths['feather_path']))
+
+
+def test_compaction(store, full_history):
+    for _ in range(3):
+        update_price_store_from_yahoo(**store, compact_after_rows=4)
+    assert not delta_path(store['feather_path']).exists()
+    pd.testing.assert_frame_equal(pd.read_feather(store['feather_path']),
+                                  published(full_history, STORED_ROWS+3).reset_index(drop=True))
+    assert_store_equals(store, published(full_history, STORED_ROWS+3))
+
+
+def test_restated_history_is_compacted(store, full_history, monkeypatch):
+    update_price_store_from_yahoo(**store)
+    restated = published(full_history, STORED_ROWS+2)
+    restated.loc[10, 'Open'] *= 1.01
+    monkeypatch.setattr(load_update_price_df, 'update_btc_data_incremental', lambda df: restated)
+    update_price_store_from_yahoo(**store)
+    assert not delta_path(store['feather_path']).exists()
+    assert_store_equals(store, restated)
+
+
+def test_torn_delta_segment(tmp_path, full_history):
+    path = tmp_path/'prices.delta'
+    rows = full_history.iloc[:6]
+    append_price_delta(rows.iloc[:2], path)
+    append_price_delta(rows.iloc[2:4], path)
+    # a crash in the middle of the third segment
+    with open(path, 'ab') as file:
+        file.write(DELTA_SEGMENT_HEADER.pack(b'PCD1', 2, 0)+b'\0'*DELTA_ROW_DTYPE.itemsize)
+    delta_df, valid_bytes = read_price_delta(path)
+    assert valid_bytes == 2*SEGMENT_BYTES
+    pd.testing.assert_frame_equal(delta_df, rows.iloc[:4][CSV_COLUMNS].reset_index(drop=True))
+
+    # the next append replaces the torn segment
+    assert append_price_delta(rows.iloc[4:], path) == 6
+    assert path.stat().st_size == 3*SEGMENT_BYTES
+    pd.testing.assert_frame_equal(read_price_delta(path)[0], rows[CSV_COLUMNS].reset_index(drop=True))
+
+
+def test_corrupted_delta_segment(tmp_path, full_history):
+    path = tmp_path/'prices.delta'
+    append_price_delta(full_history.iloc[:2], path)
+    append_price_delta(full_history.iloc[2:4], path)
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    pd.testing.assert_frame_equal(read_price_delta(path)[0], full_history.iloc[:2][CSV_COLUMNS])
+
+
+def crash_after_partial_write(path, *args, **kwargs):
+    with open(path, 'wb') as file:
+        file.write(b'partial')
+    raise OSError('disk full')
+
+
+@pytest.mark.parametrize('writer, owner, name, suffix', [
+    (write_price_feather, pd.DataFrame, 'to_feather', 'feather'),
+    (write_price_csv, pd.DataFrame, 'to_csv', 'csv'),
+    (write_price_npz, np, 'savez_compressed', 'npz'),
+], ids=['feather', 'csv', 'npz'])
+def test_interrupted_snapshot_write(tmp_path, full_history, monkeypatch, writer, owner, name, suffix):
+    path = tmp_path/f'prices.{suffix}'
+    writer(full_history, output_path=path)
+    data = path.read_bytes()
+
+    if owner is pd.DataFrame:
+        monkeypatch.setattr(owner, name, lambda df, path, *args, **kwargs: crash_after_partial_write(path))
+    else:
+        monkeypatch.setattr(owner, name, crash_after_partial_write)
+    with pytest.raises(OSError):
+        writer(full_history.iloc[:10], output_path=path)
+    # the old snapshot is intact and the partial file is removed
+    assert path.read_bytes() == data
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_crash_before_delta_removal(store, full_history):
+    # compaction replaced the snapshots, but the delta merged into them was not removed
+    update_price_store_from_yahoo(**store)
+    merged = load_BTC_price_store(store['feather_path'])
+    write_price_feather(merged, output_path=store['feather_path'])
+    write_price_csv(merged, output_path=store['csv_path'])
+    assert delta_path(store['feather_path']).exists()
+    assert_store_equals(store, published(full_history, STORED_ROWS+1))
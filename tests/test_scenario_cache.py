@@ -0,0 +1,112 @@
+"""
+Cache of the guessed rows shared by sessions (see scenario_cache): canonical guess, history version and LRU eviction.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_cache import ScenarioCache, guess_hash, history_version, normalize_guess
+from synthetic_prices import synthetic_price_history
+from top_indic_calc import calc_guess_tail, calc_pi_cycle_indicators
+
+
+def guess(changes, periods) -> pd.DataFrame:
+    return pd.DataFrame({'Daily Change (%)': changes, 'Period (days)': periods})
+
+
+@pytest.fixture(scope='module')
+def history():
+    return calc_pi_cycle_indicators(synthetic_price_history(1000))
+
+
+class CountingCompute:
+    """
+    calc_guess_tail counting its calls.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, df, guess_df):
+        self.calls += 1
+        return calc_guess_tail(df, guess_df)
+
+
+@pytest.mark.parametrize('equivalent', [
+    guess([0.3, np.nan, 0.3, -0.2], [100, 50, 100, 30]),
+    guess([0.3, 0.5, 0.3, -0.2, 0.1], [200, 0, 0, 30.9, -5]),
+    guess([0.3, 0.3, 0.3, -0.2], [50, 50, 100, 30]),
+], ids=['missing_values', 'empty_periods', 'split_period'])
+def test_equivalent_guesses(history, equivalent):
+    reference = guess([0.3, -0.2], [200, 30])
+    assert normalize_guess(equivalent) == normalize_guess(reference) == ((0.3, 200), (-0.2, 30))
+    assert guess_hash(normalize_guess(equivalent)) == guess_hash(normalize_guess(reference))
+    pd.testing.assert_frame_equal(calc_guess_tail(history, equivalent), calc_guess_tail(history, reference))
+
+
+def test_different_guesses():
+    reference = normalize_guess(guess([0.3, -0.2], [200, 30]))
+    for other in (guess([-0.2, 0.3], [30, 200]), guess([0.3, -0.2], [200, 31]), guess([0.3+1e-12, -0.2], [200, 30])):
+        assert guess_hash(normalize_guess(other)) != guess_hash(reference)
+    assert normalize_guess(guess([0.0], [10])) == normalize_guess(guess([-0.0], [10]))
+
+
+def test_hits_and_equivalent_guesses(history):
+    cache, compute = ScenarioCache(), CountingCompute()
+    first = cache.get_or_compute(history, guess([0.3, -0.2], [200, 30]), compute)
+    assert cache.get_or_compute(history, guess([0.3, 0.3, -0.2], [150, 50, 30]), compute) is first
+    assert compute.calls == 1
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses'], stats['evictions']) == (1, 1, 1, 0)
+    assert stats['bytes'] == first.memory_usage(deep=True).sum()
+
+    # an empty guess is not cached
+    assert cache.get_or_compute(history, guess([0.3], [0]), compute).empty
+    assert compute.calls == 2 and len(cache) == 1
+
+
+def test_lru_eviction(history):
+    guesses = [guess([0.1*i], [100]) for i in range(1, 5)]
+    entry_bytes = int(calc_guess_tail(history, guesses[0]).memory_usage(deep=True).sum())
+    cache, compute = ScenarioCache(max_bytes=3*entry_bytes), CountingCompute()
+    for guess_df in guesses[:3]:
+        cache.get_or_compute(history, guess_df, compute)
+    # the first guess becomes the most recently used one, the second is evicted by the fourth
+    cache.get_or_compute(history, guesses[0], compute)
+    cache.get_or_compute(history, guesses[3], compute)
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses'], stats['evictions']) == (3, 1, 4, 1)
+    assert stats['bytes'] == 3*entry_bytes
+
+    calls = compute.calls
+    cache.get_or_compute(history, guesses[0], compute)
+    cache.get_or_compute(history, guesses[2], compute)
+    assert compute.calls == calls
+    cache.get_or_compute(history, guesses[1], compute)
+    assert compute.calls == calls+1
+
+
+def test_entry_over_budget_is_not_cached(history):
+    cache = ScenarioCache(max_bytes=1024)
+    cache.get_or_compute(history, guess([0.1], [100]), calc_guess_tail)
+    assert cache.stats()['entries'] == 0 and cache.stats()['bytes'] == 0
+
+
+def test_revised_close_changes_version(history):
+    # the same last day and number of rows, but a revised close (e.g. the local snapshot refreshed from Yahoo)
+    revised = history.copy()
+    revised.loc[revised.index[-1], 'Close'] *= 1.05
+    assert history_version(revised)[:2] == history_version(history)[:2]
+    assert history_version(revised) != history_version(history)
+    # a close older than the window of the guessed rows does not change them
+    old_revision = history.copy()
+    old_revision.loc[0, 'Close'] *= 1.05
+    assert history_version(old_revision) == history_version(history)
+
+    cache = ScenarioCache()
+    guess_df = guess([0.3], [200])
+    cache.get_or_compute(history, guess_df, calc_guess_tail)
+    tail = cache.get_or_compute(revised, guess_df, calc_guess_tail)
+    assert cache.stats()['misses'] == 2
+    pd.testing.assert_frame_equal(tail, calc_guess_tail(revised, guess_df))
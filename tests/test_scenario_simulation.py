@@ -0,0 +1,80 @@
+"""
+Monte Carlo scenarios (see scenario_simulation): the deterministic limit and the chunking of the paths.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_simulation import (
+    drift_volatility_multipliers, first_cross_days, rolling_mean_2d, simulate_first_crosses,
+)
+from synthetic_prices import synthetic_price_history
+from top_indic_calc import CROSS_LEVELS, SMA_LONG_PERIOD, SMA_SHORT_PERIOD, calc_pi_cycle_indicators
+from top_indicator_content_prep import prepare_data_for_plot
+
+
+N_DAYS = 900
+
+
+@pytest.fixture(scope='module')
+def history():
+    return calc_pi_cycle_indicators(synthetic_price_history(2000, seed=11))
+
+
+@pytest.mark.parametrize('daily_change, crosses', [(-0.2, False), (0.1, True), (0.4, True)])
+def test_zero_volatility_is_the_deterministic_scenario(history, daily_change, crosses):
+    expected = prepare_data_for_plot(history, pd.DataFrame({'Daily Change (%)': [daily_change],
+                                                            'Period (days)': [N_DAYS]})).iloc[len(history):]
+
+    # without volatility every path, and so the median path, is the guessed path of the app
+    rng = np.random.default_rng(0)
+    close_paths = np.cumprod(drift_volatility_multipliers(daily_change, 0.0, 25, N_DAYS, rng), axis=1)
+    close_paths *= history['Close'].iloc[-1]
+    median_path = np.median(close_paths, axis=0)
+    np.testing.assert_allclose(median_path, expected['Close'], rtol=1e-12)
+
+    closes = np.concatenate((history['Close'].to_numpy()[-SMA_LONG_PERIOD:], median_path))[None, :]
+    np.testing.assert_allclose(rolling_mean_2d(closes[:, -(N_DAYS+SMA_SHORT_PERIOD-1):], SMA_SHORT_PERIOD)[0],
+                               expected['SMA_111'], rtol=1e-12)
+    np.testing.assert_allclose(rolling_mean_2d(closes, SMA_LONG_PERIOD)[0, 1:], expected['SMA_350'], rtol=1e-12)
+
+    # all paths cross each level first on the day of the first crossunder of the deterministic scenario
+    n_paths = 25
+    counts = simulate_first_crosses(history, n_paths, N_DAYS, method='drift', daily_change_pct=daily_change,
+                                    volatility_pct=0.0, seed=0)
+    pd.testing.assert_series_equal(counts['Date'], expected['Date'].reset_index(drop=True))
+    for column in CROSS_LEVELS:
+        expected_counts = n_paths*expected[column].to_numpy().astype(np.int64)
+        expected_counts[np.argmax(expected_counts > 0)+1:] = 0
+        np.testing.assert_array_equal(counts[column], expected_counts, err_msg=column)
+    assert any(counts[column].sum() for column in CROSS_LEVELS) == crosses
+
+
+def test_rolling_mean_2d_by_chunks():
+    values = np.random.default_rng(3).lognormal(0, 0.5, size=(40, 700))
+    means = rolling_mean_2d(values, SMA_LONG_PERIOD)
+    # the rows are independent, chunks of paths give exactly the same means
+    np.testing.assert_array_equal(np.concatenate([rolling_mean_2d(chunk, SMA_LONG_PERIOD)
+                                                  for chunk in np.array_split(values, 7)]), means)
+    expected = pd.DataFrame(values.T).rolling(SMA_LONG_PERIOD).mean().to_numpy().T[:, SMA_LONG_PERIOD-1:]
+    np.testing.assert_allclose(means, expected, rtol=1e-12)
+
+
+def test_first_cross_days_by_chunks(history):
+    close_paths = np.cumprod(np.random.default_rng(4).lognormal(0.002, 0.04, size=(60, 500)), axis=1)
+    close_paths *= history['Close'].iloc[-1]
+    history_tail = history['Close'].to_numpy()[-SMA_LONG_PERIOD:]
+    first_days = first_cross_days(history_tail, close_paths)
+    chunks = [first_cross_days(history_tail, chunk) for chunk in np.array_split(close_paths, 9)]
+    for column in CROSS_LEVELS:
+        np.testing.assert_array_equal(np.concatenate([chunk[column] for chunk in chunks]), first_days[column])
+
+
+@pytest.mark.parametrize('method', ['bootstrap', 'drift'])
+def test_chunked_simulation_matches_unchunked(history, method):
+    kwargs = {'n_paths': 200, 'n_days': 600, 'method': method, 'daily_change_pct': 0.2, 'seed': 5}
+    unchunked = simulate_first_crosses(history, chunk_size=200, **kwargs)
+    for chunk_size in (1, 7, 64):
+        pd.testing.assert_frame_equal(simulate_first_crosses(history, chunk_size=chunk_size, **kwargs), unchunked)
+    assert sum(unchunked[column].sum() for column in CROSS_LEVELS) > 0
@@ -0,0 +1,39 @@
+"""
+One-pass SMA and crossunder engine (see calc_sma_crosses) against the pandas indicators of the app.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from load_update_price_df import load_BTC_price_store
+from synthetic_prices import synthetic_price_history
+from top_indic_calc import CROSS_LEVELS, INDICATOR_COLUMNS, calc_pi_cycle_indicators, calc_sma_crosses
+
+
+BUNDLED_PRICE_PATH = Path(__file__).resolve().parents[1]/'BTC-USD_price.feather'
+
+
+@pytest.fixture(scope='module', params=['bundled', 'synthetic', 'short'])
+def history(request):
+    if request.param == 'bundled':
+        return load_BTC_price_store(BUNDLED_PRICE_PATH)
+    # the short history is shorter than the long SMA window
+    return synthetic_price_history(5000 if request.param == 'synthetic' else 200, seed=5)
+
+
+def test_default_crosses_match_pi_cycle_indicators(history):
+    expected = calc_pi_cycle_indicators(history)
+    df = calc_sma_crosses(history)
+    assert set(df.columns) == set(expected.columns)
+    pd.testing.assert_frame_equal(df[history.columns], history)
+    for column in ['SMA_111', 'SMA_350']:
+        # cumulative sums instead of the rolling sums of pandas, equal up to rounding
+        np.testing.assert_allclose(df[column], expected[column], rtol=1e-9, equal_nan=True, err_msg=column)
+    for column in CROSS_LEVELS:
+        np.testing.assert_array_equal(df[column].to_numpy(), expected[column].to_numpy(dtype=bool), err_msg=column)
+    assert set(INDICATOR_COLUMNS) <= set(df.columns)
+    if len(history) > 1000:
+        assert sum(df[column].sum() for column in CROSS_LEVELS) > 0
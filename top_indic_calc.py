@@ -10,8 +10,22 @@ Created on Thu Feb 29 2024
 
 import pandas as pd
 import numpy as np
-        
-        
+
+from perf_metrics import stage_timer
+
+
+SMA_SHORT_PERIOD = 111
+SMA_LONG_PERIOD = 350
+INDICATOR_COLUMNS = ['SMA_111', 'SMA_350', 'crossunder_2SMA_350', 'crossunder_1.62SMA_350', 'crossunder_SMA_350']
+# multiplier of SMA_350 crossed by SMA_111, keyed by the crossunder column name
+CROSS_LEVELS = {
+    'crossunder_SMA_350': 1.0,
+    'crossunder_1.62SMA_350': 1.618,
+    'crossunder_2SMA_350': 2.0,
+}
+# multipliers of the long SMA in the full Golden Ratio Multiplier chart
+GOLDEN_RATIO_MULTIPLIERS = (1, 1.618, 2, 3, 5, 8, 13, 21)
+
 
 def calc_simple_moving_average(df: pd.DataFrame, source_column: str, new_column: str, period_days: int) -> pd.DataFrame:
     """
@@ -24,16 +38,16 @@ def calc_simple_moving_average(df: pd.DataFrame, source_column: str, new_column:
         period_days (int): number of rolling days from which to calculate SMA
     
     Returns:
-        pd.DataFrame: Dataframe with all original data and new column with the SMA values
+        pd.DataFrame: New dataframe with all original data and new column with the SMA values, df is not modified
     """
-    df[new_column] = df[source_column].rolling(window = period_days).mean()
-    return df
+    sma = df[source_column].rolling(window = period_days).mean()
+    return df.assign(**{new_column: sma})
 
 
 def crossunder(df, line1, line2):
   """
   This function checks for crossovers between two SMA columns in a DataFrame.
-  In addition the crossover is calsulated for 1.62 and 2.0 coefficient of the SMA with longer period.
+  In addition the crossover is calsulated for 1.62 and 2.0 coefficient of the SMA with longer period (see CROSS_LEVELS).
 
   Args:
       df (pd.DataFrame): The DataFrame containing the columns to compare.
@@ -41,25 +55,109 @@ def crossunder(df, line1, line2):
       line2 (str): The name of the second column, typically SMA values for longer time period (e.g. 350 days)
 
   Returns:
-      pd.Series: A Series indicating True for crossover points and False otherwise.
+      pd.DataFrame: New DataFrame with crossunder columns indicating True for crossover points and False otherwise,
+      df is not modified.
   """
 
   # Check if columns exist
   if line1 not in df.columns or line2 not in df.columns:
     raise ValueError("Columns not found in DataFrame")
 
-  # Calculate crossover points using logical operators
-  df['crossunder_2SMA_350'] = (df[line1] > 2*df[line2]) & (df[line1].shift(1) <= 2*df[line2].shift(1))
-  df['crossunder_1.62SMA_350'] = (df[line1] > 1.618*df[line2]) & (df[line1].shift(1) <= 1.618*df[line2].shift(1))
-  df['crossunder_SMA_350'] = (df[line1] > df[line2]) & (df[line1].shift(1) <= df[line2].shift(1))
+  # Calculate crossover points of all levels at once, the previous values are shifted only once
+  # (the first value is False as there is no previous data point and comparison with NaN is False)
+  flags = cross_above_flags(df[line1].to_numpy(dtype=float), df[line2].to_numpy(dtype=float), list(CROSS_LEVELS.values()))
+  crosses = dict(zip(CROSS_LEVELS, flags))
 
-  # Fill the first value with False (no crossover before the first data point)
-  df.loc[0,'crossunder_2SMA_350'] = False
-  df.loc[0,'crossunder_1.62SMA_350'] = False
-  df.loc[0,'crossunder_SMA_350'] = False
+  return df.assign(**crosses)
+
+
+
+def rolling_means(values: np.ndarray, windows: list[int]) -> np.ndarray:
+    """
+    Calculates simple moving averages of values for several windows from one cumulative sum.
+    
+    Like pandas rolling(window).mean(), the average is NaN unless all values in the window are valid.
+    The results differ from pandas only by floating point rounding of the cumulative sum
+    (relative difference around 1e-14 on the BTC history, larger if prices span many orders of magnitude).
+    
+    Args:
+        values (np.ndarray): prices, 1-D, or 2-D with one series per row (days along the last axis)
+        windows (list[int]): number of rolling days of each SMA
+    
+    Returns:
+        np.ndarray: float64 array of shape (len(windows), *values.shape)
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    n = values.shape[-1]
+    valid = np.isfinite(values)
+    # leading zero so that the sum of values[..., i-w+1:i+1] is cumsum[..., i+1]-cumsum[..., i+1-w]
+    leading_zero = np.zeros(values.shape[:-1]+(1,))
+    cumsum = np.concatenate((leading_zero, np.cumsum(np.where(valid, values, 0.0), axis=-1)), axis=-1)
+    n_valid = np.concatenate((leading_zero.astype(np.int64), np.cumsum(valid, axis=-1)), axis=-1)
+    
+    means = np.full((len(windows),)+values.shape, np.nan)
+    for row, window in enumerate(windows):
+        if window > n:
+            continue
+        window_sum = cumsum[..., window:]-cumsum[..., :-window]
+        window_valid = n_valid[..., window:]-n_valid[..., :-window]
+        means[row, ..., window-1:] = np.where(window_valid == window, window_sum/window, np.nan)
+    return means
 
-  return df
 
+def cross_above_flags(short: np.ndarray, long: np.ndarray, multipliers: list[float]) -> np.ndarray:
+    """
+    Finds days when short line crossed above multiplier × long line, for all multipliers at once.
+    The formula is the same as in crossunder: short > m*long today and short <= m*long the previous day.
+    
+    Returns:
+        np.ndarray: bool array of shape (len(multipliers), len(short))
+    """
+    scaled_long = np.asarray(multipliers, dtype=np.float64)[:, None]*long
+    above = short > scaled_long
+    flags = np.zeros_like(above)
+    flags[:, 1:] = above[:, 1:] & (short[:-1] <= scaled_long[:, :-1])
+    return flags
+
+
+def crossunder_column(multiplier: float, long_window: int = SMA_LONG_PERIOD) -> str:
+    """
+    Returns name of the crossunder column, e.g. crossunder_SMA_350 or crossunder_1.62SMA_350
+    """
+    prefix = '' if multiplier == 1 else f'{multiplier:.3g}'
+    return f'crossunder_{prefix}SMA_{long_window}'
+
+
+def calc_sma_crosses(df: pd.DataFrame, windows: tuple[int, ...] = (SMA_SHORT_PERIOD, SMA_LONG_PERIOD),
+                     multipliers: tuple[float, ...] = tuple(CROSS_LEVELS.values()),
+                     short_window: int = SMA_SHORT_PERIOD, long_window: int = SMA_LONG_PERIOD,
+                     source_column: str = 'Close', flag_dtype=bool) -> pd.DataFrame:
+    """
+    Calculates SMA of every window and crossunders of the short SMA with every multiple of the long SMA in one pass.
+    
+    E.g. multipliers=GOLDEN_RATIO_MULTIPLIERS gives the lines of the full Golden Ratio Multiplier chart.
+    With the default arguments the columns are the same as from calc_pi_cycle_indicators.
+    
+    Args:
+        df (pd.DataFrame): The Dataframe containing column with price of an asset
+        windows (tuple[int, ...]): SMA windows, columns SMA_<window> are added (short_window and long_window are always added)
+        multipliers (tuple[float, ...]): multipliers of the long SMA, crossunder columns are named by crossunder_column
+        short_window (int): window of the SMA crossing the multiples of the long SMA
+        long_window (int): window of the SMA which is multiplied
+        source_column (str): name of the column containing the prices
+        flag_dtype: dtype of the crossunder columns, bool or np.int8 (1 byte per row either way)
+    
+    Returns:
+        pd.DataFrame: New dataframe with all original data and the new columns, df is not modified
+    """
+    windows = list(dict.fromkeys([*windows, short_window, long_window]))
+    means = rolling_means(df[source_column].to_numpy(dtype=float), windows)
+    flags = cross_above_flags(means[windows.index(short_window)], means[windows.index(long_window)], multipliers)
+    
+    new_columns = {f'SMA_{window}': mean for window, mean in zip(windows, means)}
+    new_columns.update({crossunder_column(multiplier, long_window): flag.astype(flag_dtype, copy=False)
+                        for multiplier, flag in zip(multipliers, flags)})
+    return df.assign(**new_columns)
 
 
 def new_row_index(df: pd.DataFrame) -> int:
@@ -70,6 +168,37 @@ def new_row_index(df: pd.DataFrame) -> int:
     return first_index_of_guessed_data
 
 
+def calc_guess_rows(df: pd.DataFrame, guess_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculates only the new rows following df based on user guess from guess_df
+    
+    The whole future block is built in one pass: dates come from a single date range
+    and prices from a cumulative product of the daily multipliers of all periods.
+    
+    Returns:
+        dataframe with Date and Close column, indexed right after the last index of df
+    """
+    first_index_of_guessed_data = new_row_index(df)
+    # rows with a missing value are skipped, the columns are read as arrays (a copy of the table costs more than the rows)
+    changes = guess_df['Daily Change (%)'].to_numpy(dtype=float)
+    periods = guess_df['Period (days)'].to_numpy(dtype=float)
+    complete = ~(np.isnan(changes) | np.isnan(periods))
+    
+    # number of days and daily multiplier of each period, negative periods add no days
+    period_lens = np.clip(periods[complete], 0, None).astype(np.int64)
+    multipliers = 1+(changes[complete]/100)
+    n_days = int(period_lens.sum())
+    
+    # start the product from the last known Close so the values are multiplied in the same order as day by day
+    daily_multipliers = np.repeat(multipliers, period_lens)
+    close = np.cumprod(np.concatenate(([df['Close'].iloc[-1]], daily_multipliers)))[1:]
+    dates = pd.date_range(start=df['Date'].iloc[-1]+pd.Timedelta(days = 1), periods=n_days, freq='D')
+    
+    guess_rows_df = pd.DataFrame({'Date': dates, 'Close': close},
+                                 index=pd.RangeIndex(first_index_of_guessed_data, first_index_of_guessed_data+n_days))
+    return guess_rows_df
+
+
 def add_guess_to_df(df: pd.DataFrame, guess_df: pd.DataFrame) -> pd.DataFrame:
     """
     Calculates new rows in df based on user guess from guess_df
@@ -77,23 +206,99 @@ def add_guess_to_df(df: pd.DataFrame, guess_df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         dataframe with additional rows for Date and Close column
     """
-    # add rows and calculate Close price based on guess_df
-    first_index_of_guessed_data = new_row_index(df)
-    df_with_guess = df.copy()
-    for index, row in guess_df.iterrows():
-        if np.isnan(row['Period (days)']) or np.isnan(row['Daily Change (%)']):
-            pass
-        else:
-            period_len = row['Period (days)']
-            period_len = int(period_len)
-            multiplier = 1+(row['Daily Change (%)']/100)
-            for i in range(period_len):
-                df_with_guess.loc[first_index_of_guessed_data+i,'Date'] = df_with_guess.loc[first_index_of_guessed_data+i-1,'Date']+pd.Timedelta(days = 1)
-                df_with_guess.loc[first_index_of_guessed_data+i,'Close'] = df_with_guess.loc[first_index_of_guessed_data+i-1,'Close']*multiplier
-            first_index_of_guessed_data += period_len
+    guess_rows_df = calc_guess_rows(df, guess_df)
+    if guess_rows_df.empty:
+        return df.copy()
+    df_with_guess = pd.concat([df, guess_rows_df])
     return df_with_guess
 
 
+def calc_pi_cycle_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns new dataframe with SMA_111, SMA_350 and crossunder columns calculated over the whole df
+    """
+    df = calc_simple_moving_average(df, 'Close', 'SMA_111', SMA_SHORT_PERIOD)
+    df = calc_simple_moving_average(df, 'Close', 'SMA_350', SMA_LONG_PERIOD)
+    df = crossunder(df, 'SMA_111','SMA_350')
+    return df
+
+
+def calc_guess_tail(df: pd.DataFrame, guess_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculates only the rows guessed in guess_df following df, with their indicator columns.
+    
+    Their SMAs are rolled over the last SMA_LONG_PERIOD historical closes followed by the guessed closes,
+    so the work depends on the length of the guess and not on the length of the history.
+    
+    Returns:
+        dataframe with Date, Close and indicator columns, indexed right after the last index of df
+        (without indicator columns if there are no guessed rows)
+    """
+    with stage_timer('add_guess_to_df'):
+        guess_rows_df = calc_guess_rows(df, guess_df)
+    if guess_rows_df.empty:
+        return guess_rows_df
+    
+    # the last full window of history is needed for the first guessed SMA and for its crossunder
+    history_tail = df['Close'].iloc[-SMA_LONG_PERIOD:].to_numpy(dtype=float)
+    close = pd.Series(np.concatenate((history_tail, guess_rows_df['Close'].to_numpy())))
+    with stage_timer('sma_crossunder'):
+        # the same rolling means and crossunder formulas as calc_pi_cycle_indicators, without building
+        # the intermediate frames (their fixed cost exceeded the whole recalculation of a short history)
+        sma_short = close.rolling(window = SMA_SHORT_PERIOD).mean().to_numpy()
+        sma_long = close.rolling(window = SMA_LONG_PERIOD).mean().to_numpy()
+        flags = cross_above_flags(sma_short, sma_long, list(CROSS_LEVELS.values()))
+    
+    # keep only the guessed rows, the columns in the order of calc_pi_cycle_indicators
+    guessed = slice(len(history_tail), None)
+    columns = {'Close': close.to_numpy()[guessed], 'SMA_111': sma_short[guessed], 'SMA_350': sma_long[guessed]}
+    columns.update({column: flag[guessed] for column, flag in zip(CROSS_LEVELS, flags)})
+    columns['Date'] = guess_rows_df['Date'].to_numpy()
+    return pd.DataFrame(columns, index=guess_rows_df.index)
+
+
+def add_guess_with_indicators(df: pd.DataFrame, guess_df: pd.DataFrame, cache=None) -> pd.DataFrame:
+    """
+    Extends df which already contains indicator columns (see calc_pi_cycle_indicators)
+    by the rows guessed in guess_df.
+    
+    Indicators of the historical rows are reused, only the guessed rows are calculated (see calc_guess_tail).
+    
+    df is never modified and, as the historical rows are typically shared by all sessions,
+    it is returned as it is (not copied) if there are no guessed rows.
+    
+    Args:
+        cache (ScenarioCache | None): cache of the guessed rows shared by sessions (see scenario_cache)
+    
+    Returns:
+        dataframe extended to the future with indicator columns for all rows
+    """
+    if cache is None:
+        tail = calc_guess_tail(df, guess_df)
+    else:
+        tail = cache.get_or_compute(df, guess_df, calc_guess_tail)
+    if tail.empty:
+        return df
+    df_with_guess = pd.concat([df, tail])
+    return df_with_guess
+
+
+def extend_with_guess(df: pd.DataFrame, guess_df: pd.DataFrame, cache=None) -> pd.DataFrame:
+    """
+    Runs the whole pipeline for one guess: indicators of df (only if its indicator columns are missing),
+    rows guessed in guess_df and their indicators (see add_guess_with_indicators).
+    
+    Args:
+        cache (ScenarioCache | None): cache of the guessed rows shared by sessions (see scenario_cache)
+    
+    Returns:
+        dataframe extended to the future with indicator columns for all rows
+    """
+    # indicators of historical data are normally precomputed once per data refresh
+    if not set(INDICATOR_COLUMNS).issubset(df.columns):
+        df = calc_pi_cycle_indicators(df)
+    return add_guess_with_indicators(df, guess_df, cache=cache)
+
 
 if __name__ == '__main__':
     pass
\ No newline at end of file
@@ -13,27 +13,96 @@ Based on article: "The Golden Ratio Multiplier" from Philip Swift (@PositiveCryp
 link: https://positivecrypto.medium.com/the-golden-ratio-multiplier-c2567401e12a
 """
 
+import functools
 import streamlit as st
 import pandas as pd
-from top_indic_calc import calc_simple_moving_average, crossunder, add_guess_to_df
+from top_indic_calc import extend_with_guess
+from app_data_loader import load_multi_asset_data
+from load_update_price_df import is_valid_ticker
+from asset_screener import screen_assets
+from cross_solver import days_to_cross_table
+from multi_asset_ingestion import DEFAULT_TICKERS
+from scenario_cache import ScenarioCache
+from scenario_simulation import CROSS_LEVEL_NAMES, simulate_first_crosses, summarize_first_crosses
+from perf_metrics import TRACE_MEMORY, RerunMetrics, finish_rerun, stage_timer, start_rerun
+from BTC_plot_with_future_estimate import APP_CHART_MAX_POINTS, plot_BTC_chart
+
+# number of previous reruns of the session kept for the performance panel
+PERFORMANCE_HISTORY_LENGTH = 20
 
 ################################################################################################################
 
 
-def df_with_users_guess() -> pd.DataFrame:
+@st.cache_resource(show_spinner=False)
+def _get_scenario_cache() -> ScenarioCache:
+    """
+    Returns the process-wide cache of guessed rows, shared by all sessions.
+    """
+    return ScenarioCache()
+
+
+def is_fragment_rerun() -> bool:
+    """
+    Returns True if only fragments are rerun, not the whole page.
+    
+    Streamlit has no public API for it, so this is the only place reading the private script run context
+    (its fragment_ids_this_run, tests/test_content_prep.py pins it). If the context or the attribute is missing,
+    e.g. in another Streamlit version, the rerun is treated as a full page rerun, only the metrics of the fragment
+    rerun are then not recorded separately.
+    """
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return bool(ctx is not None and ctx.fragment_ids_this_run)
+    except (ImportError, AttributeError, TypeError):
+        return False
+
+
+def page_fragment(function):
+    """
+    Turns function into a Streamlit fragment, a change of its widgets reruns only the function and not the whole page.
+    The fragment alone reruns with the arguments of the last page rerun, e.g. with the price data loaded by it.
+    A rerun of the fragment alone is recorded as a separate rerun (see perf_metrics) and shown in the debug panel.
+    """
+    @functools.wraps(function)
+    def run_fragment(*args, **kwargs):
+        # during a full rerun, the stages are recorded by the rerun of the page
+        if not is_fragment_rerun():
+            return function(*args, **kwargs)
+        show_performance_panel = st.query_params.get('debug') == '1'
+        rerun = start_rerun(collect=show_performance_panel, fragment=function.__name__)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            finish_rerun(rerun)
+            if show_performance_panel:
+                record_rerun(rerun)
+    
+    return st.fragment(run_fragment)
+
+
+def df_with_users_guess(apply_button: bool = False) -> pd.DataFrame:
     """
     Shows a table which can be changed by user to define user's guess of future change in bitcoin(BTC) price.
     Table contains one row of default values which can be edited
+    
+    Args:
+        apply_button (bool): the edits are applied together by the 'Apply' button instead of after every change
     """
     # initiate ataframe with first row of default values
     guess_df= pd.DataFrame({'Daily Change (%)':[0.1],'Period (days)':[100]})  
     # show the dataframe for editing
-    guess_df = st.data_editor(guess_df, 
-                              num_rows = "dynamic",
-                              column_config={
-                                  'Daily Change (%)': st.column_config.NumberColumn(help="insert positive or negative number for daily change in percents"),
-                                  'Period (days)': st.column_config.NumberColumn(help="enter the number of days, we recommend using smaller values the larger is the 'Daily Change (%)' value")
-                                  })
+    with st.form('guess_form', border=False) if apply_button else st.container():
+        guess_df = st.data_editor(guess_df, 
+                                  num_rows = "dynamic",
+                                  key='guess_table',
+                                  column_config={
+                                      'Daily Change (%)': st.column_config.NumberColumn(help="insert positive or negative number for daily change in percents"),
+                                      'Period (days)': st.column_config.NumberColumn(help="enter the number of days, we recommend using smaller values the larger is the 'Daily Change (%)' value")
+                                      })
+        if apply_button:
+            st.form_submit_button('Apply')
     return guess_df
 
 
@@ -46,19 +115,174 @@ def prepare_data_for_plot(df: pd.DataFrame, guess_df: pd.DataFrame) -> pd.DataFr
     Returns:
         dataframe extended to the future
     """
-    # add rows and calculate Close price based on guess_df
-    df_with_guess = add_guess_to_df(df, guess_df)
-
-    # add columns with simple moving averages to the dataframe
-    calc_simple_moving_average(df_with_guess, 'Close', 'SMA_111', 111)
-    calc_simple_moving_average(df_with_guess, 'Close', 'SMA_350', 350)
-    # calculate crossunder and add to the df
-    df_with_guess = crossunder(df_with_guess, 'SMA_111','SMA_350')
+    # indicators of historical data are normally precomputed once per data refresh (see app_data_loader),
+    # then only the rows based on guess_df are calculated, or reused if any session already calculated the same guess
+    df_with_guess = extend_with_guess(df, guess_df, cache=_get_scenario_cache())
     
     # return the final version of extended dataframe
     return df_with_guess
 
 
+@page_fragment
+def scenario_view(df: pd.DataFrame):
+    """
+    Shows the table with user's guess and the chart of the prices extended by the guess.
+    An edit of the table reruns only this fragment, the rest of the page is not rendered again.
+    """
+    apply_button = st.toggle('Apply edits with a button', key='guess_apply_button',
+                             help="edit more rows and apply them at once, the chart is not recalculated after every change")
+    
+    # show table with guessed values
+    with stage_timer('guess_table'):
+        guess_df = df_with_users_guess(apply_button)
+
+    # prepare data for plot
+    with stage_timer('prepare_data_for_plot'):
+        df_with_guess = prepare_data_for_plot(df, guess_df)
+    
+    # make a gap under table to make the UI look nicer
+    st.write("")
+    st.write("")
+    # add heading for the plot
+    st.write("""### Bitcoin (BTC) Pi Cycle Top Indicator Chart""")
+    # plot the data (lines are downsampled, undercrosses and the start of the estimate stay exact)
+    with stage_timer('plot_BTC_chart'):
+        plot_BTC_chart(df_with_guess, df.index[-1], max_points=APP_CHART_MAX_POINTS)
+
+
+@page_fragment
+def days_to_cross(df: pd.DataFrame):
+    """
+    Shows when SMA111 crosses each level of SMA350 with a constant daily change
+    and the minimum daily change which crosses it within the entered number of days.
+    The table is solved analytically (see cross_solver), no scenario rows are calculated.
+    """
+    col_change, col_days = st.columns(2)
+    daily_change = col_change.number_input('Constant Daily Change (%)', min_value=-10.0, max_value=10.0,
+                                           value=0.1, step=0.05, key='days_to_cross_change')
+    within_days = col_days.number_input('Cross within (days)', min_value=1, max_value=3650, value=365, step=30,
+                                        key='days_to_cross_within')
+    table = days_to_cross_table(df, daily_change, int(within_days))
+    table['Level'] = table['Level'].map(CROSS_LEVEL_NAMES)
+    st.dataframe(table, hide_index=True,
+                 column_config={'First cross': st.column_config.DateColumn(),
+                                'Min. daily change (%)': st.column_config.NumberColumn(format='%.4f')})
+
+
+@page_fragment
+def monte_carlo_scenarios(df: pd.DataFrame):
+    """
+    Shows a form for batch (Monte Carlo) scenarios and, once submitted, the probability
+    and the date distribution of the first undercross of each SMA350 level.
+    """
+    with st.form('monte_carlo_form'):
+        col_paths, col_days, col_method = st.columns(3)
+        n_paths = col_paths.number_input('Number of paths', min_value=100, max_value=20000, value=2000, step=100)
+        n_days = col_days.number_input('Period (days)', min_value=10, max_value=2000, value=500, step=10)
+        method = col_method.selectbox('Daily changes', ['Bootstrapped from history', 'Daily change and volatility'])
+        col_change, col_volatility, col_lookback = st.columns(3)
+        daily_change = col_change.number_input('Daily Change (%)', value=0.1, step=0.05,
+                                               help="median daily change, used with 'Daily change and volatility'")
+        volatility = col_volatility.number_input('Volatility (%)', min_value=0.0, value=3.0, step=0.5,
+                                                 help="standard deviation of daily change, used with 'Daily change and volatility'")
+        lookback_days = col_lookback.number_input('History used for bootstrap (days)', min_value=30, value=4*365, step=30,
+                                                  help="daily changes are drawn from this number of last days, used with 'Bootstrapped from history'")
+        submitted = st.form_submit_button('Run simulation')
+    
+    if not submitted:
+        return
+    
+    first_crosses_df = simulate_first_crosses(df, int(n_paths), int(n_days),
+                                              method='bootstrap' if method.startswith('Bootstrapped') else 'drift',
+                                              daily_change_pct=daily_change, volatility_pct=volatility,
+                                              lookback_days=int(lookback_days))
+    st.dataframe(summarize_first_crosses(first_crosses_df, int(n_paths)), hide_index=True)
+    
+    # distribution of the first undercross by month
+    monthly = first_crosses_df.set_index('Date')[list(CROSS_LEVEL_NAMES)].resample('MS').sum()
+    monthly = monthly.rename(columns=CROSS_LEVEL_NAMES)*100/n_paths
+    st.write("""Share of paths (%) with the first undercross in the month""")
+    st.bar_chart(monthly, stack=False)
+
+
+@page_fragment
+def asset_screener_view():
+    """
+    Shows a form for a list of Yahoo Finance tickers and, once submitted, the assets ranked
+    by the distance of SMA111 to the next level of SMA350 it has not crossed yet.
+    """
+    with st.form('asset_screener_form'):
+        tickers_text = st.text_input('Tickers', value=', '.join(DEFAULT_TICKERS),
+                                     help="Yahoo Finance tickers separated by commas, e.g. BTC-USD, ETH-USD, AAPL")
+        submitted = st.form_submit_button('Screen assets')
+    
+    if not submitted:
+        return
+    
+    tickers = tuple(dict.fromkeys(ticker.strip().upper() for ticker in tickers_text.split(',') if ticker.strip()))
+    invalid = [ticker for ticker in tickers if not is_valid_ticker(ticker)]
+    if invalid:
+        st.warning(f"Not valid Yahoo Finance tickers: {', '.join(invalid)}.")
+        tickers = tuple(ticker for ticker in tickers if is_valid_ticker(ticker))
+    if not tickers:
+        st.warning('Enter at least one ticker.')
+        return
+    results = load_multi_asset_data(tickers)
+    failed = [result.ticker for result in results.values() if not result.is_ok]
+    if failed:
+        st.warning(f"Data of {', '.join(failed)} could not be downloaded.")
+    series = {ticker: result.data for ticker, result in results.items() if result.is_ok}
+    if not series:
+        return
+    st.dataframe(screen_assets(series), hide_index=True,
+                 column_config={'Date': st.column_config.DateColumn(),
+                                'Last cross': st.column_config.DateColumn(),
+                                'Distance to next cross (%)': st.column_config.NumberColumn(format='%.2f')})
+
+
+def performance_panel(rerun: RerunMetrics):
+    """
+    Shows per-stage latency and memory of the current rerun and the totals of previous reruns of the session.
+    The panel is hidden, it is shown only with ?debug=1 in the URL.
+    """
+    history = record_rerun(rerun)
+    
+    with st.expander('Performance (debug)'):
+        # tracemalloc slows down all sessions, it can be enabled only for the whole server (see perf_metrics)
+        if not TRACE_MEMORY:
+            st.caption('Memory is not measured, start the app with PI_CYCLE_TRACE_MEMORY=1 to measure it.')
+        
+        stages = pd.DataFrame(rerun.stages, columns=['name', 'seconds', 'peak_mib'])
+        stages = pd.DataFrame({'Stage': stages['name'], 'Latency (ms)': 1000*stages['seconds'],
+                               'Peak memory (MiB)': stages['peak_mib']})
+        st.write(f"Current rerun: {1000*rerun.total_seconds:.1f} ms")
+        st.dataframe(stages, hide_index=True)
+        if rerun.events:
+            st.dataframe(pd.DataFrame(rerun.events.items(), columns=['Event', 'Count']), hide_index=True)
+        st.write("Previous reruns of the session (reruns of a fragment are not shown until the next page rerun)")
+        st.dataframe(pd.DataFrame(history), hide_index=True)
+        
+        cache_stats = _get_scenario_cache().stats()
+        st.write(f"Scenario cache (all sessions): {cache_stats['entries']} entries, "
+                 f"{cache_stats['bytes']/1024**2:.2f} of {cache_stats['max_bytes']/1024**2:.0f} MiB, "
+                 f"{cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['evictions']} evictions")
+
+
+def record_rerun(rerun: RerunMetrics) -> list[dict]:
+    """
+    Adds the rerun of the page or of one fragment to the previous reruns of the session.
+    
+    Returns:
+        last PERFORMANCE_HISTORY_LENGTH reruns of the session
+    """
+    history = st.session_state.setdefault('performance_history', [])
+    st.session_state['performance_reruns'] = st.session_state.get('performance_reruns', 0)+1
+    history.append({'Rerun': st.session_state['performance_reruns'], 'Scope': rerun.fragment or 'page',
+                    'Total (ms)': 1000*rerun.total_seconds,
+                    **{f"{stage['name']} (ms)": 1000*stage['seconds'] for stage in rerun.stages}})
+    del history[:-PERFORMANCE_HISTORY_LENGTH]
+    return history
+
 
 def additional_information():
     # motivation and function
@@ -1,13 +1,15 @@
 """
-Pipeline utility for regenerating BTC-USD_price.csv from Yahoo Finance data.
+Pipeline utility for updating BTC-USD_price.feather, BTC-USD_price.csv and BTC-USD_price.npz with new Yahoo Finance candles.
 """
 
 from pathlib import Path
 
-from load_update_price_df import generate_csv_from_yahoo
+from load_update_price_df import update_price_store_from_yahoo
 
 
 if __name__ == "__main__":
-    output_file = Path("BTC-USD_price.csv")
-    generate_csv_from_yahoo(output_path=output_file)
-    print(f"CSV refreshed from Yahoo Finance: {output_file}")
+    feather_file = Path("BTC-USD_price.feather")
+    csv_file = Path("BTC-USD_price.csv")
+    npz_file = Path("BTC-USD_price.npz")
+    update_price_store_from_yahoo(feather_path=feather_file, csv_path=csv_file, npz_path=npz_file)
+    print(f"Price store updated from Yahoo Finance: {feather_file} (CSV export: {csv_file}, stlite archive: {npz_file})")